@@ -0,0 +1,69 @@
+"""
+bench_column_names.py compares change_column_name applied row by row with
+normalize_column_names on a synthetic source analysis.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_column_names.py --rows 100000
+"""
+
+import sys
+import time
+import random
+import argparse
+
+from os.path import join, dirname, abspath
+
+sys.path.insert(0, join(dirname(dirname(abspath(__file__))), 'src'))
+
+import pandas as pd
+
+import dido_common as dc
+
+WORDS = ['Datum', 'begin', 'einde', 'Code', 'Naam', 'Bedrag (EUR)', 'aantal', 'BSN',
+         'Postcode', 'Straat-naam', 'huis nr.', 'Ö-waarde', '%', '2e', 'Locatie/gebouw']
+
+
+def create_names(rows: int, seed: int = 42) -> pd.Series:
+    """ Creates rows messy column names, including duplicates and names without letters
+    """
+    rng = random.Random(seed)
+    names = []
+    for i in range(rows):
+        choice = rng.random()
+        if choice < 0.02:
+            names.append(str(rng.randint(0, 999)))
+        elif choice < 0.10:
+            names.append(rng.choice(WORDS))
+        else:
+            n_words = rng.randint(1, 4)
+            names.append(' '.join(rng.choice(WORDS) for _ in range(n_words)) + f' {i}')
+
+    # for
+
+    return pd.Series(names, dtype = str)
+
+### create_names ###
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type = int, default = 100_000, help = 'Number of column names')
+    args = parser.parse_args()
+
+    names = create_names(args.rows)
+
+    start = time.perf_counter()
+    row_by_row = names.apply(dc.change_column_name)
+    seconds_rows = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = dc.normalize_column_names(names)
+    seconds_batch = time.perf_counter() - start
+
+    print(f'{args.rows:,} names')
+    print(f'   change_column_name per row: {seconds_rows:8.3f} s, '
+          f'{row_by_row.duplicated().sum():,} duplicate names left')
+    print(f'   normalize_column_names:     {seconds_batch:8.3f} s, '
+          f'{batch.duplicated().sum():,} duplicate names left')
+    print(f'   deterministic: {batch.equals(dc.normalize_column_names(names))}')
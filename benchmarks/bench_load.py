@@ -0,0 +1,399 @@
+"""
+bench_load.py measures the database paths of dido_common against a local
+Postgres: applying the generated ODL model, loading synthetic deliveries with
+\\COPY and the lookups load_odl_table, delivery_exists and
+get_current_delivery_seq.
+
+Usage (from the repository root):
+
+    # throwaway cluster, initdb and pg_ctl must be on the PATH (or use --pg-bin)
+    python benchmarks/bench_load.py --rows 100000 --deliveries 4
+
+    # existing local database
+    python benchmarks/bench_load.py --dsn postgresql://user:pw@localhost:5432/bench
+
+    # also apply the ODL model generated by odl-creator
+    python benchmarks/bench_load.py --sql work/sql/logic-model.sql
+
+The data and delivery tables are created with the DDL of odl-creator
+(create_table) from --schema (a schema csv like
+root/schemas/odl/bronbestand_datakwaliteit.csv) and bronbestand_levering.csv.
+Both, their .meta files and the template bronbestand_attribuutmeta.csv are
+read from the directory of --schema. Synthetic data are generated from the
+datatypes of the generated columns. All tables are created in schema
+--pg-schema, which is dropped first. psql is used for the DDL and \\COPY, as
+it is for the SQL written by odl-creator.
+"""
+
+import os
+import sys
+import csv
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import subprocess
+import importlib.util
+
+from os.path import join, dirname, abspath
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+
+sys.path.insert(0, join(dirname(dirname(abspath(__file__))), 'src'))
+
+import dido_common as dc
+
+ROOT_DIR = dirname(dirname(abspath(__file__)))
+PROJECT = 'bench'
+SUPPLIER = 'synth'
+
+
+def start_cluster(pg_bin: str, port: int) -> tuple:
+    """ Creates and starts a throwaway Postgres cluster in a temporary directory
+
+    Args:
+        pg_bin (str): directory with initdb and pg_ctl, '' to use the PATH
+        port (int): port to listen on
+
+    Returns:
+        tuple: (data directory, server config)
+    """
+    data_dir = tempfile.mkdtemp(prefix = 'dido_bench_')
+    initdb = join(pg_bin, 'initdb') if len(pg_bin) > 0 else 'initdb'
+    pg_ctl = join(pg_bin, 'pg_ctl') if len(pg_bin) > 0 else 'pg_ctl'
+
+    subprocess.run([initdb, '-D', data_dir, '-U', 'postgres', '-A', 'trust'],
+                   check = True, capture_output = True)
+    subprocess.run([pg_ctl, '-D', data_dir, '-l', join(data_dir, 'server.log'), '-w',
+                    '-o', f'-p {port} -k {data_dir} -c listen_addresses=localhost', 'start'],
+                   check = True, capture_output = True)
+
+    server_config = {
+        'POSTGRES_HOST': 'localhost',
+        'POSTGRES_PORT': port,
+        'POSTGRES_DB': 'postgres',
+        'POSTGRES_USER': 'postgres',
+        'POSTGRES_PW': '',
+    }
+
+    return data_dir, server_config
+
+### start_cluster ###
+
+
+def stop_cluster(pg_bin: str, data_dir: str):
+    """ Stops the throwaway cluster and removes its directory
+    """
+    pg_ctl = join(pg_bin, 'pg_ctl') if len(pg_bin) > 0 else 'pg_ctl'
+    subprocess.run([pg_ctl, '-D', data_dir, '-m', 'fast', 'stop'], capture_output = True)
+    shutil.rmtree(data_dir, ignore_errors = True)
+
+    return
+
+### stop_cluster ###
+
+
+def config_from_dsn(dsn: str) -> dict:
+    """ Converts postgresql://user:pw@host:port/db into a server config
+    """
+    url = urlparse(dsn)
+
+    return {
+        'POSTGRES_HOST': url.hostname or 'localhost',
+        'POSTGRES_PORT': url.port or 5432,
+        'POSTGRES_DB': url.path.lstrip('/') or 'postgres',
+        'POSTGRES_USER': url.username or os.environ.get('USER', 'postgres'),
+        'POSTGRES_PW': url.password or '',
+    }
+
+### config_from_dsn ###
+
+
+def psql(server_config: dict, sql: str = None, filename: str = None) -> float:
+    """ Runs SQL or an SQL file with psql, stops at the first error
+
+    Returns:
+        float: seconds used
+    """
+    env = os.environ.copy()
+    env['PGPASSWORD'] = str(server_config['POSTGRES_PW'])
+    cmd = ['psql', '-X', '-q', '-v', 'ON_ERROR_STOP=1',
+           '-h', str(server_config['POSTGRES_HOST']),
+           '-p', str(server_config['POSTGRES_PORT']),
+           '-U', str(server_config['POSTGRES_USER']),
+           '-d', str(server_config['POSTGRES_DB'])]
+    cmd += ['-c', sql] if sql is not None else ['-f', filename]
+
+    start = time.perf_counter()
+    result = subprocess.run(cmd, env = env, capture_output = True, text = True)
+    seconds = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+
+    return seconds
+
+### psql ###
+
+
+def load_odl_creator():
+    """ Imports src/odl-creator.py, whose name is not a valid module name
+    """
+    spec = importlib.util.spec_from_file_location('odl_creator', join(ROOT_DIR, 'src', 'odl-creator.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    # odl-creator creates its logger in __main__
+    module.logger = dc.logger
+
+    return module
+
+### load_odl_creator ###
+
+
+def generate_ddl(schema_file: str, pg_schema: str, tables: dict, work_dir: str) -> tuple:
+    """ Generates the DDL of the data and delivery tables with odl-creator
+
+    The schemas are read and completed as odl-creator does (load_schemas and
+    preprocess_schemas), the tables are created by create_table.
+
+    Args:
+        schema_file (str): schema csv of the data table
+        pg_schema (str): postgres schema to create the tables in
+        tables (dict): table names as returned by dc.get_table_names
+        work_dir (str): directory for the completed schema files
+
+    Returns:
+        tuple: (SQL, attributes of the data table, attributes of the delivery table)
+    """
+    odl_creator = load_odl_creator()
+
+    # load_schemas reads <root>/schemas/<supplier>/<from>
+    schema_dir = dirname(abspath(schema_file))
+    root = dirname(dirname(schema_dir))
+    supplier = os.path.basename(schema_dir)
+    os.makedirs(join(work_dir, 'schemas', supplier), exist_ok = True)
+
+    data_table = tables[dc.TAG_TABLE_SCHEMA][:-len('_data')]
+    delivery_table = tables[dc.TAG_TABLE_DELIVERY][:-len('_data')]
+    table_dict = {
+        'bronbestand_attribuutmeta': {'from': 'bronbestand_attribuutmeta.csv'},
+        data_table: {'from': os.path.basename(schema_file)},
+        delivery_table: {'from': 'bronbestand_levering.csv'},
+    }
+    schemas = odl_creator.load_schemas(table_dict, root, work_dir, supplier)
+    schemas, _, _ = odl_creator.preprocess_schemas(schemas, {'POSTGRES_USER': 'bench'})
+    catalogue = dc.AttributeCatalogue(schemas)
+
+    sql = ''
+    for table in [data_table, delivery_table]:
+        sql += odl_creator.create_table(
+            catalogue = catalogue,
+            meta = schemas[table]['meta'],
+            data = None,
+            data_name = '',
+            schema_name = pg_schema,
+            table = table,
+        )
+
+    # for
+
+    return sql, catalogue.table_attributes(data_table), catalogue.table_attributes(delivery_table)
+
+### generate_ddl ###
+
+
+def bench_columns(attributes: list) -> list:
+    """ Returns (column name, datatype) of the columns to fill, serials are
+        filled by the database
+    """
+    return [(row['kolomnaam'], row['datatype'].strip().lower()) for row in attributes
+            if row['datatype'].strip().lower() not in dc.SERIAL_TYPES]
+
+### bench_columns ###
+
+
+def synthetic_value(datatype: str, row: int, rng: random.Random) -> str:
+    """ Returns a random value of datatype as text
+    """
+    if datatype in ('smallint', 'integer', 'bigint'):
+        return str(rng.randint(0, 30000))
+    if datatype in ('real', 'double', 'double precision', 'numeric', 'decimal'):
+        return f'{rng.uniform(0, 1000):.3f}'
+    if datatype == 'boolean':
+        return rng.choice(['t', 'f'])
+    if datatype == 'date':
+        return (datetime(2020, 1, 1) + timedelta(days = rng.randint(0, 1500))).strftime(dc.DATE_FORMAT)
+    if datatype.startswith('timestamp'):
+        return (datetime(2020, 1, 1) + timedelta(seconds = rng.randint(0, 10 ** 8))).strftime(dc.DATETIME_FORMAT)
+
+    return f'waarde_{row}_{rng.randint(0, 10 ** 6)}'
+
+### synthetic_value ###
+
+
+def synthetic_row(columns: list, row: int, rng: random.Random, fixed: dict) -> list:
+    """ Returns random values for columns, except for the columns in fixed
+    """
+    return [fixed[name] if name in fixed else synthetic_value(datatype, row, rng)
+            for name, datatype in columns]
+
+### synthetic_row ###
+
+
+def write_delivery(filename: str, columns: list, levering: str, first_row: int, rows: int, seed: int):
+    """ Writes a synthetic delivery as csv with a header of the column names
+    """
+    rng = random.Random(seed)
+    with open(filename, 'w', encoding = 'utf8', newline = '') as outfile:
+        writer = csv.writer(outfile, delimiter = ';')
+        writer.writerow([name for name, _ in columns])
+        for row in range(first_row, first_row + rows):
+            writer.writerow(synthetic_row(columns, row, rng, {dc.ODL_RECORDNO: row, dc.ODL_LEVERING_FREK: levering}))
+
+    # with
+
+    return
+
+### write_delivery ###
+
+
+def percentiles(seconds: list) -> str:
+    """ Returns p50, p90 and p99 of seconds in milliseconds
+    """
+    seconds = sorted(seconds)
+    pick = lambda p: seconds[min(len(seconds) - 1, int(p * len(seconds)))] * 1000
+
+    return f'p50 {pick(0.50):8.2f} ms   p90 {pick(0.90):8.2f} ms   p99 {pick(0.99):8.2f} ms'
+
+### percentiles ###
+
+
+def time_calls(fun, repeat: int) -> list:
+    """ Calls fun repeat times and returns the duration of each call
+    """
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fun()
+        seconds.append(time.perf_counter() - start)
+
+    return seconds
+
+### time_calls ###
+
+
+def run_benchmark(server_config: dict, args):
+    pg_schema = args.pg_schema
+    server_config = dict(server_config, POSTGRES_SCHEMA = pg_schema)
+    tables = dc.get_table_names(PROJECT, SUPPLIER)
+    data_table = f'{pg_schema}.{tables[dc.TAG_TABLE_SCHEMA]}'
+    delivery_table = f'{pg_schema}.{tables[dc.TAG_TABLE_DELIVERY]}'
+
+    # start from an empty schema
+    psql(server_config, f'DROP SCHEMA IF EXISTS {pg_schema} CASCADE; CREATE SCHEMA {pg_schema};')
+
+    if args.sql is not None:
+        sql = open(args.sql, encoding = 'utf8').read()
+        sql = sql.replace(f'{args.sql_schema}.', f'{pg_schema}.')
+        with tempfile.NamedTemporaryFile('w', suffix = '.sql', delete = False) as outfile:
+            outfile.write(sql)
+
+        seconds = psql(server_config, filename = outfile.name)
+        os.remove(outfile.name)
+        print(f'ODL model applied in {seconds:.2f} s')
+
+    # if
+
+    # the tables as odl-creator creates them
+    work_dir = tempfile.mkdtemp(prefix = 'dido_bench_data_')
+    sql, data_attributes, delivery_attributes = generate_ddl(args.schema, pg_schema, tables, work_dir)
+    with open(join(work_dir, 'tables.sql'), 'w', encoding = 'utf8') as outfile:
+        outfile.write(sql)
+
+    psql(server_config, filename = join(work_dir, 'tables.sql'))
+    data_columns = bench_columns(data_attributes)
+    delivery_columns = bench_columns(delivery_attributes)
+
+    # load the deliveries
+    total_rows = 0
+    total_seconds = 0
+    leveringen = [f'{2020 + i // 12}-M{i % 12 + 1:02d}' for i in range(args.deliveries)]
+    for i, levering in enumerate(leveringen):
+        filename = join(work_dir, f'delivery_{i}.csv')
+        write_delivery(filename, data_columns, levering, total_rows + 1, args.rows, seed = i)
+
+        names = ', '.join([name for name, _ in data_columns])
+        seconds = psql(server_config,
+                       f"\\COPY {data_table} ({names}) FROM '{filename}' DELIMITER ';' CSV HEADER")
+
+        fixed = {dc.ODL_LEVERING_FREK: levering, 'levering_rapportageperiode_volgnummer': i + 1,
+                 'levering_aantal_records': args.rows}
+        values = synthetic_row(delivery_columns, i, random.Random(i), fixed)
+        psql(server_config,
+             f"INSERT INTO {delivery_table} ({', '.join([name for name, _ in delivery_columns])}) "
+             f"VALUES ({', '.join([dc.sql_literal(value, 'text') for value in values])})")
+
+        total_rows += args.rows
+        total_seconds += seconds
+        print(f'{levering}: {args.rows:,} rows in {seconds:.2f} s, {args.rows / seconds:,.0f} rows/s')
+        os.remove(filename)
+
+    # for
+
+    shutil.rmtree(work_dir, ignore_errors = True)
+    psql(server_config, f'ANALYZE {data_table}')
+    print(f'Total: {total_rows:,} rows in {total_seconds:.2f} s, {total_rows / total_seconds:,.0f} rows/s')
+    print('')
+
+    # lookup latencies
+    server_configs = {'DATA_SERVER_CONFIG': server_config}
+    delivery = {dc.ODL_LEVERING_FREK: leveringen[-1]}
+    lookups = {
+        'load_odl_table': lambda: dc.load_odl_table(tables[dc.TAG_TABLE_DELIVERY], server_config),
+        'delivery_exists': lambda: dc.delivery_exists(delivery, SUPPLIER, PROJECT, server_configs),
+        'get_current_delivery_seq': lambda: dc.get_current_delivery_seq(PROJECT, SUPPLIER, server_config),
+    }
+    for name, fun in lookups.items():
+        print(f'{name:26s} {percentiles(time_calls(fun, args.repeat))}')
+
+    print('')
+
+    # table sizes
+    for table in [tables[dc.TAG_TABLE_SCHEMA], tables[dc.TAG_TABLE_DELIVERY]]:
+        print(f'{table:40s} {dc.get_table_bytes(table, server_config) / 1e6:10.1f} MB')
+
+    return
+
+### run_benchmark ###
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dsn', help = 'postgresql://user:pw@host:port/db, default starts a throwaway cluster')
+    parser.add_argument('--pg-bin', default = '', help = 'Directory with initdb and pg_ctl')
+    parser.add_argument('--port', type = int, default = 54329, help = 'Port of the throwaway cluster')
+    parser.add_argument('--pg-schema', default = 'dido_bench', help = 'Postgres schema to use, is dropped first')
+    parser.add_argument('--schema', default = join(ROOT_DIR, 'root', 'schemas', 'odl', 'bronbestand_datakwaliteit.csv'),
+                        help = 'Schema csv to generate the deliveries from')
+    parser.add_argument('--sql', help = 'SQL file written by odl-creator to apply first')
+    parser.add_argument('--sql-schema', default = 'datamanagement', help = 'Postgres schema used in --sql')
+    parser.add_argument('--rows', type = int, default = 100_000, help = 'Rows per delivery')
+    parser.add_argument('--deliveries', type = int, default = 4, help = 'Number of deliveries')
+    parser.add_argument('--repeat', type = int, default = 100, help = 'Calls per lookup')
+    args = parser.parse_args()
+
+    data_dir = None
+    if args.dsn is not None:
+        server_config = config_from_dsn(args.dsn)
+    else:
+        data_dir, server_config = start_cluster(args.pg_bin, args.port)
+
+    try:
+        run_benchmark(server_config, args)
+
+    finally:
+        if data_dir is not None:
+            stop_cluster(args.pg_bin, data_dir)
+
+    # try..finally
@@ -0,0 +1,183 @@
+"""
+bench_startup.py measures the import time of dido_common with python -X importtime.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_startup.py                      # report
+    python benchmarks/bench_startup.py --save benchmarks/importtime_baseline.txt
+    python benchmarks/bench_startup.py --compare benchmarks/importtime_baseline.txt
+    python benchmarks/bench_startup.py --project <project dir>
+
+The import is repeated --runs times in a fresh interpreter, the median of the
+cumulative import time of the module is reported together with the heaviest
+top level imports of the last run.
+
+With --project the start of a real command is measured as well: importing
+dido_common and read_config of the project, which starts from the config
+snapshot when it is valid. The first run writes the snapshot. Whether pandas
+was imported during the start is reported.
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+
+from os.path import join, dirname, abspath
+
+SRC_DIR = join(dirname(dirname(abspath(__file__))), 'src')
+
+
+def import_times(module: str) -> dict:
+    """ Imports module in a fresh interpreter with -X importtime
+
+    Args:
+        module (str): name of the module to import
+
+    Returns:
+        dict: top level package -> cumulative import time in microseconds
+    """
+    env = os.environ.copy()
+    env['PYTHONPATH'] = SRC_DIR + os.pathsep + env.get('PYTHONPATH', '')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output = True,
+        text = True,
+        env = env,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.splitlines()[-1])
+
+    # lines look like: import time:  self [us] | cumulative | imported package
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+
+        _, cumulative, package = line[len('import time:'):].split('|')
+
+        # only top level imports, nested ones are indented
+        if not package.startswith('  '):
+            name = package.strip()
+            times[name] = times.get(name, 0) + int(cumulative)
+
+        # if
+    # for
+
+    return times
+
+### import_times ###
+
+
+def measure(module: str, runs: int) -> tuple:
+    """ Returns the median import time of module and the top level import times
+    """
+    totals = []
+    times = {}
+    for _ in range(runs):
+        times = import_times(module)
+        totals.append(times.get(module, 0))
+
+    totals.sort()
+
+    return totals[len(totals) // 2], times
+
+### measure ###
+
+
+COMMAND_START = """
+import sys, time
+started = time.perf_counter()
+import dido_common as dc
+dc.read_config(sys.argv[1])
+print(time.perf_counter() - started, 'pandas' in sys.modules)
+"""
+
+
+def command_start(project_dir: str, runs: int) -> tuple:
+    """ Measures import of dido_common plus read_config in fresh interpreters
+
+    Args:
+        project_dir (str): project directory with config/config.yaml
+        runs (int): number of fresh interpreters
+
+    Returns:
+        tuple: median seconds and whether pandas was imported in the last run
+    """
+    env = os.environ.copy()
+    env['PYTHONPATH'] = SRC_DIR + os.pathsep + env.get('PYTHONPATH', '')
+
+    # the first run may have to write the config snapshot
+    seconds = []
+    pandas_loaded = None
+    for _ in range(runs + 1):
+        result = subprocess.run(
+            [sys.executable, '-c', COMMAND_START, project_dir],
+            capture_output = True,
+            text = True,
+            env = env,
+            cwd = project_dir,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.splitlines()[-1])
+
+        elapsed, pandas_loaded = result.stdout.splitlines()[-1].split()
+        seconds.append(float(elapsed))
+
+    # for
+
+    seconds = sorted(seconds[1:])
+
+    return seconds[len(seconds) // 2], pandas_loaded == 'True'
+
+### command_start ###
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--module', default = 'dido_common', help = 'Module to import')
+    parser.add_argument('--runs', type = int, default = 5, help = 'Number of fresh interpreters')
+    parser.add_argument('--top', type = int, default = 10, help = 'Number of heaviest imports to show')
+    parser.add_argument('--save', help = 'Write the result as baseline to this file')
+    parser.add_argument('--compare', help = 'Compare with the baseline in this file')
+    parser.add_argument('--project', help = 'Also measure read_config of this project directory')
+    args = parser.parse_args()
+
+    median, times = measure(args.module, args.runs)
+
+    print(f'import {args.module}: {median / 1000:.1f} ms (median of {args.runs})')
+    print('')
+    heaviest = sorted(times.items(), key = lambda item: item[1], reverse = True)
+    for name, us in heaviest[:args.top]:
+        print(f'   {us / 1000:8.1f} ms  {name}')
+
+    if args.save is not None:
+        with open(args.save, 'w') as outfile:
+            outfile.write(f'{args.module};{median}\n')
+
+        print('')
+        print(f'Baseline written to {args.save}')
+
+    # if
+
+    if args.compare is not None:
+        with open(args.compare) as infile:
+            lines = [line for line in infile.read().splitlines()
+                     if len(line.strip()) > 0 and not line.startswith('#')]
+            _, baseline = lines[0].split(';')
+
+        baseline = int(baseline)
+        print('')
+        print(f'Baseline: {baseline / 1000:.1f} ms, now: {median / 1000:.1f} ms, '
+              f'speedup {baseline / max(median, 1):.1f}x')
+
+    # if
+
+    if args.project is not None:
+        project_dir = os.path.abspath(args.project)
+        seconds, pandas_loaded = command_start(project_dir, args.runs)
+        print('')
+        print(f'import + read_config({project_dir}): {seconds * 1000:.1f} ms '
+              f'(median of {args.runs}), pandas imported: {pandas_loaded}')
+
+    # if
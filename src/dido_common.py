@@ -1,23 +1,31 @@
 """
 did0_common.py is a library with common routines for DiDi.
+
+Heavy dependencies (pandas, sqlalchemy, psutil, yaml and simple_table) are
+imported inside the functions that use them, so that importing this module
+is fast for commands that do not need them.
 """
+from __future__ import annotations
 
 import os
 import sys
-import yaml
-import psutil
+import copy
+import json
+import time
 import logging
 import argparse
-import sqlalchemy
-
-import pandas as pd
+import hashlib
+import threading
+import contextlib
 
-from datetime import datetime
-from dotenv import load_dotenv
+from typing import TYPE_CHECKING
+from datetime import datetime, date
 from os.path import join, splitext, dirname, basename, exists
 # from common import create_log, change_column_name, change_column_name, split_filename
 
-import simple_table as st
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
 
 logger = logging.getLogger()
 
@@ -33,6 +41,7 @@ TAG_TABLE_META     = 'meta'
 TAG_TABLE_EXTRA    = 'extra'
 TAG_TABLE_DELIVERY = 'levering'
 TAG_TABLE_QUALITY  = 'datakwaliteit'
+TAG_TABLE_QUALITY_SUMMARY = 'datakwaliteitsamenvatting'
 
 # Tags refer to dictionary indices of each table
 TAG_TABLES = 'tables'
@@ -53,7 +62,7 @@ ODL_SYSDATUM         = 'sysdatum'
 # special column names that require action
 COL_CREATED_BY = 'created_by'
 
-# 1,2,3,6,8 controls in code
+# 1,2,3,6,8,9 controls in code
 # betekenis van datakwaliteitcodes
 VALUE_OK = 0 # "Valide waarde"
 VALUE_NOT_IN_LIST = 1  # "Domein - Waarde niet in lijst"
@@ -64,6 +73,7 @@ VALUE_IMPROBABLE = 5 #"Waarde niet waarschijnlijk"
 VALUE_WRONG_DATATYPE = 6 #"Datatype - Waarde geen juist datatype"
 VALUE_HAS_WRONG_FORMAT = 7 #"Waarde geen juist formaat"
 VALUE_NOT_CONFORM_RE = 8 #"Domein - Waarde voldoet niet aan reguliere expressie"
+VALUE_DUPLICATE_KEY = 9 #"Sleutel - Dubbele waarde van de primaire sleutel"
 
 # Allowed column names
 ALLOWED_COLUMN_NAMES = ['kolomnaam', 'datatype', 'leverancier_kolomnaam',
@@ -84,10 +94,16 @@ DIDO_VERSION = 'dido_version'
 DIDO_VERSION_DATE = 'dido_version_date'
 
 # Miscellaneous
+BOOLEAN_VALUES = ('t', 'f', 'true', 'false', 'y', 'n', 'yes', 'no', 'on', 'off', '1', '0')
+MAX_IDENTIFIER_LENGTH = 63 # Postgres truncates longer names
 DATE_FORMAT = '%Y-%m-%d'
 TIME_FORMAT = '%H:%M:%S'
 DATETIME_FORMAT = f'{DATE_FORMAT} {TIME_FORMAT}'
 
+# Resolved configuration without credentials, see read_config
+CONFIG_SNAPSHOT = '.config_snapshot.json'
+CONFIG_SNAPSHOT_MAX_AGE = 24 * 3600 # seconds
+
 
 class DiDoError(Exception):
     """ To be raised for DiDo exceptions
@@ -110,20 +126,40 @@ Module contains common functions for project
 """
 import os
 import re
-import random
+import zlib
+import queue
+import struct
+import decimal
+import atexit
 import logging
+import logging.handlers
 
-import pandas as pd
 from datetime import datetime
 from logging.config import dictConfig # required to import logging
 
+# QueueListener writing the log file when create_log(use_queue = True)
+log_listener = None
+log_listener_registered = False
 
-def create_log(filename: str, level: int = logging.INFO, reset: bool = True) -> object:
+
+def create_log(filename: str,
+               level: int = logging.INFO,
+               reset: bool = True,
+               use_queue: bool = False,
+               max_bytes: int = 0,
+               backup_count: int = 5,
+              ) -> object:
     """ Returns a log configuration
 
     The log configuration returned displays a normal message at the console
     and an extended version (including level, data, etc) to the log file.
 
+    When use_queue is True, log records are put onto a queue by a
+    QueueHandler and written to the log file by a QueueListener in a
+    background thread, so logging at DEBUG level does not block the caller.
+    When max_bytes > 0 the log file is rotated when it exceeds max_bytes,
+    keeping backup_count old log files.
+
     Get a logger as follows:
 
     logger = common.create_log(log_file, level = loggin.DEBUG)
@@ -133,15 +169,46 @@ def create_log(filename: str, level: int = logging.INFO, reset: bool = True) ->
     Args:
         filename -- which need to be logged/monitored
         level -- treshold level only log messages above level
+        reset -- empty the log file before writing
+        use_queue -- write the log file from a background thread
+        max_bytes -- rotate the log file at this size, 0 = never rotate
+        backup_count -- number of rotated log files to keep
 
     Returns:
         logger object
     """
+    global log_listener, log_listener_registered
+
     if reset:
         file_mode = 'w'
     else:
         file_mode = 'a'
 
+    # stop the writer thread of a previous call
+    if log_listener is not None:
+        log_listener.stop()
+        log_listener = None
+
+    file_handler = {
+        'level': logging.DEBUG,
+        'formatter': 'standard',
+        'class': 'logging.FileHandler',
+        'filename': filename,
+        'mode': file_mode,
+    }
+
+    if max_bytes > 0:
+        # RotatingFileHandler always appends, empty the file when reset
+        if reset and os.path.isdir(os.path.dirname(os.path.abspath(filename))):
+            open(filename, 'w').close()
+
+        file_handler['class'] = 'logging.handlers.RotatingFileHandler'
+        file_handler['mode'] = 'a'
+        file_handler['maxBytes'] = max_bytes
+        file_handler['backupCount'] = backup_count
+
+    # if
+
     logging_configuration = {
         'version': 1,
         'disable_existing_loggers': False,
@@ -160,13 +227,7 @@ def create_log(filename: str, level: int = logging.INFO, reset: bool = True) ->
                 'class': 'logging.StreamHandler',
                 'stream': 'ext://sys.stdout',  # default stderr
             },
-            'file': {
-                'level': logging.DEBUG,
-                'formatter': 'standard',
-                'class': 'logging.FileHandler',
-                'filename': filename,
-                'mode': file_mode,
-            },
+            'file': file_handler,
         },
         'loggers': {
             '': {
@@ -189,11 +250,70 @@ def create_log(filename: str, level: int = logging.INFO, reset: bool = True) ->
 
     # try..except
 
+    if use_queue:
+        # move the file handler behind a queue, served by a background thread
+        writer = [handler for handler in log.handlers
+                  if isinstance(handler, logging.FileHandler)][0]
+        log.removeHandler(writer)
+
+        log_queue = queue.SimpleQueue()
+        log.addHandler(logging.handlers.QueueHandler(log_queue))
+        log_listener = logging.handlers.QueueListener(log_queue, writer, respect_handler_level = True)
+        log_listener.start()
+
+        # flush the queue when the program ends, registered once
+        if not log_listener_registered:
+            atexit.register(stop_log_listener)
+            log_listener_registered = True
+
+        # if
+
+    # if
+
     return log
 
 ### create_log ###
 
 
+def stop_log_listener():
+    """ Writes all queued log records and stops the log writer thread
+    """
+    global log_listener
+
+    if log_listener is not None:
+        log_listener.stop()
+        log_listener = None
+
+    return
+
+### stop_log_listener ###
+
+
+def create_log_from_config(config: dict, filename: str, level = logging.INFO) -> object:
+    """ Creates a log as create_log with the settings of the LOG section of config
+
+    Args:
+        config (dict): configuration, LOG may contain queue, max_bytes
+            and backup_count
+        filename (str): name of the log file
+        level (int, optional): log level. Defaults to logging.INFO.
+
+    Returns:
+        logger object
+    """
+    log_config = get_par(config, 'LOG', {})
+
+    return create_log(
+        filename,
+        level = level,
+        use_queue = bool(get_par(log_config, 'queue', False)),
+        max_bytes = int(get_par(log_config, 'max_bytes', 0)),
+        backup_count = int(get_par(log_config, 'backup_count', 5)),
+    )
+
+### create_log_from_config ###
+
+
 def iso_cet_date(datum: datetime, tz: str = ''):
     result = datum.strftime(f"%Y-%m-%d %H:%M:%S {tz}")
 
@@ -221,13 +341,18 @@ def split_filename(filename: str) -> tuple:
 def change_column_name(col_name: str, empty: str = 'kolom_') -> str:
     """align to snake_case; only alfanum and underscores, multiple underscores reduced to one
 
+    When no name remains, a name is derived from a hash of col_name, so the
+    same input always yields the same name.
+
     Args:
         col_name -- name to be changed
-        empty -- prefix for random name
+        empty -- prefix for generated name
 
     Returns:
         adjusted columnname
     """
+    original = col_name
+
     # remove outer whitespace
     col_name = col_name.strip().lower()
 
@@ -242,8 +367,86 @@ def change_column_name(col_name: str, empty: str = 'kolom_') -> str:
         if letter.isalpha():
             return col_name[i:]
 
-    # if no letter return random name
-    return f'{empty}{random.randint(1000, 9999)}'
+    # if no letter return a name derived from the original name
+    return f'{empty}{zlib.crc32(original.encode("utf8")) % 9000 + 1000}'
+
+### change_column_name ###
+
+
+NON_IDENTIFIER = re.compile('[^0-9a-z_]+')
+
+
+def normalize_column_names(names, empty: str = 'kolom_') -> pd.Series:
+    """ Applies the rules of change_column_name to a whole column at once
+
+    Names that do not contain any letter get a name derived from their
+    position: <empty><position>, position starting at 1 with 3 digits.
+    Names are cut at the maximum identifier length of Postgres. Duplicate
+    names are made unique by appending _2, _3, ... in order of appearance,
+    so the result only depends on the input.
+
+    Args:
+        names (list or pd.Series): column names to normalize
+        empty (str, optional): prefix of generated names. Defaults to 'kolom_'.
+
+    Returns:
+        pd.Series: normalized names with the index of names
+    """
+    import pandas as pd
+
+    names = pd.Series(names, dtype = str)
+
+    # one pass over plain strings: pandas string methods call Python per
+    # element as well, but once per operation
+    result = []
+    for name in names.fillna('').tolist():
+        # only [0-9a-z_] are left: start at the first letter, remove trailing underscores
+        name = NON_IDENTIFIER.sub('_', name.lower()).lstrip('0123456789_').rstrip('_')
+        result.append(name[:MAX_IDENTIFIER_LENGTH])
+
+    # for
+
+    # names without letters are named after their position,
+    # duplicates get a suffix in order of appearance
+    counts = {}
+    duplicates = []
+    for i, name in enumerate(result):
+        if len(name) == 0:
+            name = f'{empty}{i + 1:03d}'
+            result[i] = name
+
+        counts[name] = counts.get(name, 0) + 1
+        if counts[name] > 1:
+            duplicates.append(i)
+
+    # for
+
+    if len(duplicates) > 0:
+        taken = set(counts)
+        occurrence = {}
+
+        # a suffixed name may clash with an existing name: increase the suffix
+        for i in duplicates:
+            base = result[i]
+            number = occurrence.get(base, 1) + 1
+            name = f'{base[:MAX_IDENTIFIER_LENGTH - len(str(number)) - 1]}_{number}'
+            while name in taken:
+                number += 1
+                name = f'{base[:MAX_IDENTIFIER_LENGTH - len(str(number)) - 1]}_{number}'
+
+            occurrence[base] = number
+            taken.add(name)
+            result[i] = name
+
+        # for
+
+        logger.warning(f'!!! {len(duplicates)} duplicate column names renamed')
+
+    # if
+
+    return pd.Series(result, index = names.index, dtype = str)
+
+### normalize_column_names ###
 
 
 def get_headers_and_types(schema: pd.DataFrame) -> tuple:
@@ -270,818 +473,4033 @@ def get_headers_and_types(schema: pd.DataFrame) -> tuple:
 ### get_headers_and_types ###
 
 
-def read_schema_file(filename: str) -> pd.DataFrame:
-    """ mutation schema file
+def parse_constraints(constraints: str) -> dict:
+    """ Splits the constraints column of a schema into its parts
+
+    Example: "DEFAULT CURRENT_TIMESTAMP(0) NOT NULL" results in
+    {'not_null': True, 'default': 'CURRENT_TIMESTAMP(0)', 'other': ''}
 
     Args:
-        filename -- csv schema file
+        constraints (str): value of the constraints column
 
     Returns:
-        contents
+        dict: not_null (bool), default (str or None) and other (str), the
+            remaining constraints like UNIQUE or CHECK
     """
-    schema = pd.read_csv(filename, sep = ';', quotechar = '"', keep_default_na = False, encoding = 'UTF-8')
+    text = str(constraints)
+    not_null = re.search(r'\bNOT\s+NULL\b', text, re.IGNORECASE) is not None
+    text = re.sub(r'\bNOT\s+NULL\b', ' ', text, flags = re.IGNORECASE)
 
-    # Postgres surrounds text by "'"; use double single quotes to have them accepted
-    schema['beschrijving'] = schema['beschrijving'].str.replace("'", "''")
+    default = None
+    match = re.search(r'\bDEFAULT\s+(.+?)(?=\s+(?:UNIQUE|CHECK|PRIMARY\s+KEY|REFERENCES)\b|$)',
+                      text, re.IGNORECASE)
+    if match is not None:
+        default = match.group(1).strip()
+        text = text[:match.start()] + text[match.end():]
 
-    # Two spaces at line end ensures newline in markdown
-    schema['beschrijving'] = schema['beschrijving'].str.replace("\n", "  \n")
+    return {'not_null': not_null, 'default': default, 'other': ' '.join(text.split())}
 
-    return schema
+### parse_constraints ###
 
-### read_schema_file ###
 
+# types that can be created but not be altered to
+SERIAL_TYPES = {'smallserial': 'smallint', 'serial': 'integer', 'bigserial': 'bigint'}
 
-def report_ram(message: str):
-    logger = logging.getLogger()
-    mem = psutil.virtual_memory()
 
-    logger.info('')
-    logger.info(message)
-    logger.info(f'   Total memory:    {mem.total:,}')
-    logger.info(f'   Memory used:     {mem.used:,}')
-    logger.info(f'   Memory available {mem.available:,}')
+def column_definitions(attributes: list, constraints: bool = True) -> list:
+    """ Returns the column definitions of a table for CREATE TABLE
 
-    return
+    Args:
+        attributes (list): schema rows of the table, see AttributeCatalogue.table_attributes
+        constraints (bool, optional): include the constraints of each column.
+            Defaults to True. Without constraints serial types become their
+            integer type, so no sequence is created.
 
-### report_ram ###
+    Returns:
+        list: one 'kolomnaam datatype [constraints]' string per column
+    """
+    definitions = []
+    for row in attributes:
+        datatype = row['datatype']
+        if constraints:
+            line = f'{row["kolomnaam"]} {datatype}'
+            if len(row['constraints']) > 0:
+                line += ' ' + row['constraints']
 
+        else:
+            line = f'{row["kolomnaam"]} {SERIAL_TYPES.get(datatype.strip().lower(), datatype)}'
 
-def get_par(config: dict, key: str, default = None):
-    """ Gets the value of a key from a dictionary or DataFrame index
+        # if
 
-    when config is a dictionary its key is fetched, when it is a dataframe
-    the key is looked up from the index.
+        definitions.append(line)
 
-    In both cases applies that when a key is not found the default is returned.
+    # for
+
+    return definitions
+
+### column_definitions ###
+
+
+def parse_domain(domain: str) -> dict:
+    """ Parses the domein column of a schema
+
+    A domain is a list of values (['a', 'b'] or [1, 2, 3]), a range min:max
+    where min or max may be left empty, or a regular expression re: <regex>.
 
     Args:
-        config (dict): dictuionary or DataFrame to fetch the value from
-        key (str): value to find in dictionary
-        default (_type_, optional): default when value is not in dict. Defaults to None.
+        domain (str): value of the domein column
+
+    Returns:
+        dict: kind ('none', 'list', 're' or 'range') with values (list of
+            str), pattern (compiled regex) or min and max (str or None)
     """
-    if isinstance(config, pd.DataFrame):
-        # config is DataFrame, look for key in index
-        if key in config.index:
-            return str(config.loc[key])
+    import ast
 
-        else:
-            return default
+    text = str(domain).strip()
+    if len(text) == 0:
+        return {'kind': 'none'}
 
-    else:
-        # dictionary, return config[key] when present
-        if key in config:
-            return config[key]
+    if text.startswith('['):
+        try:
+            values = ast.literal_eval(text)
+        except (ValueError, SyntaxError):
+            values = [value.strip().strip('\'"') for value in text.strip('[]').split(',')]
 
-        else:
-            return default
+        return {'kind': 'list', 'values': [str(value) for value in values]}
 
-### get_par ###
+    # if
 
+    if text.startswith('re:'):
+        return {'kind': 're', 'pattern': re.compile(text[3:].strip())}
 
-def get_par_par(config: dict, key_1: str, key_2: str, default = None):
-    """ Gets the value of a key from a dictionary from which the result is a dictionary
+    if text.count(':') == 1:
+        low, high = [part.strip() for part in text.split(':')]
 
-   Key_1 points to a dictionary inside the dictionary, key_2 points to a
-   value inside that dictionary. When either is not found default is returned
+        return {'kind': 'range',
+                'min': low if len(low) > 0 else None,
+                'max': high if len(high) > 0 else None}
 
-    Args:
-        config (dict): dictuionary or DataFrame to fetch the value from
-        key_1 (str): value to find in config
-        key_2 (str): value to find in config[key_1]
-        default (_type_, optional): default when value is not in dict. Defaults to None.
-    """
+    # if
 
-    # dictionary, return config[key] when present
-    if key_1 in config:
-        sub_config = config[key_1]
+    return {'kind': 'none'}
 
-        if key_2 in sub_config:
-            return sub_config[key_2]
+### parse_domain ###
 
-        else:
-            return default
 
-    else:
-        return default
+INTEGER_RANGES = {
+    'smallint': (-2**15, 2**15 - 1), 'smallserial': (1, 2**15 - 1),
+    'integer': (-2**31, 2**31 - 1), 'serial': (1, 2**31 - 1),
+    'bigint': (-2**63, 2**63 - 1), 'bigserial': (1, 2**63 - 1),
+}
 
-### get_par ###
 
+def split_datatype(datatype: str) -> tuple:
+    """ Splits a datatype into its name and parameters
 
-def read_cli():
-    """ Read command line arguments
+    Example: 'numeric(10, 2)' results in ('numeric', [10, 2]),
+    'VARCHAR (20)' in ('varchar', [20]) and 'text' in ('text', []).
+
+    Args:
+        datatype (str): postgres datatype
 
     Returns:
-        str: path to the application
-        object: argparse arguments
+        tuple: lower case name and list of integer parameters
     """
-    pad, fn, ext = split_filename(sys.argv[0])
-    app_path = {'path': pad, 'name': fn, 'ext': ext}
+    match = re.fullmatch(r'\s*([a-z ]+?)\s*\(\s*(\d+)\s*(?:,\s*(\d+)\s*)?\)\s*', datatype.lower())
+    if match is None:
+        return ' '.join(datatype.lower().split()), []
 
-    argParser = argparse.ArgumentParser()
-    argParser.add_argument("-c", "--compare", help="Compare action: 'dump' or 'compare'",
-                           choices=['compare', 'dump'],
-                           default='compare', const='compare', nargs='?')
-    argParser.add_argument("-d", "--delivery", help="Name of delivery file in root/data directory")
-    argParser.add_argument("--date", help="Date to take snapshot of database ")
-    argParser.add_argument("-p", "--project", help="Path to project directory")
-    argParser.add_argument("-r", "--reset", help="Empties the logfile before writing it",
-                           action='store_const', const='reset')
-    argParser.add_argument("-s", "--supplier", help="Name of supplier")
-    argParser.add_argument("-t", "--target", help="File name to read target data from")
-    argParser.add_argument("-v", "--view", help="View database table in dido_compare",
-                           action='store_const', const='view' )
-    argParser.add_argument("--Yes",  help="Answer Yes to all questions",
-                           action='store_const', const='Ja')
+    parameters = [int(value) for value in match.groups()[1:] if value is not None]
 
-    args = argParser.parse_args()
+    return ' '.join(match.group(1).split()), parameters
 
-    return  app_path, args
+### split_datatype ###
 
-### read_cli ###
 
+def check_value(value: str, datatype: str, not_null: bool, domain: dict) -> int:
+    """ Checks a value from a data file against the rules of its column
 
-def load_parameters() -> dict:
-    """ Laadt parameters uit config file
+    Returns the datakwaliteit code of the first failing check, see
+    bronbestand_datakwaliteitcodes: 2 missing but required, 6 not of the
+    datatype, 1 not in the domain list, 3 outside min:max and 8 not
+    matching the regular expression. Parameters of a datatype are
+    enforced: the length of varchar(n) and char(n), the integer digits of
+    numeric(p, s) and the range of the integer types.
+
+    Args:
+        value (str): value as read from the data file
+        datatype (str): postgres datatype of the column
+        not_null (bool): a value is required
+        domain (dict): domain as returned by parse_domain
 
     Returns:
-        dict: dictionary with parameters from file
+        int: VALUE_OK when the value is valid, else the datakwaliteit code
     """
-    with open('config/dido.yaml', encoding = 'utf8', mode = "r") as infile:
-        parameters = yaml.safe_load(infile)
+    if len(value) == 0:
+        return VALUE_MANDATORY_NOT_SPECIFIED if not_null else VALUE_OK
 
-    return parameters
+    datatype, parameters = split_datatype(datatype)
+    typed = value
+    try:
+        if datatype in INTEGER_RANGES:
+            typed = int(value)
+            low, high = INTEGER_RANGES[datatype]
+            if not low <= typed <= high:
+                return VALUE_WRONG_DATATYPE
+
+        elif datatype in ('numeric', 'decimal') and len(parameters) > 0:
+            # Postgres rounds to the scale, the integer digits may not exceed precision - scale
+            scale = parameters[1] if len(parameters) > 1 else 0
+            number = decimal.Decimal(value)
+            if not number.is_finite():
+                return VALUE_WRONG_DATATYPE
+
+            integer_part = int(abs(number.quantize(decimal.Decimal(1).scaleb(-scale))))
+            if integer_part > 0 and len(str(integer_part)) > parameters[0] - scale:
+                return VALUE_WRONG_DATATYPE
+
+            typed = float(value)
+
+        elif datatype in ('real', 'double', 'double precision', 'numeric', 'decimal'):
+            typed = float(value)
+        elif datatype in ('varchar', 'character varying', 'char', 'character', 'bpchar'):
+            # char without length is char(1), varchar without length is unlimited
+            length = parameters[0] if len(parameters) > 0 else None
+            if length is None and datatype in ('char', 'character', 'bpchar'):
+                length = 1
+
+            if length is not None and len(value) > length:
+                return VALUE_WRONG_DATATYPE
+
+        elif datatype == 'date':
+            typed = datetime.strptime(value, DATE_FORMAT)
+        elif datatype.startswith('timestamp'):
+            typed = datetime.fromisoformat(value)
+        elif datatype == 'boolean' and value.lower() not in BOOLEAN_VALUES:
+            return VALUE_WRONG_DATATYPE
+
+    except (ValueError, decimal.InvalidOperation):
+        return VALUE_WRONG_DATATYPE
 
-### load_parameters ###
+    # try..except
 
+    if domain['kind'] == 'list':
+        return VALUE_OK if value in domain['values'] else VALUE_NOT_IN_LIST
 
-def create_data_types():
-    parameters = load_parameters()
-    basis_types = parameters['BASIC_TYPES']
-    sub_types = parameters['SUB_TYPES']
-    data_types = {}
+    if domain['kind'] == 're':
+        return VALUE_OK if domain['pattern'].fullmatch(value) is not None else VALUE_NOT_CONFORM_RE
 
-    # enumerate over all sub_types
-    for key in sub_types.keys():
-        type_list = sub_types[key]
+    if domain['kind'] == 'range':
+        try:
+            convert = datetime.fromisoformat if isinstance(typed, datetime) else type(typed)
+            if domain['min'] is not None and typed < convert(domain['min']):
+                return VALUE_NOT_BETWEEN_MINMAX
+            if domain['max'] is not None and typed > convert(domain['max']):
+                return VALUE_NOT_BETWEEN_MINMAX
 
-        # enumerate over each sub_type in the argument list
-        for sub_type in type_list:
-            # Assign type definition from basic type to subtype
-            data_types[sub_type] = basis_types[key]
+        except ValueError:
+            return VALUE_OK
 
-        # for
-    # for
+        # try..except
+    # if
 
-    logger.debug(f'Data types:\n {data_types}')
+    return VALUE_OK
 
-    return data_types, sub_types
+### check_value ###
 
-### create_data_types ###
 
+def read_schema_file(filename: str) -> pd.DataFrame:
+    """ mutation schema file
 
-def load_sql() -> str:
-    """ read the SQL support functions if available
+    Args:
+        filename -- csv schema file
 
     Returns:
-        str: SQL statements as a string
+        contents
     """
-    sql = ''
-    with open('config/dido_functions.sql', encoding = 'utf8', mode = "r") as infile:
-        sql = infile.read().strip()
+    import pandas as pd
 
-    return sql
+    schema = pd.read_csv(filename, sep = ';', quotechar = '"', keep_default_na = False, encoding = 'UTF-8')
 
-### load_sql ###
+    # Postgres surrounds text by "'"; use double single quotes to have them accepted
+    schema['beschrijving'] = schema['beschrijving'].str.replace("'", "''")
 
+    # Two spaces at line end ensures newline in markdown
+    schema['beschrijving'] = schema['beschrijving'].str.replace("\n", "  \n")
 
-def load_pgpass(host: str, port: str, db: str, user: str = ''):
-    """ Searches for a password in .pgpass
+    return schema
 
-    Function implements algorithm as described in:
-    https://www.postgresql.org/docs/current/libpq-pgpass.html
-    An field in an entry may be * in which case no selection is made for that field.
+### read_schema_file ###
 
-    Args:
-        host (str, optional): hostname or IP.
-        port (str, optional): port.
-        db (str, optional): database name.
-        user (str, optional): user name . Defaults to ''.
 
-    Returns:
-        None: if .pgpass is not found in the user root
-        (None, None): if no entries match the criteria
-        (str, str): (user name, password) of the first matching entry
+XLSX_EXTENSIONS = ['.xlsx', '.xlsm']
 
-    Example:
-        credentials = load_pgpass(host = '10.10.12.12', db = '*')
-        if credentials is None:
-            print('No .pgpass file found')
 
-        else:
-            (user, pw) = credentials
-            if user is None or pw is None:
-                print('No matching entry in .pgpass found')
+def iter_xlsx_rows(filename: str, sheet: str = None):
+    """ Yields the rows of an Excel sheet as lists of strings
 
-            else: # use and pw contain selected user and password in .pgpass
-                print(user) # never print passwords
+    The workbook is opened read-only, so rows are streamed from the file and
+    memory use does not grow with the number of rows. Values are converted
+    as they would appear in a ';' csv: empty cells become '', dates and
+    times are formatted with DATE_FORMAT and DATETIME_FORMAT and whole
+    floats lose their '.0'. Rows are cut to the width of the first row
+    (the header) and empty rows are skipped.
+
+    Args:
+        filename (str): name of the .xlsx file
+        sheet (str, optional): name of the sheet. Defaults to None: the first sheet.
+
+    Raises:
+        DiDoError: when the sheet does not exist
     """
+    import openpyxl
 
-    # check if a .pgpass exists, if not: return None
-    pgpass_filename = os.path.expanduser('~/.pgpass')
-    if os.path.isfile(pgpass_filename):
-        pgpass = pd.read_csv(
-            pgpass_filename,
-            sep = ':',
-            dtype = str,
-            keep_default_na = False,
-            header = None,
-            index_col = None,
-            engine = 'python',
-            encoding = 'utf8',
-        )
+    workbook = openpyxl.load_workbook(filename, read_only = True, data_only = True)
+    try:
+        if sheet is not None and sheet not in workbook.sheetnames:
+            raise DiDoError(f'*** Sheet "{sheet}" not found in {filename}, '
+                            f'sheets are: {", ".join(workbook.sheetnames)}')
+
+        worksheet = workbook[sheet] if sheet is not None else workbook.worksheets[0]
+        width = None
+        for values in worksheet.iter_rows(values_only = True):
+            row = []
+            for value in values:
+                if value is None:
+                    value = ''
+                elif isinstance(value, datetime):
+                    value = value.strftime(DATETIME_FORMAT if value.time() != datetime.min.time() else DATE_FORMAT)
+                elif isinstance(value, date):
+                    value = value.strftime(DATE_FORMAT)
+                elif isinstance(value, float) and value.is_integer():
+                    value = str(int(value))
+                else:
+                    value = str(value)
 
-    else:
-        return None
+                row.append(value)
 
-    # if host is specified select for host
-    pgpass_host = pgpass.iloc[:, 0]
-    pgpass = pgpass.loc[(pgpass_host == host) | (pgpass_host == '*')]
-    logger.debug(f'Host - host: {host}, port: {port}, database: {db}, user: {user}: {len(pgpass)}')
+            # for
 
-    # if port is specified select for port
-    port = str(port) # force the port to be an integer
-    pgpass_port = pgpass.iloc[:, 1]
-    pgpass = pgpass.loc[(pgpass_port == port) | (pgpass_port == '*')]
-    logger.debug(f'Port - host: {host}, port: {port} and database: {db} user: {user}: {len(pgpass)}')
+            if width is None:
+                # the header determines the number of columns
+                while len(row) > 0 and row[-1] == '':
+                    row.pop()
 
-    # if database is specified select for database
-    pgpass_db = pgpass.iloc[:, 2]
-    pgpass = pgpass.loc[(pgpass_db == db) | (pgpass_db == '*')]
-    logger.debug(f'Db - host: {host}, port: {port} and database: {db} user: {user}: {len(pgpass)}')
+                width = len(row)
 
-    # if user is specified select for user
-    if len(user) > 0:
-        pgpass_user = pgpass.iloc[:, 3]
-        pgpass = pgpass.loc[(pgpass_user == user) | (pgpass_user == '*')]
-        logger.debug(f'User - host: {host}, port: {port} and database: {db} user: {user}: {len(pgpass)}')
+            row = row[:width] + [''] * (width - len(row))
+            if any([len(value) > 0 for value in row]):
+                yield row
 
-    # when no match is found, return (None, None)
-    if len(pgpass) < 1:
+        # for
+
+    finally:
+        workbook.close()
+
+    # try..finally
+
+### iter_xlsx_rows ###
+
+
+def xlsx_to_csv(filename: str, csv_name: str, sheet: str = None, delimiter: str = ';') -> int:
+    """ Converts an Excel sheet to a csv file, row by row
+
+    Args:
+        filename (str): name of the .xlsx file
+        csv_name (str): name of the csv file to write
+        sheet (str, optional): name of the sheet. Defaults to None: the first sheet.
+        delimiter (str, optional): column delimiter. Defaults to ';'.
+
+    Returns:
+        int: number of rows written, including the header
+    """
+    import csv
+
+    n_rows = 0
+    with open(csv_name, 'w', encoding = 'utf8', newline = '') as outfile:
+        writer = csv.writer(outfile, delimiter = delimiter)
+        for row in iter_xlsx_rows(filename, sheet):
+            writer.writerow(row)
+            n_rows += 1
+
+        # for
+    # with
+
+    logger.debug('%s converted to %s: %d rows', filename, csv_name, n_rows)
+
+    return n_rows
+
+### xlsx_to_csv ###
+
+
+def as_csv_file(filename: str, work_dir: str, sheet: str = None) -> str:
+    """ Returns the name of a ';' csv file with the contents of filename
+
+    Excel files are converted into work_dir with the extension .csv, other
+    files are returned unchanged.
+
+    Args:
+        filename (str): name of a .csv or .xlsx file
+        work_dir (str): directory for the converted file
+        sheet (str, optional): sheet of an Excel file. Defaults to None: the first sheet.
+
+    Returns:
+        str: name of the csv file
+    """
+    fn, ext = splitext(basename(filename))
+    if ext.lower() not in XLSX_EXTENSIONS:
+        return filename
+
+    os.makedirs(work_dir, exist_ok = True)
+    csv_name = join(work_dir, fn + '.csv')
+    xlsx_to_csv(filename, csv_name, sheet)
+
+    return csv_name
+
+### as_csv_file ###
+
+
+def report_ram(message: str):
+    import psutil
+
+    logger = logging.getLogger()
+    mem = psutil.virtual_memory()
+
+    logger.info('')
+    logger.info(message)
+    logger.info(f'   Total memory:    {mem.total:,}')
+    logger.info(f'   Memory used:     {mem.used:,}')
+    logger.info(f'   Memory available {mem.available:,}')
+
+    return
+
+### report_ram ###
+
+
+class MemoryGovernor:
+    """ Derives chunk sizes and worker counts from the available memory
+
+    Available memory is read with psutil when the governor is created and
+    again when it is older than refresh seconds, so chunk sizes follow the
+    memory left during a run. Only fraction of the available memory is
+    used, the rest is left to Postgres and other processes.
+
+    Args:
+        fraction (float): part of the available memory to use
+        worker_bytes (int): memory needed by one worker besides its chunks
+        min_chunk_rows (int): lower bound of chunk_rows
+        max_chunk_rows (int): upper bound of chunk_rows
+        max_workers (int): upper bound of workers, None means number of cpu's
+        refresh (float): seconds after which available memory is read again
+    """
+    def __init__(self,
+                 fraction: float = 0.5,
+                 worker_bytes: int = 256 * 1024 * 1024,
+                 min_chunk_rows: int = 1000,
+                 max_chunk_rows: int = 1_000_000,
+                 max_workers: int = None,
+                 refresh: float = 5.0,
+                ):
+        self.fraction = fraction
+        self.worker_bytes = worker_bytes
+        self.min_chunk_rows = min_chunk_rows
+        self.max_chunk_rows = max_chunk_rows
+        self.max_workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+        self.refresh = refresh
+        self.lock = threading.Lock()
+        self.read_at = 0.0
+        self.available_bytes = 0
+
+    ### __init__ ###
+
+    def available(self) -> int:
+        """ Returns the available memory in bytes, read at most every refresh seconds
+        """
+        import psutil
+
+        with self.lock:
+            if time.monotonic() - self.read_at > self.refresh:
+                self.available_bytes = psutil.virtual_memory().available
+                self.read_at = time.monotonic()
+
+            # if
+
+            return self.available_bytes
+
+        # with
+
+    ### available ###
+
+    def budget(self, share: float = 1.0) -> int:
+        """ Returns the number of bytes a task may use
+
+        Args:
+            share (float, optional): part of the budget, e.g. 1 / workers. Defaults to 1.0.
+        """
+        return int(self.available() * self.fraction * share)
+
+    ### budget ###
+
+    def workers(self, wanted: int = None) -> int:
+        """ Returns the number of workers that fit in memory
+
+        Args:
+            wanted (int, optional): number of workers asked for, e.g. the number
+                of suppliers. Defaults to None: as many as fit.
+
+        Returns:
+            int: at least 1, at most wanted, max_workers and budget / worker_bytes
+        """
+        workers = min(self.max_workers, max(1, self.budget() // self.worker_bytes))
+        if wanted is not None:
+            workers = min(workers, max(1, wanted))
+
+        return int(workers)
+
+    ### workers ###
+
+    def chunk_rows(self, row_bytes: float, workers: int = 1) -> int:
+        """ Returns the number of rows to read, validate or copy at once
+
+        Args:
+            row_bytes (float): bytes of one row in memory
+            workers (int, optional): workers sharing the budget. Defaults to 1.
+
+        Returns:
+            int: rows per chunk between min_chunk_rows and max_chunk_rows
+        """
+        rows = self.budget(1 / max(1, workers)) // max(1, int(row_bytes))
+
+        return int(min(self.max_chunk_rows, max(self.min_chunk_rows, rows)))
+
+    ### chunk_rows ###
+
+    def report(self):
+        """ Logs the memory budget and the number of workers
+        """
+        logger.info(f'Memory available: {self.available() / 1e6:,.0f} MB, '
+                    f'budget: {self.budget() / 1e6:,.0f} MB, workers: {self.workers()}')
+
+        return
+
+    ### report ###
+
+### Class: MemoryGovernor ###
+
+
+# governor used by functions that are not passed one, see init_memory_governor
+memory_governor = None
+
+
+def init_memory_governor(config: dict) -> MemoryGovernor:
+    """ Creates the memory governor from the MEMORY section of config
+
+    Args:
+        config (dict): project configuration
+
+    Returns:
+        MemoryGovernor: the governor, also returned by get_memory_governor
+    """
+    global memory_governor
+
+    memory = get_par(config, 'MEMORY', {})
+    if memory is None:
+        memory = {}
+
+    max_workers = get_par(memory, 'max_workers', None)
+    memory_governor = MemoryGovernor(
+        fraction = float(get_par(memory, 'fraction', 0.5)),
+        worker_bytes = int(get_par(memory, 'worker_mb', 256)) * 1024 * 1024,
+        min_chunk_rows = int(get_par(memory, 'min_chunk_rows', 1000)),
+        max_chunk_rows = int(get_par(memory, 'max_chunk_rows', 1_000_000)),
+        max_workers = int(max_workers) if max_workers else None,
+        refresh = float(get_par(memory, 'refresh_seconds', 5.0)),
+    )
+
+    return memory_governor
+
+### init_memory_governor ###
+
+
+def get_memory_governor() -> MemoryGovernor:
+    """ Returns the memory governor, a default one when not initialized
+    """
+    global memory_governor
+
+    if memory_governor is None:
+        memory_governor = MemoryGovernor()
+
+    return memory_governor
+
+### get_memory_governor ###
+
+
+# metrics of pipeline stages, see measure_stage
+metrics: list = []
+metrics_file: str = None
+
+
+def init_metrics(filename: str, reset: bool = True):
+    """ Sets the JSON-lines file to write stage metrics to
+
+    Metrics recorded before this call (e.g. of reading the config, which is
+    needed to know WORK_DIR) are written to the file immediately.
+
+    Args:
+        filename (str): name of the metrics file, usually in WORK_DIR/logs
+        reset (bool, optional): empty the file first. Defaults to True.
+    """
+    global metrics_file
+
+    metrics_file = filename
+    with open(metrics_file, 'w' if reset else 'a', encoding = 'utf8') as outfile:
+        for record in metrics:
+            outfile.write(json.dumps(record) + '\n')
+
+    return
+
+### init_metrics ###
+
+
+# the sampler of the outermost stage, shared by nested stages
+active_sampler = None
+sampler_lock = threading.Lock()
+
+
+class RssSampler(threading.Thread):
+    """ Samples the resident set size of this process in the background
+
+    Args:
+        interval (float): seconds between samples
+    """
+    def __init__(self, interval: float = 0.05):
+        import psutil
+
+        super().__init__(daemon = True)
+        self.interval = interval
+        self.process = psutil.Process()
+        self.peak = self.process.memory_info().rss
+        self.halt = threading.Event()
+
+    ### __init__ ###
+
+    def run(self):
+        while not self.halt.wait(self.interval):
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+    ### run ###
+
+    def stop(self) -> int:
+        self.halt.set()
+        self.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+        return self.peak
+
+    ### stop ###
+
+### Class: RssSampler ###
+
+
+@contextlib.contextmanager
+def measure_stage(stage: str):
+    """ Measures wall time, cpu time, peak rss and row count of a stage
+
+    The yielded record can be used to set the number of rows processed in
+    the stage. When the stage is ready the record is added to metrics and
+    written to metrics_file when set by init_metrics.
+
+    Only the outermost stage starts an RssSampler thread. Stages running
+    while another stage is measured (e.g. db_io inside load) report the peak
+    rss of the outer sampler so far, so nested stages do not add threads
+    that skew their timing.
+
+    Example:
+        with dc.measure_stage('load') as stage:
+            tables = load_schemas(...)
+            stage['rows'] = len(tables)
+
+    Args:
+        stage (str): name of the stage
+
+    Yields:
+        dict: the metrics record of the stage
+    """
+    record = {
+        'stage': stage,
+        'start': datetime.now().strftime(DATETIME_FORMAT),
+        'rows': None,
+    }
+    global active_sampler
+
+    with sampler_lock:
+        sampler = active_sampler
+        outer = sampler is None
+        if outer:
+            sampler = RssSampler()
+            sampler.start()
+            active_sampler = sampler
+
+        # if
+    # with
+
+    rss_start = sampler.peak
+    wall = time.perf_counter()
+    cpu = time.process_time()
+
+    try:
+        yield record
+
+    finally:
+        record['wall_seconds'] = round(time.perf_counter() - wall, 4)
+        record['cpu_seconds'] = round(time.process_time() - cpu, 4)
+        if outer:
+            with sampler_lock:
+                active_sampler = None
+
+            record['peak_rss'] = sampler.stop()
+
+        else:
+            record['peak_rss'] = sampler.peak
+
+        # if
+
+        record['rss_start'] = rss_start
+        metrics.append(record)
+
+        if metrics_file is not None:
+            with open(metrics_file, 'a', encoding = 'utf8') as outfile:
+                outfile.write(json.dumps(record) + '\n')
+
+        # if
+
+        logger.debug('Stage %s: %s s, peak rss %d', stage, record['wall_seconds'], record['peak_rss'])
+
+    # try..finally
+
+### measure_stage ###
+
+
+def report_metrics():
+    """ Logs a summary table of all measured stages
+    """
+    if len(metrics) == 0:
+        return
+
+    logger.info('')
+    logger.info(f'{"Stage":<20} {"Wall (s)":>10} {"CPU (s)":>10} {"Peak RSS (MB)":>14} {"Rows":>10}')
+    logger.info(f'{20 * "-"} {10 * "-"} {10 * "-"} {14 * "-"} {10 * "-"}')
+
+    for record in metrics:
+        rows = '' if record['rows'] is None else f'{record["rows"]:,}'
+        logger.info(f'{record["stage"]:<20} {record["wall_seconds"]:>10.3f} '
+                    f'{record["cpu_seconds"]:>10.3f} {record["peak_rss"] / 2**20:>14.1f} '
+                    f'{rows:>10}')
+
+    # for
+
+    logger.info('')
+
+    return
+
+### report_metrics ###
+
+
+def get_par(config: dict, key: str, default = None):
+    """ Gets the value of a key from a dictionary or DataFrame index
+
+    when config is a dictionary its key is fetched, when it is a dataframe
+    the key is looked up from the index.
+
+    In both cases applies that when a key is not found the default is returned.
+
+    Args:
+        config (dict): dictuionary or DataFrame to fetch the value from
+        key (str): value to find in dictionary
+        default (_type_, optional): default when value is not in dict. Defaults to None.
+    """
+    # config can only be a DataFrame when pandas has been imported
+    if 'pandas' in sys.modules and isinstance(config, sys.modules['pandas'].DataFrame):
+        # config is DataFrame, look for key in index
+        if key in config.index:
+            return str(config.loc[key])
+
+        else:
+            return default
+
+    else:
+        # dictionary, return config[key] when present
+        if key in config:
+            # DataFrames from a config snapshot are decoded on first use
+            if is_encoded_dataframe(config[key]):
+                config[key] = decode_dataframe(config[key])
+
+            return config[key]
+
+        else:
+            return default
+
+### get_par ###
+
+
+def get_par_par(config: dict, key_1: str, key_2: str, default = None):
+    """ Gets the value of a key from a dictionary from which the result is a dictionary
+
+   Key_1 points to a dictionary inside the dictionary, key_2 points to a
+   value inside that dictionary. When either is not found default is returned
+
+    Args:
+        config (dict): dictuionary or DataFrame to fetch the value from
+        key_1 (str): value to find in config
+        key_2 (str): value to find in config[key_1]
+        default (_type_, optional): default when value is not in dict. Defaults to None.
+    """
+
+    # dictionary, return config[key] when present
+    if key_1 in config:
+        sub_config = config[key_1]
+
+        if key_2 in sub_config:
+            return sub_config[key_2]
+
+        else:
+            return default
+
+    else:
+        return default
+
+### get_par ###
+
+
+def read_cli():
+    """ Read command line arguments
+
+    Returns:
+        str: path to the application
+        object: argparse arguments
+    """
+    pad, fn, ext = split_filename(sys.argv[0])
+    app_path = {'path': pad, 'name': fn, 'ext': ext}
+
+    argParser = argparse.ArgumentParser()
+    argParser.add_argument("-c", "--compare", help="Compare action: 'dump' or 'compare'",
+                           choices=['compare', 'dump'],
+                           default='compare', const='compare', nargs='?')
+    argParser.add_argument("-d", "--delivery", help="Name of delivery file in root/data directory")
+    argParser.add_argument("--date", help="Date to take snapshot of database ")
+    argParser.add_argument("--dry-run", help="Estimate the cost of loading the deliveries without loading them",
+                           action='store_true', dest='dry_run')
+    argParser.add_argument("-p", "--project", help="Path to project directory")
+    argParser.add_argument("-r", "--reset", help="Empties the logfile before writing it",
+                           action='store_const', const='reset')
+    argParser.add_argument("-s", "--supplier", help="Name of supplier")
+    argParser.add_argument("-t", "--target", help="File name to read target data from")
+    argParser.add_argument("-v", "--view", help="View database table in dido_compare",
+                           action='store_const', const='view' )
+    argParser.add_argument("--Yes",  help="Answer Yes to all questions",
+                           action='store_const', const='Ja')
+
+    args = argParser.parse_args()
+
+    return  app_path, args
+
+### read_cli ###
+
+
+def load_parameters() -> dict:
+    """ Laadt parameters uit config file
+
+    Returns:
+        dict: dictionary with parameters from file
+    """
+    import yaml
+
+    with open('config/dido.yaml', encoding = 'utf8', mode = "r") as infile:
+        parameters = yaml.safe_load(infile)
+
+    return parameters
+
+### load_parameters ###
+
+
+def create_data_types():
+    parameters = load_parameters()
+    basis_types = parameters['BASIC_TYPES']
+    sub_types = parameters['SUB_TYPES']
+    data_types = {}
+
+    # enumerate over all sub_types
+    for key in sub_types.keys():
+        type_list = sub_types[key]
+
+        # enumerate over each sub_type in the argument list
+        for sub_type in type_list:
+            # Assign type definition from basic type to subtype
+            data_types[sub_type] = basis_types[key]
+
+        # for
+    # for
+
+    logger.debug('Data types:\n %s', data_types)
+
+    return data_types, sub_types
+
+### create_data_types ###
+
+
+def load_sql() -> str:
+    """ read the SQL support functions if available
+
+    Returns:
+        str: SQL statements as a string
+    """
+    sql = ''
+    with open('config/dido_functions.sql', encoding = 'utf8', mode = "r") as infile:
+        sql = infile.read().strip()
+
+    return sql
+
+### load_sql ###
+
+
+def load_pgpass(host: str, port: str, db: str, user: str = ''):
+    """ Searches for a password in .pgpass
+
+    Function implements algorithm as described in:
+    https://www.postgresql.org/docs/current/libpq-pgpass.html
+    An field in an entry may be * in which case no selection is made for that field.
+
+    Args:
+        host (str, optional): hostname or IP.
+        port (str, optional): port.
+        db (str, optional): database name.
+        user (str, optional): user name . Defaults to ''.
+
+    Returns:
+        None: if .pgpass is not found in the user root
+        (None, None): if no entries match the criteria
+        (str, str): (user name, password) of the first matching entry
+
+    Example:
+        credentials = load_pgpass(host = '10.10.12.12', db = '*')
+        if credentials is None:
+            print('No .pgpass file found')
+
+        else:
+            (user, pw) = credentials
+            if user is None or pw is None:
+                print('No matching entry in .pgpass found')
+
+            else: # use and pw contain selected user and password in .pgpass
+                print(user) # never print passwords
+    """
+    # check if a .pgpass exists, if not: return None
+    pgpass_filename = os.path.expanduser('~/.pgpass')
+    if not os.path.isfile(pgpass_filename):
+        return None
+
+    # fields are separated by ':', a backslash escapes ':' and itself
+    entries = []
+    with open(pgpass_filename, encoding = 'utf8') as infile:
+        for line in infile.read().splitlines():
+            if len(line.strip()) == 0 or line.startswith('#'):
+                continue
+
+            fields = ['']
+            escaped = False
+            for char in line:
+                if escaped:
+                    fields[-1] += char
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == ':' and len(fields) < 5:
+                    fields.append('')
+                else:
+                    fields[-1] += char
+
+            # for
+
+            if len(fields) == 5:
+                entries.append(fields)
+
+        # for
+    # with
+
+    # select host, port, database and user (when specified); * matches all
+    port = str(port) # force the port to be a string
+    selection = [(0, 'Host', host), (1, 'Port', port), (2, 'Db', db)]
+    if len(user) > 0:
+        selection.append((3, 'User', user))
+
+    for field, name, value in selection:
+        entries = [entry for entry in entries if entry[field] in (value, '*')]
+        logger.debug('%s - host: %s, port: %s, database: %s, user: %s: %d',
+                     name, host, port, db, user, len(entries))
+
+    # for
+
+    # when no match is found, return (None, None)
+    if len(entries) < 1:
         logger.warning(f'No candidate left in .pgpass after applying host: {host}, '
                         f'port: {port}, db: {db} and user: {user}')
         return (None, None)
 
-    logger.debug(f'{len(pgpass)} candidates left in .pgpass after applying host: {host}, '
-                 f'port: {port}, db: {db} and user: {user}. First picked')
+    logger.debug('%d candidates left in .pgpass after applying host: %s, '
+                 'port: %s, db: %s and user: %s. First picked', len(entries), host, port, db, user)
+
+    return (entries[0][3], entries[0][4])
+
+### load_pgpass ###
+
+
+def read_config(project_dir: str, use_snapshot: bool = True) -> dict:
+    """ Reads config and environment file and initializes variables.
+
+    The config file is read from the <project_dir>/config directory, just like
+    the .env file. The config file is read as a dictionary into the config variable.
+    The servers declared in the SERVER_CONFIGS section are updated with the
+    credentials of .env.
+
+    Next, program wide parameters are read from the ODL database: odl_parameters
+    and odl_rapportageperiodes. These are assigned to the config dictionary.
+
+    The resolved configuration, without credentials, is stored in a snapshot
+    file (see save_config_snapshot). As long as none of the input files
+    changed, subsequent calls start from that snapshot and do not contact
+    the database. Credentials are always read again from .pgpass and .env.
+
+    Args:
+        project_dir (str): directory path pointing to the root of the
+            project directory. Subdirectories are at least: config, root and work.
+        use_snapshot (bool, optional): start from the config snapshot when
+            it is valid. Defaults to True.
+
+    Returns:
+        dict: the config dictionary enriched with additional information
+    """
+    snapshot_name = os.path.join(project_dir, 'config', CONFIG_SNAPSHOT)
+    inputs = get_config_inputs(project_dir)
+
+    if use_snapshot:
+        config = load_config_snapshot(snapshot_name, inputs)
+        if config is not None:
+            logger.info(f'[Bootstrap: {snapshot_name}]')
+            assign_credentials(config, project_dir)
+
+            return config
+
+        # if
+    # if
+
+    import yaml
+
+    # read the configfile
+    configfile = os.path.join(project_dir, 'config', 'config.yaml')
+    logger.info(f'[Bootstrap: {configfile}]')
+    with open(configfile, encoding = 'utf8', mode = "r") as infile:
+        config = yaml.safe_load(infile)
+
+    sql = load_sql()
+
+    item_names = ['ROOT_DIR', 'WORK_DIR', 'PROJECT_NAME', 'HOST',
+                  'SERVER_CONFIGS']
+    errors = False
+    for item in item_names:
+        if item not in config.keys():
+            errors = True
+            logger.critical(f'{item} not specified in config.yaml')
+
+    if errors:
+        raise DiDoError('Er ontbreken elementen in config.yaml, zie hierboven')
+
+    config['ROOT_DIR'] = os.path.join(project_dir, config['ROOT_DIR'])
+    config['WORK_DIR'] = os.path.join(project_dir, config['WORK_DIR'])
+    config['SQL_SUPPORT'] = sql
+
+    # load dido.yaml
+    parameters = load_parameters()
+
+    # check if the server to use exists
+    host = config['HOST'].lower().strip()
+    if host not in parameters['SERVERS'].keys():
+        for server in parameters.keys():
+            logger.info(f' - {server}')
+
+        raise DiDoError(f'*** Server to use in config file {host} is not among the allowed servers')
+
+    # find IP belonging to host
+    host_ip = parameters['SERVERS'][host]
+
+    logger.debug('Server configs: %s', config['SERVER_CONFIGS'])
+
+    # assign the server to the server_configs in the config file
+    for server in config['SERVER_CONFIGS']:
+        config['SERVER_CONFIGS'][server]['POSTGRES_HOST'] = host_ip
+
+    # assign these tot the config file
+    config['PARAMETERS'] = parameters
+
+    # the snapshot is taken before any credential is added
+    snapshot = copy.deepcopy(config)
+
+    # Credentials
+    assign_credentials(config, project_dir)
+
+    # fetch rapportage leveringsperiodes from odl
+    odl_server = config['SERVER_CONFIGS']['ODL_SERVER_CONFIG']
+    #odl_server['POSTGRES_HOST'] = '10.10.12.6'
+
+    # when initializing a new database odl_)rapportageperiodes does not exist, assign None
+    try:
+        rapportage_periodes = load_odl_table('odl_rapportageperiodes_description', odl_server)
+        config['REPORT_PERIODS'] = rapportage_periodes
+
+    except:
+        logger.warning('!!! No odl_rapportageperiodes_description present. You are creating a new database?')
+
+    # only snapshot a complete configuration, else retry the database next time
+    if 'REPORT_PERIODS' in config:
+        snapshot['REPORT_PERIODS'] = config['REPORT_PERIODS']
+        save_config_snapshot(snapshot_name, snapshot, inputs)
+
+    return config
+
+### read_config ###
+
+
+def assign_credentials(config: dict, project_dir: str):
+    """ Assigns user name and password to each server in SERVER_CONFIGS
+
+    Credentials are looked up in ~/.pgpass first, when not found there
+    config/.env is used. Other settings of .env are added to config.
+
+    Args:
+        config (dict): configuration with POSTGRES_HOST assigned to each server
+        project_dir (str): project directory containing config/.env
+    """
+    env = load_credentials(project_dir)
+    if 'POSTGRES_USER' in env.keys():
+        user = env['POSTGRES_USER']
+    else:
+        user = ''
+
+    # assign env credentials to the server_configs in the config file
+    for server in config['SERVER_CONFIGS']:
+        host_ip = config['SERVER_CONFIGS'][server]['POSTGRES_HOST']
+        port = config['SERVER_CONFIGS'][server]['POSTGRES_PORT']
+        db = config['SERVER_CONFIGS'][server]['POSTGRES_DB']
+
+        # check for user name and pw in .pgpass resp. .env
+        creds = load_pgpass(host = host_ip, port = port, db = db, user = user)
+
+        # if .pgpass not found or entries in .pgpass not found
+        if creds is None or creds == (None, None):
+            try:
+                config['SERVER_CONFIGS'][server]['POSTGRES_USER'] = user
+                config['SERVER_CONFIGS'][server]['POSTGRES_PW'] = env['POSTGRES_PASSWORD']
+            except:
+                raise DiDoError('No valid credentials found in .pgpass or config/.env')
+
+        # .pgpass found with correct entries
+        else:
+            config['SERVER_CONFIGS'][server]['POSTGRES_USER'] = creds[0]
+            config['SERVER_CONFIGS'][server]['POSTGRES_PW'] = creds[1]
+
+        # if
+    # for
+
+    # store other settings of .env in config
+    for key in env.keys():
+        if key not in ['POSTGRES_USER', 'POSTGRES_PASSWORD']:
+            config[key] = env[key]
+
+    return
+
+### assign_credentials ###
+
+
+def get_fanout_configs(config: dict, project_dir: str) -> dict:
+    """ Returns a server config of the ODL server for each FANOUT server
+
+    Each entry of FANOUT: servers is the name of a server in config/dido.yaml
+    or a dict with that name as server and optional host, port and db to
+    override, e.g. to use a local stand-in. Credentials are assigned as by
+    read_config.
+
+    Args:
+        config (dict): configuration as returned by read_config
+        project_dir (str): project directory containing config/.env
+
+    Raises:
+        DiDoError: when a server is not in config/dido.yaml
+
+    Returns:
+        dict: server name -> server config
+    """
+    fanout = get_par(config, 'FANOUT', {})
+    servers = get_par(fanout, 'servers', [])
+    if servers is None:
+        servers = []
+
+    known = config['PARAMETERS']['SERVERS']
+    fanout_configs = {}
+    for entry in servers:
+        if not isinstance(entry, dict):
+            entry = {'server': entry}
+
+        name = str(entry['server']).lower().strip()
+        if name not in known:
+            raise DiDoError(f'FANOUT server {name} is not among the servers in config/dido.yaml')
+
+        server_config = copy.deepcopy(config['SERVER_CONFIGS']['ODL_SERVER_CONFIG'])
+        server_config['POSTGRES_HOST'] = get_par(entry, 'host', known[name])
+        server_config['POSTGRES_PORT'] = get_par(entry, 'port', server_config['POSTGRES_PORT'])
+        server_config['POSTGRES_DB'] = get_par(entry, 'db', server_config['POSTGRES_DB'])
+        fanout_configs[name] = server_config
+
+    # for
+
+    if len(fanout_configs) > 0:
+        assign_credentials({'SERVER_CONFIGS': fanout_configs}, project_dir)
+
+    return fanout_configs
+
+### get_fanout_configs ###
+
+
+def get_config_inputs(project_dir: str) -> dict:
+    """ Returns the files read_config depends on with their mtime and size
+
+    Args:
+        project_dir (str): project directory
+
+    Returns:
+        dict: filename -> [mtime_ns, size], or None when the file does not exist
+    """
+    filenames = [
+        os.path.join(project_dir, 'config', 'config.yaml'),
+        os.path.abspath('config/dido.yaml'),
+        os.path.abspath('config/dido_functions.sql'),
+        os.path.join(project_dir, 'config', '.env'),
+        os.path.expanduser('~/.pgpass'),
+    ]
+
+    inputs = {}
+    for filename in filenames:
+        if os.path.isfile(filename):
+            stat = os.stat(filename)
+            inputs[filename] = [stat.st_mtime_ns, stat.st_size]
+        else:
+            inputs[filename] = None
+
+    # for
+
+    return inputs
+
+### get_config_inputs ###
+
+
+def file_sha256(filename: str) -> str:
+    """ Returns the sha256 hex digest of a file, None when it does not exist
+    """
+    if not os.path.isfile(filename):
+        return None
+
+    with open(filename, 'rb') as infile:
+        return hashlib.sha256(infile.read()).hexdigest()
+
+### file_sha256 ###
+
+
+def json_default(value):
+    """ Encodes the non-JSON types of a config for json.dump
+    """
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+
+    elif isinstance(value, date):
+        return {'__date__': value.isoformat()}
+
+    elif 'pandas' in sys.modules and isinstance(value, sys.modules['pandas'].DataFrame):
+        return {
+            '__dataframe__': value.columns.tolist(),
+            'dtypes': [str(dtype) for dtype in value.dtypes],
+            'rows': value.astype(object).where(value.notna(), None).values.tolist(),
+        }
+
+    elif hasattr(value, 'item'):
+        # numpy scalars
+        return value.item()
+
+    raise TypeError(f'Cannot store {type(value)} in config snapshot')
+
+### json_default ###
+
+
+def json_object_hook(value: dict):
+    """ Decodes the values encoded by json_default
+
+    DataFrames are left encoded, so reading a snapshot does not import
+    pandas; get_par decodes them on first use with decode_dataframe.
+    """
+    if '__datetime__' in value:
+        return datetime.fromisoformat(value['__datetime__'])
+
+    elif '__date__' in value:
+        return date.fromisoformat(value['__date__'])
+
+    return value
+
+### json_object_hook ###
+
+
+def is_encoded_dataframe(value) -> bool:
+    """ Returns True when value is a DataFrame encoded by json_default
+    """
+    return isinstance(value, dict) and '__dataframe__' in value
+
+### is_encoded_dataframe ###
+
+
+def decode_dataframe(value: dict) -> pd.DataFrame:
+    """ Restores a DataFrame encoded by json_default, including its dtypes
+    """
+    import pandas as pd
+
+    frame = pd.DataFrame(value['rows'], columns = value['__dataframe__'], dtype = object)
+    for col, dtype in zip(frame.columns, value.get('dtypes', [])):
+        try:
+            frame[col] = frame[col].astype(dtype)
+
+        except (TypeError, ValueError):
+            logger.debug('Column %s of snapshot kept as object instead of %s', col, dtype)
+
+        # try..except
+    # for
+
+    return frame
+
+### decode_dataframe ###
+
+
+def save_config_snapshot(filename: str, config: dict, inputs: dict):
+    """ Writes a resolved configuration to a snapshot file
+
+    The snapshot is keyed by the mtime, size and sha256 of each input file.
+    The config should not contain credentials: they are never stored.
+
+    Args:
+        filename (str): name of the snapshot file
+        config (dict): resolved configuration without credentials
+        inputs (dict): input files as returned by get_config_inputs
+    """
+    key = {}
+    for name, stat in inputs.items():
+        key[name] = None if stat is None else stat + [file_sha256(name)]
+
+    snapshot = {
+        'created': time.time(),
+        'inputs': key,
+        'config': config,
+    }
+
+    write_snapshot_file(filename, snapshot)
+
+    return
+
+### save_config_snapshot ###
+
+
+def write_snapshot_file(filename: str, snapshot: dict):
+    """ Writes a snapshot atomically: a reader never sees half a snapshot
+
+    Args:
+        filename (str): name of the snapshot file
+        snapshot (dict): created, inputs and config
+    """
+    try:
+        temp_name = filename + '.tmp'
+        with open(temp_name, 'w', encoding = 'utf8') as outfile:
+            json.dump(snapshot, outfile, default = json_default)
+
+        os.replace(temp_name, filename)
+        logger.debug('Config snapshot written to %s', filename)
+
+    except (OSError, TypeError) as e:
+        logger.warning(f'!!! Config snapshot could not be written: {e}')
+
+    # try..except
+
+    return
+
+### write_snapshot_file ###
+
+
+def load_config_snapshot(filename: str, inputs: dict, max_age: float = CONFIG_SNAPSHOT_MAX_AGE) -> dict:
+    """ Returns the configuration stored in a snapshot file when still valid
+
+    The snapshot is valid when it is younger than max_age seconds and all
+    input files are unchanged. Mtime and size are compared first, only files
+    with a different mtime are hashed.
+
+    Args:
+        filename (str): name of the snapshot file
+        inputs (dict): input files as returned by get_config_inputs
+        max_age (float, optional): maximum age in seconds
+
+    Returns:
+        dict: the configuration or None when the snapshot is not valid
+    """
+    if not os.path.isfile(filename):
+        return None
+
+    try:
+        with open(filename, encoding = 'utf8') as infile:
+            snapshot = json.load(infile, object_hook = json_object_hook)
+
+    except (OSError, ValueError):
+        logger.warning('!!! Config snapshot could not be read, ignored')
+
+        return None
+
+    # try..except
+
+    if time.time() - snapshot['created'] > max_age:
+        return None
+
+    key = snapshot['inputs']
+    if set(key.keys()) != set(inputs.keys()):
+        return None
+
+    touched = False
+    for name, stat in inputs.items():
+        stored = key[name]
+        if stat is None or stored is None:
+            if stat != stored:
+                return None
+
+        elif stat != stored[:2]:
+            if file_sha256(name) != stored[2]:
+                return None
+
+            # same content, remember the new mtime to avoid hashing next time
+            key[name] = stat + [stored[2]]
+            touched = True
+
+        # if
+    # for
+
+    if touched:
+        write_snapshot_file(filename, snapshot)
+
+    return snapshot['config']
+
+### load_config_snapshot ###
+
+
+def read_delivery_config(project_path: str, delivery_filename: str, subdir: str = 'data'):
+    """ Reads a delivery yaml file
+
+    Args:
+        project_path (str): directory containing subdir
+        delivery_filename (str): name of the delivery file, relative to subdir
+        subdir (str, optional): sub directory of project_path where the
+            delivery file resides. Defaults to 'data'.
+
+    Returns:
+        dict: contents of the delivery file
+    """
+    import yaml
+
+    delivery_filename = os.path.join(project_path, subdir, delivery_filename)
+    with open(delivery_filename, encoding = 'utf8', mode = "r") as infile:
+        delivery = yaml.safe_load(infile)
+
+    return delivery
+
+### read_delivery_config ###
+
+
+def load_credentials(project_dir: str) -> dict:
+    """ Reads the .env file as dict, returns empty dict when no file is found
+
+    Args:
+        project_dir (str): project directory of the expected config/.env file
+
+    Returns:
+        dict: the .env file as dict or an empty dict when config/.env is not found
+    """
+    import yaml
+
+    env_filename = '.env' # config['ENV']
+    env_filename = os.path.join(project_dir, os.path.join('config', env_filename))
+
+    if os.path.isfile(env_filename):
+        with open(env_filename, encoding = 'utf8', mode = "r") as envfile:
+            env = yaml.safe_load(envfile)
+
+        logger.info('Credentials read from config/.env')
+
+    else:
+        # initialize empty env dictionary
+        logger.info('No credentials file found: config/.env')
+
+        env = {}
+
+    # if
+
+    return env
+
+### load_credentials ###
+
+
+def display_dido_header(text: str = None):
+    if text is None:
+        return
+
+    dido = ' DiDo - Document Data Definition Generator '
+    if len(text) > len(dido):
+        text = text[0:len(dido)]
+
+    delta = len(dido) - len(text)
+    delta_2 = int(delta / 2)
+    front = delta_2
+    back = delta - delta_2
+    text = '*' + front * ' ' + text + back * ' ' + '*'
+    dido = '*' + dido + '*'
+    asterisks = len(dido) * '*'
+    between = '*' + (len(dido) - 2) * ' ' + '*'
+
+    logger.info('')
+    logger.info(asterisks)
+    logger.info(between)
+    logger.info(dido)
+    logger.info(between)
+    logger.info(text)
+    logger.info(between)
+    logger.info(asterisks)
+    logger.info('')
+
+    return
+
+
+def get_limits(config: dict):
+    """ Read LIMITS
+
+    Args:
+        config (dict): configuration containing the limits
+
+    Returns:
+        (tuple): the limited variables
+    """
+    max_rows = None
+    max_errors = None
+    data_test_fraction = 0 # limitations['data_test_fraction']
+
+    if 'LIMITS' in config:
+        limitations = config['LIMITS']
+        max_rows = limitations['max_rows']
+        max_errors = limitations['max_errors']
+
+        if max_rows < 1:
+            max_rows = None
+
+    return max_rows, data_test_fraction, max_errors
+
+### get_limits ###
+
+
+def load_odl_table(table_name: str, server_config: dict) -> pd.DataFrame:
+    """  Load ODL from PostgreSQL
+
+    Currently only used to load data_kwaliteit_codes. This is stored centrally
+    in the techniek/odl database.
+
+    Args:
+        table_name (str): name of the postgres table, schema is predefined
+        odl_server_config (dict): contains postgres access data of the odl server
+
+    Returns:
+        pd.DataFrame: Operationele Data Laag
+    """
+    import simple_table as st
+
+    with measure_stage('db_io') as stage:
+        result = st.sql_select(
+            table_name = table_name,
+            columns = '*',
+            sql_server_config = server_config,
+            verbose = False,
+        ).fillna('')
+
+        stage['rows'] = len(result)
+
+    # with
+
+    return result
+
+### load_odl_table ###
+
+
+def load_schema(table_name: str, server_config: dict) -> pd.DataFrame:
+    """ Load a table from a schema and database specified in server_config
+
+    Args:
+        table_name (str): name of the table to load
+        server_config (dict): dictionary containing postgres parameters
+
+    Returns:
+        pd.DataFrame: SQL table loaded from postgres
+    """
+    import simple_table as st
+
+    with measure_stage('db_io') as stage:
+        result = st.sql_select(
+            table_name = table_name,
+            columns = '*',
+            sql_server_config = server_config,
+            verbose = False,
+        ).fillna('')
+
+        stage['rows'] = len(result)
+
+    # with
+
+    return result
+
+### load_schema ###
+
+
+def get_engine(server_config: dict):
+    """ Creates an sqlalchemy engine for the database in server_config
+
+    Args:
+        server_config (dict): dictionary containing postgres parameters
+
+    Returns:
+        sqlalchemy.engine.Engine: engine connected to the database
+    """
+    import sqlalchemy
+
+    url = sqlalchemy.engine.URL.create(
+        drivername = 'postgresql+psycopg2',
+        username = server_config['POSTGRES_USER'],
+        password = server_config['POSTGRES_PW'],
+        host = server_config['POSTGRES_HOST'],
+        port = server_config['POSTGRES_PORT'],
+        database = server_config['POSTGRES_DB'],
+    )
+
+    return sqlalchemy.create_engine(url)
+
+### get_engine ###
+
+
+def table_exists(table_name: str, server_config: dict) -> bool:
+    """ Returns whether a table exists in the database of server_config
+
+    Args:
+        table_name (str): name of the table, without schema it is looked up
+            in the POSTGRES_SCHEMA of server_config
+        server_config (dict): dictionary containing postgres parameters
+
+    Returns:
+        bool: True when the table exists
+    """
+    import sqlalchemy
+
+    if '.' not in table_name:
+        table_name = f'{server_config["POSTGRES_SCHEMA"]}.{table_name}'
+
+    engine = get_engine(server_config)
+    try:
+        with measure_stage('db_io') as stage, engine.connect() as conn:
+            result = conn.execute(
+                sqlalchemy.text('SELECT to_regclass(:name) IS NOT NULL'),
+                {'name': table_name},
+            ).scalar()
+            stage['rows'] = 1
+
+        # with
+
+    finally:
+        engine.dispose()
+
+    # try..finally
+
+    return bool(result)
+
+### table_exists ###
+
+
+def next_version(version: str, major_update: bool, minor_update: bool) -> tuple:
+    """ Computes the next ODL version
+
+    A major update increments major and resets minor and patch, a minor
+    update increments minor and resets patch, else patch is incremented.
+
+    Args:
+        version (str): current version as major.minor.patch
+        major_update (bool): increment the major version
+        minor_update (bool): increment the minor version
+
+    Raises:
+        DiDoError: when both major_update and minor_update are set
+
+    Returns:
+        tuple: (new version string, major, minor, patch, update type)
+    """
+    if major_update and minor_update:
+        raise DiDoError('Config: Major and Minor version update are set. Only one (or neither) may be set.')
+
+    major, minor, patch = [int(part) for part in version.split('.')]
+
+    if major_update:
+        major, minor, patch = major + 1, 0, 0
+        update_type = 'major'
+
+    elif minor_update:
+        minor, patch = minor + 1, 0
+        update_type = 'minor'
+
+    else:
+        patch += 1
+        update_type = 'patch'
+
+    # if
+
+    return f'{major}.{minor}.{patch}', major, minor, patch, update_type
+
+### next_version ###
+
+
+# table of the ODL model recording each applied version, see odl_version_sql
+ODL_VERSION_HISTORY = 'odl_version_history'
+
+
+def current_odl_version(server_config: dict, meta_table: str) -> str:
+    """ Returns the current ODL version as recorded in the database
+
+    The version is the last one in odl_version_history_data; when that table
+    does not exist or is empty, the odl_version of meta_table is used.
+
+    Args:
+        server_config (dict): database containing the ODL
+        meta_table (str): name of the table containing the current odl_version
+
+    Returns:
+        str: the version, None when neither table contains one
+    """
+    import sqlalchemy
+
+    schema = server_config['POSTGRES_SCHEMA']
+    history = f'{schema}.{ODL_VERSION_HISTORY}_data'
+
+    engine = get_engine(server_config)
+    with measure_stage('db_io') as stage, engine.connect() as conn:
+        version = None
+        for table_name, order in [(history, 'ORDER BY volgnummer DESC'), (f'{schema}.{meta_table}', '')]:
+            exists_table = conn.execute(
+                sqlalchemy.text('SELECT to_regclass(:name) IS NOT NULL'),
+                {'name': table_name},
+            ).scalar()
+            if exists_table:
+                version = conn.execute(sqlalchemy.text(
+                    f'SELECT {ODL_VERSION} FROM {table_name} {order} LIMIT 1'
+                )).scalar()
+
+            if version is not None and len(str(version).strip()) > 0:
+                break
+
+        # for
+
+        stage['rows'] = 1
+
+    # with
+
+    engine.dispose()
+
+    return None if version is None or len(str(version).strip()) == 0 else str(version)
+
+### current_odl_version ###
+
+
+def odl_version_sql(schema_name: str,
+                    attributes: list,
+                    previous: str,
+                    version: str,
+                    update_type: str,
+                   ) -> str:
+    """ Returns SQL that records a new ODL version when the SQL is applied
+
+    The statements are part of the generated SQL file, so a version is
+    only recorded when the SQL is actually applied. odl_version_history_data
+    is created when it does not exist and is never dropped. An advisory lock
+    serializes concurrent applications; when the last recorded version is
+    no longer previous, another run got there first and the transaction is
+    rolled back, so no two runs apply the same version.
+
+    Args:
+        schema_name (str): postgres schema name
+        attributes (list): schema rows of odl_version_history
+        previous (str): the version the new version was derived from, None
+            when unknown: the version is then only recorded when not present
+        version (str): the new version
+        update_type (str): major, minor, patch or initial
+
+    Returns:
+        str: SQL statements
+    """
+    history = f'{schema_name}.{ODL_VERSION_HISTORY}_data'
+    definitions = ',\n   '.join(column_definitions(attributes))
+    major, minor, patch = [int(part) for part in version.split('.')]
+    version_literal = sql_literal(version, 'text')
+    update_literal = sql_literal(update_type, 'text')
+
+    sql = f'CREATE TABLE IF NOT EXISTS {history}\n(\n   {definitions}\n);\n\n'
+    sql += 'DO $$\n'
+    sql += 'DECLARE\n'
+    sql += '    v_latest text;\n'
+    sql += 'BEGIN\n'
+    sql += "    PERFORM pg_advisory_xact_lock(hashtext('odl_version'));\n"
+    sql += f'    SELECT {ODL_VERSION} INTO v_latest FROM {history} ORDER BY volgnummer DESC LIMIT 1;\n'
+    if previous is None:
+        sql += f'    IF EXISTS (SELECT 1 FROM {history} WHERE {ODL_VERSION} = {version_literal}) THEN\n'
+        sql += '        RETURN;\n'
+    else:
+        previous_literal = sql_literal(previous, 'text')
+        sql += f'    IF v_latest IS NOT NULL AND v_latest <> {previous_literal} THEN\n'
+        sql += "        RAISE EXCEPTION 'ODL version is % instead of %, generate the SQL again', " \
+               f'v_latest, {previous_literal};\n'
+
+    sql += '    END IF;\n'
+    sql += f'    INSERT INTO {history} ({ODL_VERSION}, major, minor, patch, update_type)\n'
+    sql += f'    VALUES ({version_literal}, {major}, {minor}, {patch}, {update_literal});\n'
+    sql += 'END\n'
+    sql += '$$;\n\n'
+
+    return sql
+
+### odl_version_sql ###
+
+
+class AttributeCatalogue:
+    """ Index over the attributes (schema rows) of all tables
+
+    The catalogue is built once from the tables dictionary as loaded by
+    load_schemas. Each attribute is stored as a dict in records, including
+    the key 'table'. Lookups by table and kolomnaam, kolomnaam,
+    code_attribuut, code_attribuut_sleutel and code_bronbestand are
+    dictionary lookups instead of DataFrame scans.
+
+    Args:
+        tables (dict): table name -> dict with at least 'schema'
+    """
+    def __init__(self, tables: dict):
+        self.records = []
+        self.template_table = None
+        self.by_table = {}
+        self.by_kolomnaam = {}
+        self.by_code_attribuut = {}
+        self.by_sleutel = {}
+        self.by_bronbestand = {}
+
+        for table in tables:
+            if tables[table].get('template', False):
+                self.template_table = table
+
+            self.by_table[table] = {}
+            for record in tables[table][TAG_SCHEMA].to_dict('records'):
+                self.add(table, record)
+
+        # for
+
+    ### __init__ ###
+
+    def add(self, table: str, record: dict):
+        """ Adds an attribute of table to the catalogue
+
+        Args:
+            table (str): name of the table the attribute belongs to
+            record (dict): schema row of the attribute
+
+        Raises:
+            DiDoError: when table already has an attribute with this kolomnaam
+        """
+        record_id = len(self.records)
+        record = dict(record)
+        record['table'] = table
+        self.records.append(record)
+
+        kolomnaam = str(record.get('kolomnaam', ''))
+        if kolomnaam in self.by_table.get(table, {}):
+            raise DiDoError(f'*** Column {kolomnaam} occurs more than once in {table}')
+
+        self.by_table.setdefault(table, {})[kolomnaam] = record_id
+        self.by_kolomnaam.setdefault(kolomnaam, []).append(record_id)
+
+        code = str(record.get('code_attribuut', ''))
+        if len(code) > 0:
+            self.by_code_attribuut.setdefault(code, []).append(record_id)
+
+        sleutel = str(record.get('code_attribuut_sleutel', ''))
+        if len(sleutel) > 0:
+            if sleutel in self.by_sleutel:
+                logger.warning(f'!!! code_attribuut_sleutel {sleutel} occurs in '
+                               f'{self.records[self.by_sleutel[sleutel]]["table"]} and {table}')
+
+            self.by_sleutel[sleutel] = record_id
+
+        # if
+
+        bronbestand = str(record.get(ODL_CODE_BRONBESTAND, ''))
+        if len(bronbestand) > 0:
+            self.by_bronbestand.setdefault(bronbestand, []).append(record_id)
+
+        return
+
+    ### add ###
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def get(self, table: str, kolomnaam: str) -> dict:
+        """ Returns the attribute kolomnaam of table, None when not present
+        """
+        record_id = self.by_table.get(table, {}).get(kolomnaam)
+
+        return None if record_id is None else self.records[record_id]
+
+    ### get ###
+
+    def value(self, table: str, kolomnaam: str, column: str, default: str = '') -> str:
+        """ Returns a column of the attribute kolomnaam of table
+
+        Args:
+            table (str): table name
+            kolomnaam (str): name of the attribute
+            column (str): schema column to return, e.g. 'beschrijving'
+            default (str, optional): returned when attribute or column is absent
+
+        Returns:
+            str: the value
+        """
+        record = self.get(table, kolomnaam)
+        if record is None:
+            return default
+
+        return record.get(column, default)
+
+    ### value ###
+
+    def table_attributes(self, table: str) -> list:
+        """ Returns the attributes of table in schema order
+        """
+        return [self.records[record_id] for record_id in self.by_table.get(table, {}).values()]
+
+    ### table_attributes ###
+
+    def tables_using(self, kolomnaam: str) -> list:
+        """ Returns the names of all tables having attribute kolomnaam
+        """
+        return [self.records[record_id]['table'] for record_id in self.by_kolomnaam.get(kolomnaam, [])]
+
+    ### tables_using ###
+
+    def with_code_attribuut(self, code_attribuut: str) -> list:
+        """ Returns all attributes with code_attribuut
+        """
+        return [self.records[record_id] for record_id in self.by_code_attribuut.get(code_attribuut, [])]
+
+    ### with_code_attribuut ###
+
+    def owner_of(self, code_attribuut_sleutel: str) -> dict:
+        """ Returns the attribute with code_attribuut_sleutel, None when absent
+
+        The table owning the key is in the 'table' key of the result.
+        """
+        record_id = self.by_sleutel.get(code_attribuut_sleutel)
+
+        return None if record_id is None else self.records[record_id]
+
+    ### owner_of ###
+
+    def attributes_of(self, code_bronbestand: str) -> list:
+        """ Returns all attributes of bronbestand code_bronbestand
+        """
+        return [self.records[record_id] for record_id in self.by_bronbestand.get(code_bronbestand, [])]
+
+    ### attributes_of ###
+
+### Class: AttributeCatalogue ###
+
+
+def get_server(config: dict, index: str, username: str, password: str) -> dict:
+    server_config = config[index]
+    server_config['POSTGRES_USER'] = username
+    server_config['POSTGRES_PW'] = password
+
+    # del env
+
+    return server_config
+
+### get_server ###
+
+
+def get_table_name(project_name: str, supplier: str, table_info: str, postfix: str):
+    table_name = f'{supplier}_{project_name}_{table_info}_{postfix}'
+
+    return table_name
+
+### get_table_name ###
+
+
+def get_table_names(project_name: str, supplier: str, postfix: str = 'data') -> dict:
+    """ Get table names of project for specific supplier.
+
+    Args:
+        project_name (str): Name of project
+        leverancier (str): Name of leverancier
+        postfix (str): either 'data' or 'description'
+
+    Returns:
+        dict: dictionary with all data table names
+    """
+    tables_name: dict = {TAG_TABLE_SCHEMA: get_table_name(project_name, supplier, TAG_TABLE_SCHEMA, postfix),
+                         TAG_TABLE_META: get_table_name(project_name, supplier, TAG_TABLE_META, postfix),
+                         TAG_TABLE_DELIVERY: get_table_name(project_name, supplier, TAG_TABLE_DELIVERY, postfix),
+                         TAG_TABLE_QUALITY: get_table_name(project_name, supplier, TAG_TABLE_QUALITY, postfix),
+                         TAG_TABLE_QUALITY_SUMMARY: get_table_name(project_name, supplier, TAG_TABLE_QUALITY_SUMMARY, postfix),
+                        }
+
+    return tables_name
+
+### get_table_names ###
+
+
+def get_supplier_dict(config: dict, supplier: str, delivery):
+    """ Returns supplier s info from supplier.
+
+        The relevant delivery info is copied and all info about deliveries
+        is deleted.
+
+    Args:
+        suppliers (dict): dictionary of suppliers
+        supplier (str): name of the supplier to select
+        delivery (int ro str): sequence number of delivery to apply
+
+    Returns:
+        dict: dictionary of supplier addjusted with correct delivery
+    """
+    flag = False
+    suppliers = config['SUPPLIERS']
+    leverancier = suppliers[supplier].copy()
+    leverancier['config'] = config
+    leverancier['supplier_id'] = supplier
+    indices = []
+    chosen = '*'
+    delivery_configs = {}
+    deliveries = []
+
+    # find all deliveries in the config dictionary
+    # store in delivery_configs
+    for key in leverancier.keys():
+        # delivery is identified by 'delivery' in the key
+        if 'delivery' in key:
+            indices.append(key)
+
+            # format is delivery-<int> or delivery-*, identify delivery seq
+            splits = key.split('-')
+
+            # correct delivery key has just two parts
+            if len(splits) == 2:
+
+                # It is the second part we need; when it is a uint
+                if splits[1].isdigit():
+                    seq = int(splits[1])
+                    delivery_configs[str(splits[1])] = leverancier[key]
+                    delivery_configs[str(splits[1])]['delivery_naam'] = key
+                    delivery_configs[str(splits[1])]['delivery_keus'] = ''
+
+                # or just *
+                elif splits[1] == '*':
+                    delivery_configs[str(splits[1])] = leverancier[key]
+                    delivery_configs[str(splits[1])]['delivery_naam'] = key
+                    delivery_configs[str(splits[1])]['delivery_keus'] = ''
+
+                else:
+                    logger.error(f'*** Delivery {key} is not a valid delivery')
+                    flag = True
+
+                # if
+            # if
+        # if
+    # for
+
+    # all deliveries are stored in delivery_configs
+    if len(delivery_configs) > 0:
+        # identify which delivery applies
+        delivery_index = str(delivery)
+
+        # when deliveries are applied, there must always be a catc-all delivery
+        if '*' not in delivery_configs.keys():
+            logger.error('*** delivery-* must be specified when specifying deliveries')
+            flag = True
+
+        elif delivery_index in delivery_configs.keys():
+            delivery_configs[delivery_index]['delivery_keus'] = 'x'
+            for key in delivery_configs[delivery_index]:
+                leverancier[key] = delivery_configs[delivery_index][key]
+
+        elif '*' in delivery_configs.keys():
+            delivery_configs['*']['delivery_keus'] = 'x'
+            for key in delivery_configs['*']:
+                leverancier[key] = delivery_configs['*'][key]
+
+        # if
+    # if
+
+    # set default when key is lacking
+
+    if flag:
+        raise DiDoError('Errors in delivery specification.')
+
+    for key in indices:
+        leverancier.pop(key)
+
+    return leverancier, delivery_configs
+
+### get_supplier_dict ###
+
+
+def enhance_cargo_dict(cargo_dict: dict, cargo_name, supplier_name: str):
+    """ Returns supplier s info from supplier.
+
+        The relevant delivery info is copied and all info about deliveries
+        is deleted.
+
+    Args:
+        suppliers (dict): dictionary of suppliers
+        supplier (str): name of the supplier to select
+        delivery (int ro str): sequence number of delivery to apply
+
+    Returns:
+        dict: dictionary of supplier addjusted with correct delivery
+    """
+    splits = cargo_name.split('_')
+    if len(splits) == 2:
+        if splits[0] != 'delivery':
+            raise DiDoError(f'*** Delivery should start with "delivery_", error for "{cargo_name}"')
+
+    cargo_dict[ODL_LEVERING_FREK] = splits[1]
+    cargo_dict['supplier_id'] = supplier_name
+
+    return cargo_dict
+
+### get_supplier_dict ###
+
+
+def get_cargo(cargo_config: dict, supplier: str):
+    cargo = cargo_config['DELIVERIES'][supplier]
+
+    return cargo
+
+### get_cargo ###
+
+
+def period_sort_key(periode: str) -> tuple:
+    """ Returns a key to sort levering_rapportageperiodes chronologically
+
+    A rapportageperiode has the format <year>-<type><number>, e.g. 2025-Q3
+    or 2019-J (see odl_rapportageperiodes). The initial delivery (I) always
+    comes first, periodes that cannot be parsed come last in alphabetical order.
+
+    Args:
+        periode (str): levering_rapportageperiode
+
+    Returns:
+        tuple: sort key
+    """
+    periode = str(periode).strip()
+    if periode.upper() == 'I' or periode.upper().endswith('-I'):
+        return (0, 0, 0, periode)
+
+    match = re.match(r'^(\d{4})-([A-Za-z])(\d*)$', periode)
+    if match is None:
+        return (2, 0, 0, periode)
+
+    year = int(match.group(1))
+    number = int(match.group(3)) if len(match.group(3)) > 0 else 0
+
+    return (1, year, number, periode)
+
+### period_sort_key ###
+
+
+class PeriodIndex:
+    """ Maps dates to levering_rapportageperiodes of one period type
+
+    The start dates of all periods from first_year up to and including
+    last_year are computed once and kept sorted; whole date columns are
+    mapped to period codes with numpy.searchsorted instead of comparing
+    each date with each period. Codes follow odl_rapportageperiodes, e.g.
+    2019-J, 2012-H2, 2025-Q3, 1995-M7, 2008-W26 (ISO weeks) or 2020-D189.
+
+    Args:
+        period_type (str): one of J, H, Q, M, W and D
+        first_year (int): first year to index
+        last_year (int): last year to index
+    """
+    def __init__(self, period_type: str, first_year: int, last_year: int):
+        import numpy as np
+        from datetime import timedelta
+
+        self.period_type = period_type.upper()
+        periods = []
+        for year in range(first_year, last_year + 2):
+            if self.period_type == 'J':
+                periods.append((datetime(year, 1, 1), f'{year}-J'))
+
+            elif self.period_type in ('H', 'Q', 'M'):
+                months = {'H': 6, 'Q': 3, 'M': 1}[self.period_type]
+                for number, month in enumerate(range(1, 13, months), start = 1):
+                    periods.append((datetime(year, month, 1), f'{year}-{self.period_type}{number}'))
+
+            elif self.period_type == 'W':
+                # ISO weeks; an ISO year starts at the monday of week 1
+                weeks = date(year, 12, 28).isocalendar()[1]
+                monday = datetime.combine(date.fromisocalendar(year, 1, 1), datetime.min.time())
+                for week in range(weeks):
+                    periods.append((monday + timedelta(weeks = week), f'{year}-W{week + 1}'))
+
+            elif self.period_type == 'D':
+                days = (date(year + 1, 1, 1) - date(year, 1, 1)).days
+                for day in range(days):
+                    periods.append((datetime(year, 1, 1) + timedelta(days = day), f'{year}-D{day + 1}'))
+
+            else:
+                raise DiDoError(f'Period type {period_type} cannot be indexed, use J, H, Q, M, W or D')
+
+            # if
+        # for
+
+        # the periods of last_year + 1 only serve to mark the end of last_year
+        end = [start for start, code in periods if code.startswith(f'{last_year + 1}-')][0]
+        periods = [period for period in periods if period[0] < end]
+
+        self.starts = np.array([start for start, _ in periods] + [end], dtype = 'datetime64[ns]')
+        self.period_codes = np.array([code for _, code in periods] + [''], dtype = object)
+        self.positions = {code: i for i, code in enumerate(self.period_codes[:-1])}
+
+    ### __init__ ###
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    ### __len__ ###
+
+    def codes(self, dates) -> np.ndarray:
+        """ Returns the period code of each date
+
+        Args:
+            dates: list, array or Series of dates, datetimes or ISO strings
+
+        Returns:
+            np.ndarray: period codes, '' for dates outside the index or missing
+        """
+        import numpy as np
+        import pandas as pd
+
+        values = pd.to_datetime(pd.Series(dates), errors = 'coerce', format = 'ISO8601')
+        values = values.to_numpy(dtype = 'datetime64[ns]')
+        positions = np.searchsorted(self.starts, values, side = 'right') - 1
+
+        # before the first period, after the last or NaT (sorts last)
+        outside = (positions < 0) | (positions >= len(self.period_codes) - 1) | np.isnat(values)
+        positions[outside] = len(self.period_codes) - 1
+
+        return self.period_codes[positions]
+
+    ### codes ###
+
+    def bounds(self, code: str) -> tuple:
+        """ Returns the first moment of a period and the first moment after it
+
+        Args:
+            code (str): period code, e.g. 2025-Q3
+
+        Returns:
+            tuple: (start, end) as numpy datetime64
+        """
+        if code not in self.positions:
+            raise DiDoError(f'Period {code} not in the index of {self.period_type} '
+                            f'({self.period_codes[0]} - {self.period_codes[-2]})')
+
+        position = self.positions[code]
+
+        return self.starts[position], self.starts[position + 1]
+
+    ### bounds ###
+
+    def contains(self, dates, code: str) -> np.ndarray:
+        """ Returns for each date whether it lies in period code
+
+        Useful to check record_datum_begin against levering_rapportageperiode.
+        """
+        return self.codes(dates) == code
+
+    ### contains ###
+
+### Class: PeriodIndex ###
+
+
+def create_period_index(config: dict, period_type: str, first_year: int, last_year: int) -> PeriodIndex:
+    """ Creates a PeriodIndex for a period type defined in odl_rapportageperiodes
+
+    Args:
+        config (dict): configuration with REPORT_PERIODS, see read_config
+        period_type (str): period type (leverancier_kolomtype), e.g. Q
+        first_year (int): first year to index
+        last_year (int): last year to index
+
+    Raises:
+        DiDoError: when the period type is not in odl_rapportageperiodes
+
+    Returns:
+        PeriodIndex: index of the periods
+    """
+    report_periods = get_par(config, 'REPORT_PERIODS')
+    if report_periods is not None:
+        types = [str(value).strip().upper() for value in report_periods['leverancier_kolomtype']]
+        if period_type.upper() not in types:
+            raise DiDoError(f'Period type {period_type} not in odl_rapportageperiodes: {types}')
+
+    # if
+
+    return PeriodIndex(period_type, first_year, last_year)
+
+### create_period_index ###
+
+
+def get_current_delivery_seq(project_name: str, supplier: str, server_config: dict):
+    import simple_table as st
+
+    tables = get_table_names(project_name, supplier)
+
+    table_name = tables[TAG_TABLE_DELIVERY]
+    try:
+        count = st.table_size(table_name, True, server_config)
+    except:
+        raise DiDoError(f'Table {table_name} does not exist. Are you sure you used create_table with the current config.yaml file?')
+    # try..except
+
+    return count
+
+### get_current_delivery_seq ###
+
+
+def report_psql_use(table: str, servers: dict, tables_exist: bool):
+    """ Reports to a user he shoukld use psql. The correct command is displayed
+
+    Args:
+        table (str): name of the fiole containing the SQL instructions
+        servers (dict): dictionary of server configurations
+        tables_exist (bool): True if tablkes already exist, else False
+    """
+    host = servers['DATA_SERVER_CONFIG']['POSTGRES_HOST']
+    user = servers['DATA_SERVER_CONFIG']['POSTGRES_USER']
+    db = servers['DATA_SERVER_CONFIG']['POSTGRES_DB']
+
+    report_string = f'$ psql -h {host} -U {user} -f {table}.sql {db}'
+
+    logger.info('')
+    logger.info("Don't forget to run psql to create or fill the tables")
+    logger.info("This can best be done from your work/sql directory")
+    logger.info('Suggested command:')
+    logger.info('')
+    logger.info(report_string)
+
+    if tables_exist:
+        logger.info('')
+        logger.error('*** You have been warned that the tables you want to create already exist.')
+        logger.error('*** If you really want to recreate these tables, thereby erasing current contents')
+        logger.error('*** run dido_kill_supplier.py ***')
+
+    logger.info('')
+
+    return
+
+### report_psql_use ###
+
+
+def show_database(server_config: dict, table_name: str, pfun = logger.debug):
+    if len(table_name) > 0:
+        pfun(f'Table:    {table_name}')
+        pfun('')
+
+    pfun(f'Host:     {server_config["POSTGRES_HOST"]}')
+    pfun(f'Database: {server_config["POSTGRES_DB"]}')
+    pfun(f'Port:     {server_config["POSTGRES_PORT"]}')
+    pfun(f'Schema:   {server_config["POSTGRES_SCHEMA"]}')
+
+    return
+
+### show_database ###
+
+
+def delivery_exists(delivery: dict, supplier_id: str, project_name: str, server_configs: dict) -> bool:
+    """ Checks whether a delivery exists. Column 'levering_rapportageperiode is used
+        to check this.
+
+    Args:
+        delivery (dict): dictionary containing the deliverydescription.
+            Used to get the key 'levering_rapportageperiode' with thge current delivery
+        supplier_id (str): supplier name, used for table name construction
+        project_name (str): name of the project, used for table name construction
+        server_configs (dict): the existence of deliveries is chcked in the data server database
+
+    Returns:
+        bool: True = delivery exists, else not
+    """
+    import sqlalchemy
+    import simple_table as st
+
+    # fetch a dataframe with deliveries from the data table using distinct
+    # on levering_rapportageperiode
+
+    server_config = server_configs['DATA_SERVER_CONFIG']
+    table_name = get_table_name(project_name, supplier_id, TAG_TABLE_DELIVERY, 'data')
+    try:
+        leveringen = st.sql_select(
+            table_name = table_name,
+            columns = f'DISTINCT {ODL_LEVERING_FREK}',
+            sql_server_config = server_config,
+            verbose = False,
+        )
+    except sqlalchemy.exc.ProgrammingError:
+        logging.critical(f'*** Tables do not exist for {supplier_id}_{project_name}_...')
+        show_database(server_config, table_name, logger.info)
+        raise DiDoError('Error while fetching tables. Did you ever apply create_tables '
+                        f'for {supplier_id}_{project_name}?')
+
+    # try..except
+
+    leveringen_lijst = leveringen[ODL_LEVERING_FREK].tolist()
+    if len(leveringen_lijst) > 0:
+        show_database(server_config, table_name, logger.debug)
+        logger.debug('Deliveries present in the database: %s', leveringen_lijst)
+
+    # if
+
+    current_delivery = delivery[ODL_LEVERING_FREK]
+    exists = current_delivery in leveringen_lijst
+    if exists:
+        logger.debug('Delivery %s already in the database', current_delivery)
+
+    return exists
+
+### delivery_exists ###
+
+
+# Bytes per value in a postgres row, types not mentioned are variable length
+TYPE_BYTES = {'boolean': 1, 'smallint': 2, 'smallserial': 2, 'integer': 4, 'serial': 4,
+              'real': 4, 'date': 4, 'bigint': 8, 'bigserial': 8, 'double': 8,
+              'double precision': 8, 'timestamp': 8}
+TUPLE_OVERHEAD = 28 # tuple header and item pointer
+INDEX_TUPLE_OVERHEAD = 16 # index tuple header, item pointer and alignment
+
+
+def get_table_bytes(table_name: str, server_config: dict) -> int:
+    """ Returns the size on disk of a table including its indexes and toast
+
+    Args:
+        table_name (str): name of the table in the schema of server_config
+        server_config (dict): dictionary containing postgres parameters
+
+    Returns:
+        int: size in bytes, 0 when the table does not exist
+    """
+    import sqlalchemy
+
+    engine = get_engine(server_config)
+    with engine.connect() as conn:
+        size = conn.execute(
+            sqlalchemy.text('SELECT pg_total_relation_size(to_regclass(:name))'),
+            {'name': f"{server_config['POSTGRES_SCHEMA']}.{table_name}"},
+        ).scalar()
+
+    engine.dispose()
+
+    return 0 if size is None else int(size)
+
+### get_table_bytes ###
+
+
+def get_table_sizes(table_name: str, server_config: dict) -> dict:
+    """ Returns the sizes on disk and the number of rows of a table
+
+    The number of rows is the estimate of the planner, 0 when the table has
+    not been analyzed yet.
+
+    Args:
+        table_name (str): name of the table in the schema of server_config
+        server_config (dict): dictionary containing postgres parameters
+
+    Returns:
+        dict: heap_bytes (table and toast), index_bytes and rows, all 0
+            when the table does not exist
+    """
+    import sqlalchemy
+
+    engine = get_engine(server_config)
+    with engine.connect() as conn:
+        row = conn.execute(
+            sqlalchemy.text('SELECT pg_table_size(c.oid), pg_indexes_size(c.oid), greatest(c.reltuples, 0) '
+                            'FROM pg_class AS c WHERE c.oid = to_regclass(:name)'),
+            {'name': f"{server_config['POSTGRES_SCHEMA']}.{table_name}"},
+        ).first()
+
+    engine.dispose()
+
+    if row is None:
+        return {'heap_bytes': 0, 'index_bytes': 0, 'rows': 0}
+
+    return {'heap_bytes': int(row[0]), 'index_bytes': int(row[1]), 'rows': int(row[2])}
+
+### get_table_sizes ###
+
+
+def estimate_delivery_load(data_file: str,
+                           schema: list,
+                           sample_rows: int = 10000,
+                           delimiter: str = ';',
+                           rows_per_second: float = 50000,
+                           table_sizes: dict = None,
+                          ) -> dict:
+    """ Estimates the cost of loading a delivery from a sample of its data file
+
+    The first sample_rows rows are read. The number of rows is extrapolated
+    from the file size, the bytes per row in the database from the datatypes
+    of the schema and the widths of the sampled values. The sampled values are
+    checked with check_value to estimate the error rate. Columns of the data
+    file are matched to the schema after normalize_column_names, unmatched
+    columns are estimated as text without checks.
+
+    When the data table already has rows (table_sizes), the table and index
+    bytes per row are taken from it, as they include the padding, toast and
+    indexes that the sample does not show. Otherwise the index bytes per row
+    are estimated from the keytype PK and FK columns of the schema. Loading
+    slows down with the index bytes written per row, so rows_per_second is
+    scaled by the ratio of index to table bytes per row.
+
+    Args:
+        data_file (str): name of the delivered data file
+        schema (list): dicts with kolomnaam, datatype, constraints and domein
+        sample_rows (int, optional): number of rows to sample. Defaults to 10000.
+        delimiter (str, optional): column delimiter. Defaults to ';'.
+        rows_per_second (float, optional): load speed of a table without
+            indexes. Defaults to 50000.
+        table_sizes (dict, optional): current sizes of the data table as
+            returned by get_table_sizes. Defaults to None: an empty table.
+
+    Returns:
+        dict: file_bytes, rows, sampled, columns, file_row_bytes, row_bytes
+            (estimated from the sample), error_rate (fraction of invalid
+            values), error_row_rate (fraction of rows with at least one
+            invalid value), errors (count per datakwaliteit code),
+            table_row_bytes and index_row_bytes (used for the growth),
+            growth_bytes (table and indexes), index_growth_bytes,
+            table_bytes (total size after the load), table_sizes (as
+            get_table_sizes after the load), load_seconds and exact (True
+            when the whole file was sampled)
+    """
+    import csv
+
+    file_bytes = os.path.getsize(data_file)
+    lines = []
+    sample_bytes = 0
+    with open(data_file, encoding = 'utf8', newline = '') as infile:
+        header = infile.readline()
+        header_bytes = len(header.encode('utf8'))
+        for line in infile:
+            sample_bytes += len(line.encode('utf8'))
+            lines.append(line)
+            if len(lines) >= sample_rows:
+                break
+
+        # for
+    # with
+
+    names = normalize_column_names(next(csv.reader([header], delimiter = delimiter)))
+    rules = {row['kolomnaam']: row for row in schema}
+    checks = []
+    for name in names:
+        row = rules.get(name, {})
+        checks.append((
+            str(row.get('datatype', 'text')).strip().lower(),
+            parse_constraints(row.get('constraints', ''))['not_null'],
+            parse_domain(row.get('domein', '')),
+        ))
+
+    # for
+
+    errors = {}
+    n_values = 0
+    n_error_rows = 0
+    column_bytes = [0] * len(names)
+    sampled = 0
+    for values in csv.reader(lines, delimiter = delimiter):
+        sampled += 1
+        row_error = False
+        for i, (value, (datatype, not_null, domain)) in enumerate(zip(values, checks)):
+            n_values += 1
+            if datatype not in TYPE_BYTES:
+                column_bytes[i] += len(value.encode('utf8')) + 1
+
+            code = check_value(value, datatype, not_null, domain)
+            if code != 0:
+                errors[code] = errors.get(code, 0) + 1
+                row_error = True
+
+            # if
+        # for
+
+        n_error_rows += row_error
+
+    # for
+
+    exact = header_bytes + sample_bytes >= file_bytes
+    if exact or sample_bytes == 0:
+        rows = sampled
+    else:
+        rows = int((file_bytes - header_bytes) / (sample_bytes / len(lines)))
+
+    # bytes per value of each column
+    widths = {}
+    for name, check, n_bytes in zip(names, checks, column_bytes):
+        if check[0] in TYPE_BYTES:
+            widths[name] = TYPE_BYTES[check[0]]
+        else:
+            widths[name] = n_bytes / sampled if sampled > 0 else 0
+
+    # for
+
+    row_bytes = TUPLE_OVERHEAD + sum(widths.values())
+
+    sizes = table_sizes if table_sizes is not None else {'heap_bytes': 0, 'index_bytes': 0, 'rows': 0}
+    if sizes['rows'] > 0:
+        table_row_bytes = sizes['heap_bytes'] / sizes['rows']
+        index_row_bytes = sizes['index_bytes'] / sizes['rows']
+
+    else:
+        # one index on the PK columns and one per FK column
+        keytypes = {row['kolomnaam']: str(row.get('keytype', '')).strip().upper() for row in schema}
+        pk_columns = [name for name in names if keytypes.get(name) == 'PK']
+        indexes = ([pk_columns] if len(pk_columns) > 0 else []) + \
+                  [[name] for name in names if keytypes.get(name) == 'FK']
+        table_row_bytes = row_bytes
+        index_row_bytes = sum([INDEX_TUPLE_OVERHEAD + sum([widths[name] for name in index])
+                               for index in indexes])
+
+    # if
+
+    table_growth = int(rows * table_row_bytes)
+    index_growth = int(rows * index_row_bytes)
+    after = {
+        'heap_bytes': sizes['heap_bytes'] + table_growth,
+        'index_bytes': sizes['index_bytes'] + index_growth,
+        'rows': sizes['rows'] + rows,
+    }
+    slowdown = 1 + index_row_bytes / table_row_bytes if table_row_bytes > 0 else 1
+
+    return {
+        'file_bytes': file_bytes,
+        'rows': rows,
+        'sampled': sampled,
+        'columns': len(names),
+        'file_row_bytes': sample_bytes / len(lines) if len(lines) > 0 else 0,
+        'row_bytes': row_bytes,
+        'error_rate': sum(errors.values()) / n_values if n_values > 0 else 0,
+        'error_row_rate': n_error_rows / sampled if sampled > 0 else 0,
+        'errors': errors,
+        'table_row_bytes': table_row_bytes,
+        'index_row_bytes': index_row_bytes,
+        'growth_bytes': table_growth + index_growth,
+        'index_growth_bytes': index_growth,
+        'table_bytes': after['heap_bytes'] + after['index_bytes'],
+        'table_sizes': after,
+        'load_seconds': rows * slowdown / rows_per_second if rows_per_second > 0 else 0,
+        'exact': exact,
+    }
+
+### estimate_delivery_load ###
+
+
+# columns of bronbestand_datakwaliteitsamenvatting that identify a count
+QUALITY_SUMMARY_KEYS = [ODL_CODE_BRONBESTAND, ODL_LEVERING_FREK, 'code_attribuut', 'code_datakwaliteit']
+
+
+def quality_summary_sql(schema_name: str,
+                        quality_table: str,
+                        summary_table: str,
+                        levering: str,
+                        parameter: str = None,
+                       ) -> str:
+    """ Returns SQL that rebuilds the summary of one delivery from its findings
+
+    The summary is always rebuilt from the findings in the database: at the
+    end of the validation function of create_validation_function and by
+    load_delivery_resumable after storing duplicate key findings.
 
-    return (pgpass.iloc[0, 3], pgpass.iloc[0, 4])
+    Args:
+        schema_name (str): postgres schema of both tables
+        quality_table (str): table with the datakwaliteit findings
+        summary_table (str): table with the datakwaliteit summary
+        levering (str): levering_rapportageperiode to summarize
+        parameter (str, optional): name of a plpgsql parameter containing
+            the levering, used instead of levering. Defaults to None.
 
-### load_pgpass ###
+    Returns:
+        str: SQL statements
+    """
+    keys = ', '.join(QUALITY_SUMMARY_KEYS)
+    selection = parameter if parameter is not None else sql_literal(levering, 'text')
+    sql = f'DELETE FROM {schema_name}.{summary_table} WHERE {ODL_LEVERING_FREK} = {selection};\n'
+    sql += f'INSERT INTO {schema_name}.{summary_table} ({keys}, aantal, {ODL_SYSDATUM})\n'
+    sql += f'SELECT {keys}, count(*), now()\n'
+    sql += f'FROM {schema_name}.{quality_table}\n'
+    sql += f'WHERE {ODL_LEVERING_FREK} = {selection}\n'
+    sql += f'GROUP BY {keys};\n'
 
+    return sql
 
-def read_config(project_dir: str) -> dict:
-    """ Reads config and environment file and initializes variables.
+### quality_summary_sql ###
 
-    The config file is read from the <project_dir>/config directory, just like
-    the .env file. The config file is read as a dictionary into the config variable.
-    The servers declared in the SERVER_CONFIGS section are updated with the
-    credentials of .env.
 
-    Next, program wide parameters are read from the ODL database: odl_parameters
-    and odl_rapportageperiodes. These are assigned to the config dictionary.
+DUPLICATE_ENTRY_BYTES = 200 # estimated memory per row entry in find_duplicate_keys
+DUPLICATE_RECORD = struct.Struct('>16sQ') # key hash and row number in a spilled run
+
+
+def read_duplicate_run(filename: str):
+    """ Yields the (key hash, row number) records of a spilled run
 
     Args:
-        project_dir (str): directory path pointing to the root of the
-            project directory. Subdirectories are at least: config, root and work.
+        filename (str): name of the run file written by find_duplicate_keys
+    """
+    with open(filename, 'rb') as infile:
+        while True:
+            buffer = infile.read(DUPLICATE_RECORD.size * 4096)
+            if len(buffer) == 0:
+                break
+
+            yield from DUPLICATE_RECORD.iter_unpack(buffer)
+
+        # while
+    # with
+
+### read_duplicate_run ###
+
+
+def find_duplicate_keys(data_file: str,
+                        schema: list,
+                        delimiter: str = ';',
+                        memory_budget: int = None,
+                        tmp_dir: str = None,
+                       ) -> list:
+    """ Finds rows of a data file with the same primary key in bounded memory
+
+    The file is streamed; for each row the values of the columns with
+    keytype PK are hashed with blake2b. Hashes and their row numbers are
+    kept in memory until memory_budget is reached, then they are written
+    as a sorted run to a temporary file. The budget counts every row, not
+    every distinct key, so a file with few keys and many duplicates spills
+    as well. Runs are merged with heapq.merge,
+    equal hashes end up adjacent. Without spills nothing is written to disk.
+
+    Args:
+        data_file (str): name of the delivered data file, first row is the header
+        schema (list): dicts with kolomnaam and keytype
+        delimiter (str, optional): column delimiter. Defaults to ';'.
+        memory_budget (int, optional): bytes to use for the rows. Defaults to
+            None: the budget of the memory governor, read again after each spill.
+        tmp_dir (str, optional): directory for the runs. Defaults to the system temp dir.
 
     Returns:
-        dict: the config dictionary enriched with additional information
+        list: dicts with the key columns, key values and the data row numbers
+            (1 = first row after the header) of each group of duplicates
     """
-    # read the configfile
-    configfile = os.path.join(project_dir, 'config', 'config.yaml')
-    logger.info(f'[Bootstrap: {configfile}]')
-    with open(configfile, encoding = 'utf8', mode = "r") as infile:
-        config = yaml.safe_load(infile)
+    import csv
+    import heapq
+    import tempfile
 
-    sql = load_sql()
+    key_columns = [row['kolomnaam'] for row in schema if str(row.get('keytype', '')).strip() == 'PK']
+    if len(key_columns) == 0:
+        return []
 
-    item_names = ['ROOT_DIR', 'WORK_DIR', 'PROJECT_NAME', 'HOST',
-                  'SERVER_CONFIGS']
-    errors = False
-    for item in item_names:
-        if item not in config.keys():
-            errors = True
-            logger.critical(f'{item} not specified in config.yaml')
+    def get_max_entries() -> int:
+        budget = memory_budget if memory_budget is not None else get_memory_governor().budget()
 
-    if errors:
-        raise DiDoError('Er ontbreken elementen in config.yaml, zie hierboven')
+        return max(1, budget // DUPLICATE_ENTRY_BYTES)
 
-    config['ROOT_DIR'] = os.path.join(project_dir, config['ROOT_DIR'])
-    config['WORK_DIR'] = os.path.join(project_dir, config['WORK_DIR'])
-    config['SQL_SUPPORT'] = sql
+    max_entries = get_max_entries()
 
-    # load dido.yaml
-    parameters = load_parameters()
+    with open(data_file, encoding = 'utf8', newline = '') as infile, \
+         tempfile.TemporaryDirectory(dir = tmp_dir) as run_dir:
 
-    # get the server variable
-    servers = config['SERVER_CONFIGS'].keys()
+        reader = csv.reader(infile, delimiter = delimiter)
+        names = normalize_column_names(next(reader)).tolist()
+        missing = [col for col in key_columns if col not in names]
+        if len(missing) > 0:
+            raise DiDoError(f'Key columns {missing} not found in {data_file}')
 
-    # check if the server to use exists
-    host = config['HOST'].lower().strip()
-    if host not in parameters['SERVERS'].keys():
-        for server in parameters.keys():
-            logger.info(f' - {server}')
+        positions = [names.index(col) for col in key_columns]
 
-        raise DiDoError(f'*** Server to use in config file {host} is not among the allowed servers')
+        keys = {}
+        entries = 0
+        runs = []
+        for row_number, values in enumerate(reader, start = 1):
+            key = '\x1f'.join([values[pos] if pos < len(values) else '' for pos in positions])
+            digest = hashlib.blake2b(key.encode('utf8'), digest_size = 16).digest()
+            keys.setdefault(digest, []).append(row_number)
+            entries += 1
 
-    # find IP belonging to host
-    host_ip = parameters['SERVERS'][host]
+            if entries >= max_entries:
+                runs.append(spill_duplicate_run(keys, run_dir, len(runs)))
+                keys = {}
+                entries = 0
+                max_entries = get_max_entries()
 
-    logger.debug(config['SERVER_CONFIGS'])
+            # if
+        # for
 
-    # Credentials
-    env = load_credentials(project_dir)
-    if 'POSTGRES_USER' in env.keys():
-        user = env['POSTGRES_USER']
-    else:
-        user = ''
+        # everything fitted in memory
+        if len(runs) == 0:
+            groups = [rows for rows in keys.values() if len(rows) > 1]
 
-    # assign env credentials and server to the server_configs in the config file
-    for server in config['SERVER_CONFIGS']:
-        config['SERVER_CONFIGS'][server]['POSTGRES_HOST'] = host_ip
-        port = config['SERVER_CONFIGS'][server]['POSTGRES_PORT']
-        db = config['SERVER_CONFIGS'][server]['POSTGRES_DB']
+        else:
+            if len(keys) > 0:
+                runs.append(spill_duplicate_run(keys, run_dir, len(runs)))
+                keys = {}
+
+            logger.debug('Duplicate detection of %s spilled %d runs', data_file, len(runs))
+
+            groups = []
+            previous = None
+            rows = []
+            for digest, row_number in heapq.merge(*[read_duplicate_run(run) for run in runs]):
+                if digest != previous:
+                    if len(rows) > 1:
+                        groups.append(rows)
+                    previous = digest
+                    rows = []
 
-        # check for user name and pw in .pgpass resp. .env
-        creds = load_pgpass(host = host_ip, port = port, db = db, user = user)
+                # if
 
-        # if .pgpass not found or entries in .pgpass not found
-        if creds is None or creds == (None, None):
-            try:
-                config['SERVER_CONFIGS'][server]['POSTGRES_USER'] = user
-                config['SERVER_CONFIGS'][server]['POSTGRES_PW'] = env['POSTGRES_PASSWORD']
-            except:
-                raise DiDoError('No valid credentials found in .pgpass or config/.env')
+                rows.append(row_number)
 
-        # .pgpass found with correct entries
-        else:
-            config['SERVER_CONFIGS'][server]['POSTGRES_USER'] = creds[0]
-            config['SERVER_CONFIGS'][server]['POSTGRES_PW'] = creds[1]
+            # for
+
+            if len(rows) > 1:
+                groups.append(rows)
 
         # if
+    # with
+
+    # report in order of the first occurrence of each key
+    groups.sort(key = lambda rows: rows[0])
+
+    # fetch the key values of the duplicates for the report
+    first_rows = {rows[0]: i for i, rows in enumerate(groups)}
+    values_of = {}
+    if len(first_rows) > 0:
+        with open(data_file, encoding = 'utf8', newline = '') as infile:
+            reader = csv.reader(infile, delimiter = delimiter)
+            next(reader)
+            for row_number, values in enumerate(reader, start = 1):
+                if row_number in first_rows:
+                    values_of[first_rows[row_number]] = \
+                        [values[pos] if pos < len(values) else '' for pos in positions]
+
+            # for
+        # with
+    # if
+
+    return [{'columns': key_columns, 'values': values_of[i], 'rows': rows}
+            for i, rows in enumerate(groups)]
+
+### find_duplicate_keys ###
+
+
+def spill_duplicate_run(keys: dict, run_dir: str, run_no: int) -> str:
+    """ Writes the keys of find_duplicate_keys as a sorted run
+
+    Args:
+        keys (dict): key hash -> list of row numbers
+        run_dir (str): directory to write the run to
+        run_no (int): sequence number of the run
+
+    Returns:
+        str: name of the run file
+    """
+    filename = join(run_dir, f'run_{run_no:05d}.bin')
+    with open(filename, 'wb') as outfile:
+        for digest in sorted(keys):
+            outfile.write(b''.join([DUPLICATE_RECORD.pack(digest, row_number)
+                                    for row_number in keys[digest]]))
+
+    # with
+
+    return filename
+
+### spill_duplicate_run ###
+
+
+def duplicate_findings(groups: list,
+                       schema: list,
+                       code_bronbestand: str,
+                       levering: str,
+                       recordnummers: dict = None,
+                      ) -> pd.DataFrame:
+    """ Converts duplicate groups into bronbestand_datakwaliteit rows
+
+    Every row of a group except the first gets a VALUE_DUPLICATE_KEY finding
+    for each key column. row_number is the row in the data file (1 is the
+    first row after the header), as in the findings of the validation
+    function of create_validation_function. Without recordnummers the row
+    number is used as bronbestand_recordnummer as well.
+
+    Args:
+        groups (list): groups as returned by find_duplicate_keys
+        schema (list): dicts with kolomnaam and code_attribuut
+        code_bronbestand (str): code of the bronbestand
+        levering (str): levering_rapportageperiode of the delivery
+        recordnummers (dict, optional): row number in the data file ->
+            bronbestand_recordnummer it was loaded as. Defaults to None.
+
+    Returns:
+        pd.DataFrame: findings
+    """
+    import pandas as pd
+
+    code_attribuut = {row['kolomnaam']: row.get('code_attribuut', '') for row in schema}
+    sysdatum = datetime.now().strftime(DATETIME_FORMAT)
+    findings = []
+    for group in groups:
+        for row_number in group['rows'][1:]:
+            recno = row_number if recordnummers is None else recordnummers[row_number]
+            for col in group['columns']:
+                findings.append({
+                    ODL_RECORDNO: recno,
+                    ODL_CODE_BRONBESTAND: code_bronbestand,
+                    'row_number': row_number,
+                    'column_name': col,
+                    'code_attribuut': code_attribuut.get(col, ''),
+                    'code_datakwaliteit': VALUE_DUPLICATE_KEY,
+                    ODL_LEVERING_FREK: levering,
+                    ODL_SYSDATUM: sysdatum,
+                })
+
+            # for
+        # for
     # for
 
-    # store other settings of .env in config
-    for key in env.keys():
-        if key not in ['POSTGRES_USER', 'POSTGRES_PASSWORD']:
-            config[key] = env[key]
+    return pd.DataFrame(findings, columns = [ODL_RECORDNO, ODL_CODE_BRONBESTAND, 'row_number',
+                                             'column_name', 'code_attribuut', 'code_datakwaliteit',
+                                             ODL_LEVERING_FREK, ODL_SYSDATUM])
 
-    # fetch rapportage leveringsperiodes from odl
-    odl_server = config['SERVER_CONFIGS']['ODL_SERVER_CONFIG']
-    #odl_server['POSTGRES_HOST'] = '10.10.12.6'
+### duplicate_findings ###
 
-    # when initializing a new database odl_)rapportageperiodes does not exist, assign None
-    try:
-        rapportage_periodes = load_odl_table('odl_rapportageperiodes_description', odl_server)
-        config['REPORT_PERIODS'] = rapportage_periodes
 
-    except:
-        logger.warning('!!! No odl_rapportageperiodes_description present. You are creating a new database?')
+NUMERIC_TYPES = ('smallint', 'integer', 'bigint', 'serial', 'bigserial', 'smallserial',
+                 'real', 'double', 'double precision', 'numeric', 'decimal')
 
-    # assign these tot the config file
-    config['PARAMETERS'] = parameters
 
-    return config
+def sql_literal(value: str, datatype: str) -> str:
+    """ Returns value as an SQL literal of datatype
 
-### read_config ###
+    Args:
+        value (str): value from a schema, e.g. from the domein column
+        datatype (str): postgres datatype of the column
 
+    Returns:
+        str: numbers as is, other values quoted and cast to datatype
+    """
+    datatype = datatype.strip().lower()
+    value = str(value).strip()
+    if datatype in NUMERIC_TYPES:
+        try:
+            float(value)
 
-def read_delivery_config(project_path: str, delivery_filename: str):
+            return value
 
-    delivery_filename = os.path.join(project_path, 'data', delivery_filename)
-    with open(delivery_filename, encoding = 'utf8', mode = "r") as infile:
-        delivery = yaml.safe_load(infile)
+        except ValueError:
+            pass
 
-    return delivery
+        # try..except
+    # if
 
-### read_delivery_config ###
+    quoted = "'" + value.replace("'", "''") + "'"
+    if datatype in ('text', '') or datatype in NUMERIC_TYPES:
+        return quoted
 
+    return f'{quoted}::{datatype}'
 
-def load_credentials(project_dir: str) -> dict:
-    """ Reads the .env file as dict, returns empty dict when no file is found
+### sql_literal ###
+
+
+# datakwaliteit codes checked by the function of create_validation_function
+VALIDATION_CODES = [VALUE_NOT_IN_LIST, VALUE_MANDATORY_NOT_SPECIFIED, VALUE_NOT_BETWEEN_MINMAX,
+                    VALUE_NOT_CONFORM_RE]
+
+
+def create_validation_function(schema_name: str,
+                               supplier: str,
+                               table_name: str,
+                               quality_table: str,
+                               schema: list,
+                               summary_table: str = None,
+                              ) -> str:
+    """ Creates a plpgsql function that validates a delivery inside Postgres
+
+    The function {schema_name}.validate_{supplier}(p_levering text) removes the
+    findings of the delivery with the codes below from quality_table and
+    inserts new findings with one INSERT ... SELECT per check, derived from
+    the schema. Findings with other codes, e.g. the duplicate keys stored by
+    load_delivery_resumable, are kept.
+
+    - constraints NOT NULL: missing value (VALUE_MANDATORY_NOT_SPECIFIED)
+    - domein list: value not in the list (VALUE_NOT_IN_LIST)
+    - domein min:max: value outside the range (VALUE_NOT_BETWEEN_MINMAX)
+    - domein re: value does not match (VALUE_NOT_CONFORM_RE)
+
+    Domain values are written as literals of the datatype of the column.
+    Datatypes themselves are enforced by the table, so no check is needed.
+    row_number is the row in the data file, as in duplicate_findings: the
+    rows of a delivery are numbered in file order, so the n-th recordnummer
+    of the levering is row n.
+    The function returns the number of findings. Parameter and variables
+    are prefixed (p_, v_) to keep them apart from the column names. When
+    summary_table is given, the summary of the delivery is rebuilt from the
+    findings at the end (see quality_summary_sql).
 
     Args:
-        project_dir (str): project directory of the expected config/.env file
+        schema_name (str): postgres schema of the tables
+        supplier (str): name of the supplier, used in the function name
+        table_name (str): data table to validate
+        quality_table (str): bronbestand_datakwaliteit table of the supplier
+        schema (list): dicts with kolomnaam, code_attribuut, datatype,
+            constraints and domein
+        summary_table (str, optional): bronbestand_datakwaliteitsamenvatting
+            table of the supplier. Defaults to None: no summary.
 
     Returns:
-        dict: the .env file as dict or an empty dict when config/.env is not found
+        str: SQL to create the function
     """
-    env_filename = '.env' # config['ENV']
-    env_filename = os.path.join(project_dir, os.path.join('config', env_filename))
+    data = f'{schema_name}.{table_name}'
+    quality = f'{schema_name}.{quality_table}'
+    checks = []
+    for row in schema:
+        col = row['kolomnaam']
+        datatype = str(row.get('datatype', 'text'))
+        domain = parse_domain(row.get('domein', ''))
+        conditions = []
+
+        if parse_constraints(row.get('constraints', ''))['not_null']:
+            conditions.append((VALUE_MANDATORY_NOT_SPECIFIED, f'{col} IS NULL'))
+
+        if domain['kind'] == 'list':
+            values = ', '.join([sql_literal(value, datatype) for value in domain['values']])
+            conditions.append((VALUE_NOT_IN_LIST, f'{col} NOT IN ({values})'))
+
+        elif domain['kind'] == 'range':
+            parts = []
+            if domain['min'] is not None:
+                parts.append(f"{col} < {sql_literal(domain['min'], datatype)}")
+            if domain['max'] is not None:
+                parts.append(f"{col} > {sql_literal(domain['max'], datatype)}")
+
+            if len(parts) > 0:
+                conditions.append((VALUE_NOT_BETWEEN_MINMAX, ' OR '.join(parts)))
+
+        elif domain['kind'] == 're':
+            pattern = domain['pattern'].pattern.replace("'", "''")
+            conditions.append((VALUE_NOT_CONFORM_RE, f"{col}::text !~ '^(?:{pattern})$'"))
 
-    if os.path.isfile(env_filename):
-        with open(env_filename, encoding = 'utf8', mode = "r") as envfile:
-            env = yaml.safe_load(envfile)
+        # if
 
-        logger.info('Credentials read from config/.env')
+        for code, condition in conditions:
+            # missing values are only reported by the NOT NULL check
+            if code != VALUE_MANDATORY_NOT_SPECIFIED:
+                condition = f'{col} IS NOT NULL AND ({condition})'
+
+            checks.append(
+                f'    INSERT INTO {quality} ({ODL_RECORDNO}, {ODL_CODE_BRONBESTAND}, row_number,\n'
+                f'        column_name, code_attribuut, code_datakwaliteit, {ODL_LEVERING_FREK}, {ODL_SYSDATUM})\n'
+                f"    SELECT {ODL_RECORDNO}, {ODL_CODE_BRONBESTAND}, v_row_number, '{col}',\n"
+                f"        {sql_literal(row.get('code_attribuut', ''), 'text')}, {code}, {ODL_LEVERING_FREK}, now()\n"
+                f'    FROM (SELECT *, row_number() OVER (ORDER BY {ODL_RECORDNO}) AS v_row_number\n'
+                f'          FROM {data} WHERE {ODL_LEVERING_FREK} = p_levering) AS numbered\n'
+                f'    WHERE {condition};\n'
+            )
+            checks.append('    GET DIAGNOSTICS v_count = ROW_COUNT;\n'
+                          '    v_findings := v_findings + v_count;\n')
 
-    else:
-        # initialize empty env dictionary
-        logger.info('No credentials file found: config/.env')
+        # for
+    # for
 
-        env = {}
+    sql = f'CREATE OR REPLACE FUNCTION {schema_name}.validate_{supplier}(p_levering text)\n'
+    sql += 'RETURNS bigint AS\n'
+    sql += '$body$\n'
+    sql += 'DECLARE\n'
+    sql += '    v_count bigint;\n'
+    sql += '    v_findings bigint := 0;\n'
+    sql += 'BEGIN\n'
+    codes = ', '.join([str(code) for code in VALIDATION_CODES])
+    sql += f'    DELETE FROM {quality}\n'
+    sql += f'    WHERE {ODL_LEVERING_FREK} = p_levering AND code_datakwaliteit IN ({codes});\n\n'
+    sql += '\n'.join(checks)
+    if summary_table is not None:
+        summary = quality_summary_sql(schema_name, quality_table, summary_table, None, 'p_levering')
+        sql += '\n' + ''.join(['    ' + line + '\n' for line in summary.splitlines()])
+
+    sql += '\n    RETURN v_findings;\n'
+    sql += 'END;\n'
+    sql += '$body$\n'
+    sql += 'LANGUAGE plpgsql;\n'
 
-    # if
+    return sql
 
-    return env
+### create_validation_function ###
 
-### load_credentials ###
 
+def create_support_functions(config: dict, supplier: str, key_id: str, schema: list) -> str:
+    """ Creates the SQL support functions of a supplier
 
-def display_dido_header(text: str = None):
-    if text is None:
-        return
+    The templates of config/dido_functions.sql (config['SQL_SUPPORT']) are
+    filled in and followed by the validation function of
+    create_validation_function and, when SNAPSHOT_PERIODS is not empty, the
+    snapshot table and refresh function of create_snapshot_functions. Table
+    names are derived from PROJECT_NAME and supplier with get_table_names,
+    the postgres schema is that of DATA_SERVER_CONFIG.
 
-    dido = ' DiDo - Document Data Definition Generator '
-    if len(text) > len(dido):
-        text = text[0:len(dido)]
+    Whatever creates the data tables of a supplier should write the result
+    of this function instead of formatting config['SQL_SUPPORT'] itself.
 
-    delta = len(dido) - len(text)
-    delta_2 = int(delta / 2)
-    front = delta_2
-    back = delta - delta_2
-    text = '*' + front * ' ' + text + back * ' ' + '*'
-    dido = '*' + dido + '*'
-    asterisks = len(dido) * '*'
-    between = '*' + (len(dido) - 2) * ' ' + '*'
+    Args:
+        config (dict): configuration as returned by read_config
+        supplier (str): name of the supplier
+        key_id (str): key column used by show_history_of_{supplier}
+        schema (list): dicts with kolomnaam, code_attribuut, datatype,
+            constraints and domein
 
-    logger.info('')
-    logger.info(asterisks)
-    logger.info(between)
-    logger.info(dido)
-    logger.info(between)
-    logger.info(text)
-    logger.info(between)
-    logger.info(asterisks)
-    logger.info('')
+    Returns:
+        str: SQL to create all support functions
+    """
+    schema_name = config['SERVER_CONFIGS']['DATA_SERVER_CONFIG']['POSTGRES_SCHEMA']
+    table_names = get_table_names(config['PROJECT_NAME'], supplier)
+    table_name = table_names[TAG_TABLE_SCHEMA]
+    period_types = config.get('SNAPSHOT_PERIODS')
+
+    sql = config['SQL_SUPPORT'].format(
+        schema = schema_name,
+        supplier = supplier,
+        table_name = table_name,
+        key_id = key_id,
+    )
+    sql += '\n\n' + create_validation_function(
+        schema_name = schema_name,
+        supplier = supplier,
+        table_name = table_name,
+        quality_table = table_names[TAG_TABLE_QUALITY],
+        schema = schema,
+        summary_table = table_names[TAG_TABLE_QUALITY_SUMMARY],
+    )
 
-    return
+    if period_types is not None and len(period_types) > 0:
+        sql += '\n' + create_snapshot_functions(schema_name, supplier, table_name, period_types)
 
+    return sql
 
-def get_limits(config: dict):
-    """ Read LIMITS
+### create_support_functions ###
+
+
+# Report periods of odl_rapportageperiodes that can be snapshot. start is an
+# SQL expression for the start of the period containing {ts}, code the
+# levering_rapportageperiode of the period containing {ts}, e.g. 2025-Q3
+PERIOD_INTERVALS = {
+    'J': {'interval': '1 year',
+          'start': "date_trunc('year', {ts})",
+          'code': "to_char({ts}, 'YYYY') || '-J'"},
+    'H': {'interval': '6 months',
+          'start': "date_trunc('year', {ts}) + CASE WHEN extract(month FROM {ts}) > 6 "
+                   "THEN interval '6 months' ELSE interval '0 months' END",
+          'code': "to_char({ts}, 'YYYY') || '-H' || CASE WHEN extract(month FROM {ts}) > 6 THEN 2 ELSE 1 END"},
+    'Q': {'interval': '3 months',
+          'start': "date_trunc('quarter', {ts})",
+          'code': "to_char({ts}, 'YYYY') || '-Q' || extract(quarter FROM {ts})::int"},
+    'M': {'interval': '1 month',
+          'start': "date_trunc('month', {ts})",
+          'code': "to_char({ts}, 'YYYY') || '-M' || extract(month FROM {ts})::int"},
+    'W': {'interval': '1 week',
+          'start': "date_trunc('week', {ts})",
+          'code': "to_char({ts}, 'IYYY') || '-W' || extract(week FROM {ts})::int"},
+    'D': {'interval': '1 day',
+          'start': "date_trunc('day', {ts})",
+          'code': "to_char({ts}, 'YYYY') || '-D' || extract(doy FROM {ts})::int"},
+}
+
+
+def create_snapshot_functions(schema_name: str, supplier: str, table_name: str, period_types: list) -> str:
+    """ Creates a snapshot table and its refresh function for report periods
+
+    The table {table_name}_snapshot contains the state of the data table
+    at the end of each report period as returned by show_{supplier}_at,
+    with the period in snapshot_periode (e.g. 2025-Q3) and its last second
+    in snapshot_datum. Report queries select one snapshot_periode instead of
+    running show_{supplier}_at over the full history. When the columns of
+    the data table have changed, the snapshot table is dropped and created
+    again, its snapshots are rebuilt by the next refresh.
+
+    {schema_name}.refresh_{supplier}_snapshots(p_levering text) is to be
+    called after a delivery has been loaded. Only the periods touched by the
+    delivery are refreshed: the periods containing a record_datum_begin of
+    its rows and the current period. A snapshot therefore shows the data as
+    known at the end of its period and at the last delivery reporting on
+    it. All periods since the earliest record_datum_begin are built when a
+    period type has no snapshots yet.
 
     Args:
-        config (dict): configuration containing the limits
+        schema_name (str): postgres schema of the tables
+        supplier (str): name of the supplier, show_{supplier}_at must exist
+        table_name (str): data table of the supplier
+        period_types (list): period types of PERIOD_INTERVALS, e.g. ['M', 'Q']
+
+    Raises:
+        DiDoError: for an unknown period type
 
     Returns:
-        (tuple): the limited variables
+        str: SQL statements
     """
-    max_rows = None
-    max_errors = None
-    data_test_fraction = 0 # limitations['data_test_fraction']
+    unknown = [period for period in period_types if period not in PERIOD_INTERVALS]
+    if len(unknown) > 0:
+        raise DiDoError(f'Unknown report period types for snapshots: {unknown}, '
+                        f'allowed are {list(PERIOD_INTERVALS.keys())}')
+
+    data = f'{schema_name}.{table_name}'
+    snapshot = f'{schema_name}.{table_name}_snapshot'
+    columns = "SELECT string_agg(attname || ' ' || format_type(atttypid, atttypmod), ', ' ORDER BY attnum)\n" \
+              "        FROM pg_attribute\n" \
+              "        WHERE attrelid = '{table}'::regclass AND attnum > 0 AND NOT attisdropped{extra}"
+    snapshot_columns = "\n        AND attname NOT IN ('snapshot_periode', 'snapshot_datum')"
+
+    # a snapshot table with other columns than the data table is stale
+    sql = 'DO\n'
+    sql += '$do$\n'
+    sql += 'BEGIN\n'
+    sql += f"    IF to_regclass('{snapshot}') IS NOT NULL AND\n"
+    sql += f"       ({columns.format(table = data, extra = '')}) IS DISTINCT FROM\n"
+    sql += f"       ({columns.format(table = snapshot, extra = snapshot_columns)}) THEN\n"
+    sql += f'        DROP TABLE {snapshot};\n'
+    sql += '    END IF;\n'
+    sql += 'END;\n'
+    sql += '$do$;\n\n'
+
+    sql += f'CREATE TABLE IF NOT EXISTS {snapshot} AS\n'
+    sql += '    SELECT NULL::text AS snapshot_periode, NULL::timestamp AS snapshot_datum, t.*\n'
+    sql += f'    FROM {data} t\n'
+    sql += '    WITH NO DATA;\n\n'
+    sql += f'CREATE INDEX IF NOT EXISTS {table_name}_snapshot_periode_idx ON {snapshot} (snapshot_periode);\n\n'
+
+    sql += f'CREATE OR REPLACE FUNCTION {schema_name}.refresh_{supplier}_snapshots(p_levering text)\n'
+    sql += 'RETURNS bigint AS\n'
+    sql += '$body$\n'
+    sql += 'DECLARE\n'
+    sql += '    v_begin timestamp;\n'
+    sql += '    v_first timestamp;\n'
+    sql += '    v_full boolean;\n'
+    sql += '    v_einde timestamp;\n'
+    sql += '    v_periode text;\n'
+    sql += '    v_count bigint;\n'
+    sql += '    v_rows bigint := 0;\n'
+    sql += 'BEGIN\n'
+    sql += f'    SELECT min({ODL_DATUM_BEGIN}) INTO v_begin\n'
+    sql += f'    FROM {data}\n'
+    sql += f'    WHERE {ODL_LEVERING_FREK} = p_levering;\n\n'
+    sql += '    IF v_begin IS NULL THEN\n'
+    sql += '        RETURN 0;\n'
+    sql += '    END IF;\n\n'
+    sql += f'    SELECT min({ODL_DATUM_BEGIN}) INTO v_first FROM {data};\n'
+
+    for period in period_types:
+        interval = PERIOD_INTERVALS[period]['interval']
+        end = f"{{start}} + interval '{interval}' - interval '1 second'"
+        all_ends = end.format(start = 'g')
+        begin_ends = end.format(start = PERIOD_INTERVALS[period]['start'].format(ts = f'd.{ODL_DATUM_BEGIN}'))
+        current_end = end.format(start = PERIOD_INTERVALS[period]['start'].format(ts = 'localtimestamp'))
+        first = PERIOD_INTERVALS[period]['start'].format(ts = 'v_first')
+        code = PERIOD_INTERVALS[period]['code'].format(ts = 'v_einde')
+
+        sql += f'\n    -- {period}: all periods when there are no snapshots yet, else the touched ones\n'
+        sql += f"    v_full := NOT EXISTS (SELECT 1 FROM {snapshot} WHERE snapshot_periode LIKE '%-{period}%');\n"
+        sql += '    FOR v_einde IN\n'
+        sql += f'        SELECT {all_ends}\n'
+        sql += f"        FROM generate_series({first}, localtimestamp, interval '{interval}') AS g\n"
+        sql += '        WHERE v_full\n'
+        sql += '        UNION\n'
+        sql += f'        SELECT DISTINCT {begin_ends}\n'
+        sql += f'        FROM {data} d\n'
+        sql += f'        WHERE NOT v_full AND d.{ODL_LEVERING_FREK} = p_levering AND d.{ODL_DATUM_BEGIN} <= localtimestamp\n'
+        sql += '        UNION\n'
+        sql += f'        SELECT {current_end}\n'
+        sql += '    LOOP\n'
+        sql += f'        v_periode := {code};\n'
+        sql += f'        DELETE FROM {snapshot} WHERE snapshot_periode = v_periode;\n'
+        sql += f'        INSERT INTO {snapshot}\n'
+        sql += f'            SELECT v_periode, v_einde, s.* FROM {schema_name}.show_{supplier}_at(v_einde) s;\n'
+        sql += '        GET DIAGNOSTICS v_count = ROW_COUNT;\n'
+        sql += '        v_rows := v_rows + v_count;\n'
+        sql += '    END LOOP;\n'
 
-    if 'LIMITS' in config:
-        limitations = config['LIMITS']
-        max_rows = limitations['max_rows']
-        max_errors = limitations['max_errors']
+    # for
 
-        if max_rows < 1:
-            max_rows = None
+    sql += '\n    RETURN v_rows;\n'
+    sql += 'END;\n'
+    sql += '$body$\n'
+    sql += 'LANGUAGE plpgsql;\n'
 
-    return max_rows, data_test_fraction, max_errors
+    return sql
 
-### get_limits ###
+### create_snapshot_functions ###
 
 
-def load_odl_table(table_name: str, server_config: dict) -> pd.DataFrame:
-    """  Load ODL from PostgreSQL
+def refresh_snapshots(project_name: str, supplier: str, levering: str, server_config: dict) -> int:
+    """ Refreshes the report period snapshots after loading a delivery
+
+    Args:
+        project_name (str): name of the project
+        supplier (str): name of the supplier
+        levering (str): levering_rapportageperiode of the loaded delivery
+        server_config (dict): database containing the data of the supplier
+
+    Returns:
+        int: number of snapshot rows written
+    """
+    import sqlalchemy
+
+    engine = get_engine(server_config)
+    with measure_stage('db_io') as stage, engine.begin() as conn:
+        rows = conn.execute(
+            sqlalchemy.text(f"SELECT {server_config['POSTGRES_SCHEMA']}.refresh_{supplier}_snapshots(:levering)"),
+            {'levering': levering},
+        ).scalar()
+        stage['rows'] = rows
+
+    # with
+
+    engine.dispose()
+    logger.info(f'{rows} snapshot rows of {supplier}_{project_name} refreshed for {levering}')
+
+    return rows
+
+### refresh_snapshots ###
+
+
+ODL_FINGERPRINT = 'levering_fingerprint'
+
+
+def file_fingerprint(filename: str, block_size: int = 1024 * 1024) -> str:
+    """ Returns the fingerprint of a file: its size and blake2b hash of its content
+
+    The file is hashed in blocks, so files of any size use little memory.
+
+    Args:
+        filename (str): name of the file
+        block_size (int, optional): bytes to read at once. Defaults to 1 MB.
+
+    Returns:
+        str: <size in bytes>:<hex digest>
+    """
+    digest = hashlib.blake2b(digest_size = 32)
+    with open(filename, 'rb') as infile:
+        for block in iter(lambda: infile.read(block_size), b''):
+            digest.update(block)
+
+    # with
+
+    return f'{os.path.getsize(filename)}:{digest.hexdigest()}'
+
+### file_fingerprint ###
+
+
+def delivery_fingerprint(filenames: list) -> str:
+    """ Returns the fingerprint of all data files of a delivery
+
+    The fingerprint of a single file is its file_fingerprint. For several
+    files the fingerprints of the files, in the order given, are hashed
+    again. Like file_fingerprint the result starts with the total size, so
+    deliveries can be preselected on size without reading their files.
+
+    Args:
+        filenames (list): data files of the delivery
+
+    Returns:
+        str: <total size in bytes>:<hex digest>
+    """
+    if len(filenames) == 1:
+        return file_fingerprint(filenames[0])
+
+    fingerprints = [file_fingerprint(filename) for filename in filenames]
+    digest = hashlib.blake2b('\n'.join(fingerprints).encode('utf8'), digest_size = 32)
+    size = sum([int(fingerprint.split(':')[0]) for fingerprint in fingerprints])
+
+    return f'{size}:{digest.hexdigest()}'
+
+### delivery_fingerprint ###
+
+
+def load_delivery_fingerprints(project_name: str,
+                               supplier: str,
+                               server_config: dict,
+                               size: int = None,
+                              ) -> dict:
+    """ Returns the fingerprints of the deliveries in the levering table
+
+    Args:
+        project_name (str): name of the project
+        supplier (str): name of the supplier
+        server_config (dict): database containing the data of the supplier
+        size (int, optional): only fingerprints of deliveries of this size. Defaults to None.
+
+    Returns:
+        dict: fingerprint -> set of levering_rapportageperiodes
+    """
+    import sqlalchemy
+
+    table_name = get_table_name(project_name, supplier, TAG_TABLE_DELIVERY, 'data')
+    sql = f"SELECT {ODL_FINGERPRINT}, {ODL_LEVERING_FREK} " \
+          f"FROM {server_config['POSTGRES_SCHEMA']}.{table_name} " \
+          f"WHERE {ODL_FINGERPRINT} LIKE :prefix"
+
+    engine = get_engine(server_config)
+    with measure_stage('db_io') as stage, engine.connect() as conn:
+        rows = conn.execute(
+            sqlalchemy.text(sql),
+            {'prefix': '%' if size is None else f'{size}:%'},
+        ).fetchall()
+        stage['rows'] = len(rows)
+
+    # with
+
+    engine.dispose()
+
+    fingerprints = {}
+    for fingerprint, levering in rows:
+        fingerprints.setdefault(fingerprint, set()).add(levering)
+
+    return fingerprints
+
+### load_delivery_fingerprints ###
+
 
-    Currently only used to load data_kwaliteit_codes. This is stored centrally
-    in the techniek/odl database.
+def find_identical_delivery(filenames: list,
+                            periode: str,
+                            project_name: str,
+                            supplier: str,
+                            server_config: dict,
+                            fingerprint: str = None,
+                           ) -> str:
+    """ Looks up an earlier load of the same data files for the same periode
+
+    Only deliveries with the same total size are fetched. When there are
+    none, which is the usual case, the files are not even read; else they
+    are hashed and compared. Identical files delivered for another periode
+    do not count: they are the data of that periode.
 
     Args:
-        table_name (str): name of the postgres table, schema is predefined
-        odl_server_config (dict): contains postgres access data of the odl server
+        filenames (list): data files of a new delivery
+        periode (str): levering_rapportageperiode of the new delivery
+        project_name (str): name of the project
+        supplier (str): name of the supplier
+        server_config (dict): database containing the data of the supplier
+        fingerprint (str, optional): delivery_fingerprint of filenames when
+            already known. Defaults to None.
 
     Returns:
-        pd.DataFrame: Operationele Data Laag
+        str: fingerprint of the files when an identical delivery was loaded
+            for periode, else None
     """
-    result = st.sql_select(
-        table_name = table_name,
-        columns = '*',
-        sql_server_config = server_config,
-        verbose = False,
-    ).fillna('')
+    size = sum([os.path.getsize(filename) for filename in filenames])
+    known = load_delivery_fingerprints(project_name, supplier, server_config, size = size)
+    if len(known) == 0:
+        return None
 
-    return result
+    if fingerprint is None:
+        fingerprint = delivery_fingerprint(filenames)
 
-### load_odl_table ###
+    if periode in known.get(fingerprint, set()):
+        return fingerprint
 
+    return None
 
-def load_schema(table_name: str, server_config: dict) -> pd.DataFrame:
-    """ Load a table from a schema and database specified in server_config
+### find_identical_delivery ###
+
+
+def store_delivery_fingerprint(project_name: str,
+                               supplier: str,
+                               periodes: list,
+                               fingerprint: str,
+                               server_config: dict,
+                              ) -> int:
+    """ Stores the fingerprint of a loaded delivery in the levering table
+
+    Fingerprints that are already set, e.g. by the command that loaded the
+    delivery, are kept.
 
     Args:
-        table_name (str): name of the table to load
-        server_config (dict): dictionary containing postgres parameters
+        project_name (str): name of the project
+        supplier (str): name of the supplier
+        periodes (list): levering_rapportageperiodes of the delivery
+        fingerprint (str): delivery_fingerprint of its data files
+        server_config (dict): database containing the data of the supplier
 
     Returns:
-        pd.DataFrame: SQL table loaded from postgres
+        int: number of levering rows updated
     """
-    return st.sql_select(
-        table_name = table_name,
-        columns = '*',
-        sql_server_config = server_config,
-        verbose = False,
-    ).fillna('')
+    import sqlalchemy
 
-### load_schema ###
+    table_name = get_table_name(project_name, supplier, TAG_TABLE_DELIVERY, 'data')
+    sql = f"UPDATE {server_config['POSTGRES_SCHEMA']}.{table_name} " \
+          f"SET {ODL_FINGERPRINT} = :fingerprint " \
+          f"WHERE {ODL_LEVERING_FREK} = :levering AND {ODL_FINGERPRINT} IS NULL"
 
+    rows = 0
+    engine = get_engine(server_config)
+    with measure_stage('db_io') as stage, engine.begin() as conn:
+        for levering in periodes:
+            rows += conn.execute(
+                sqlalchemy.text(sql),
+                {'fingerprint': fingerprint, 'levering': levering},
+            ).rowcount
 
-def get_server(config: dict, index: str, username: str, password: str) -> dict:
-    server_config = config[index]
-    server_config['POSTGRES_USER'] = username
-    server_config['POSTGRES_PW'] = password
+        stage['rows'] = rows
 
-    # del env
+    # with
 
-    return server_config
+    engine.dispose()
 
-### get_server ###
+    return rows
 
+### store_delivery_fingerprint ###
 
-def get_table_name(project_name: str, supplier: str, table_info: str, postfix: str):
-    table_name = f'{supplier}_{project_name}_{table_info}_{postfix}'
 
-    return table_name
+LOAD_STATE_TABLE = 'odl_load_state'
 
-### get_table_name ###
 
+def create_load_state_sql(schema_name: str) -> str:
+    """ Returns SQL creating the table with the progress of resumable loads
+    """
+    sql = f'CREATE TABLE IF NOT EXISTS {schema_name}.{LOAD_STATE_TABLE} (\n'
+    sql += '    load_id text PRIMARY KEY,\n'
+    sql += '    target_table text NOT NULL,\n'
+    sql += '    staging_table text NOT NULL,\n'
+    sql += f'    {ODL_LEVERING_FREK} text NOT NULL,\n'
+    sql += f'    {ODL_FINGERPRINT} text NOT NULL,\n'
+    sql += '    first_recordnummer bigint NOT NULL,\n'
+    sql += '    last_recordnummer bigint NOT NULL,\n'
+    sql += '    rows_loaded bigint NOT NULL DEFAULT 0,\n'
+    sql += "    status text NOT NULL DEFAULT 'loading',\n"
+    sql += '    started timestamp DEFAULT now(),\n'
+    sql += '    updated timestamp DEFAULT now()\n'
+    sql += ')'
+
+    return sql
 
-def get_table_names(project_name: str, supplier: str, postfix: str = 'data') -> dict:
-    """ Get table names of project for specific supplier.
+### create_load_state_sql ###
+
+
+def iter_csv_chunks(data_file: str, chunk_rows: int, skip_rows: int = 0, delimiter: str = ';'):
+    """ Yields lists of rows of a csv file, the header is skipped
 
     Args:
-        project_name (str): Name of project
-        leverancier (str): Name of leverancier
-        postfix (str): either 'data' or 'description'
+        data_file (str): name of the csv file
+        chunk_rows (int): rows per chunk
+        skip_rows (int, optional): data rows to skip first. Defaults to 0.
+        delimiter (str, optional): column delimiter. Defaults to ';'.
+    """
+    import csv
+    import itertools
+
+    with open(data_file, encoding = 'utf8', newline = '') as infile:
+        reader = csv.reader(infile, delimiter = delimiter)
+        next(reader)
+        for _ in itertools.islice(reader, skip_rows):
+            pass
+
+        while True:
+            chunk = list(itertools.islice(reader, chunk_rows))
+            if len(chunk) == 0:
+                break
+
+            yield chunk
+
+        # while
+    # with
+
+### iter_csv_chunks ###
+
+
+def load_delivery_resumable(data_file: str,
+                            table_name: str,
+                            columns: list,
+                            levering: str,
+                            server_config: dict,
+                            chunk_rows: int = None,
+                            delimiter: str = ';',
+                            attributes: list = None,
+                            quality_table: str = None,
+                            code_bronbestand: str = '',
+                            summary_table: str = None,
+                           ) -> dict:
+    """ Loads a data file in checkpointed chunks that survive an interruption
+
+    The rows are numbered with bronbestand_recordnummer from the sequence of
+    that column in table_name, so concurrent loads never hand out the same
+    numbers; a column without a sequence gets one, starting after its
+    highest number. levering is filled in by the default of the column in
+    the staging table. The rows are copied in chunks into the staging
+    table; each chunk is committed together with its last recordnummer in
+    odl_load_state. When the load is interrupted, calling this function
+    again with the same file continues after the last committed chunk.
+    When all chunks are in, the staging table is inserted into table_name in
+    one transaction, so readers see all rows of the delivery or none. That
+    transaction also moves the sequence past the highest recordnummer.
+
+    A load is identified by table, levering and the fingerprint of the file;
+    a changed file starts a new load. A completed load is not repeated.
+
+    When attributes and quality_table are given, the file is checked for
+    duplicate primary keys with find_duplicate_keys. The findings replace
+    the VALUE_DUPLICATE_KEY findings of the levering in quality_table in the
+    same transaction as the swap; the validation function of
+    create_validation_function keeps them. When summary_table is given the
+    summary of the levering is rebuilt in that transaction as well.
+
+    Args:
+        data_file (str): csv file with header, columns as in columns
+        table_name (str): data table to load into
+        columns (list): columns of table_name in the order of the file
+        levering (str): levering_rapportageperiode of the delivery
+        server_config (dict): database containing table_name
+        chunk_rows (int, optional): rows per chunk. Defaults to None: as
+            advised by the memory governor.
+        delimiter (str, optional): column delimiter. Defaults to ';'.
+        attributes (list, optional): dicts with kolomnaam, keytype and
+            code_attribuut of table_name. Defaults to None: no duplicate check.
+        quality_table (str, optional): bronbestand_datakwaliteit table of
+            the supplier. Defaults to None: no duplicate check.
+        code_bronbestand (str, optional): code of the bronbestand for the
+            findings. Defaults to ''.
+        summary_table (str, optional): bronbestand_datakwaliteitsamenvatting
+            table of the supplier. Defaults to None: the summary is not rebuilt.
 
     Returns:
-        dict: dictionary with all data table names
+        dict: rows (loaded into table_name), chunks (committed in this call),
+            resumed_from (recordnummer the load continued after, None for a
+            new load), duplicates (rows with a duplicate key) and status
     """
-    tables_name: dict = {TAG_TABLE_SCHEMA: get_table_name(project_name, supplier, TAG_TABLE_SCHEMA, postfix),
-                         TAG_TABLE_META: get_table_name(project_name, supplier, TAG_TABLE_META, postfix),
-                         TAG_TABLE_DELIVERY: get_table_name(project_name, supplier, TAG_TABLE_DELIVERY, postfix),
-                         TAG_TABLE_QUALITY: get_table_name(project_name, supplier, TAG_TABLE_QUALITY, postfix),
-                        }
-
-    return tables_name
+    import io
+    import csv
+    import sqlalchemy
+
+    schema = server_config['POSTGRES_SCHEMA']
+    target = f'{schema}.{table_name}'
+    state = f'{schema}.{LOAD_STATE_TABLE}'
+    fingerprint = file_fingerprint(data_file)
+    load_id = f'{table_name}:{levering}:{fingerprint}'
+    staging_name = f'{table_name}_staging_{zlib.crc32(load_id.encode()):08x}'[-MAX_IDENTIFIER_LENGTH:]
+    staging = f'{schema}.{staging_name}'
+    copy_columns = ', '.join([ODL_RECORDNO] + list(columns))
+    sequence_name = f'{table_name}_{ODL_RECORDNO}_seq'[-MAX_IDENTIFIER_LENGTH:]
+
+    if chunk_rows is None:
+        with open(data_file, 'rb') as infile:
+            sample = infile.read(1024 * 1024).splitlines()[1:-1]
+
+        row_bytes = 3 * sum([len(line) for line in sample]) / max(1, len(sample)) + 100
+        chunk_rows = get_memory_governor().chunk_rows(row_bytes)
 
-### get_table_names ###
+    # if
 
+    engine = get_engine(server_config)
+    with engine.begin() as conn:
+        conn.execute(sqlalchemy.text(create_load_state_sql(schema)))
+
+        # the recordnummers are taken from the sequence of the column
+        sequence = conn.execute(
+            sqlalchemy.text('SELECT pg_get_serial_sequence(:target, :column)'),
+            {'target': target, 'column': ODL_RECORDNO},
+        ).scalar()
+        if sequence is None:
+            sequence = f'{schema}.{sequence_name}'
+            conn.execute(sqlalchemy.text(f'CREATE SEQUENCE {sequence} OWNED BY {target}.{ODL_RECORDNO}'))
+            conn.execute(sqlalchemy.text(f"SELECT setval('{sequence}', "
+                                         f"(SELECT coalesce(max({ODL_RECORDNO}), 0) + 1 FROM {target}), false)"))
 
-def get_supplier_dict(config: dict, supplier: str, delivery):
-    """ Returns supplier s info from supplier.
+        # if
 
-        The relevant delivery info is copied and all info about deliveries
-        is deleted.
+        row = conn.execute(
+            sqlalchemy.text(f'SELECT last_recordnummer, rows_loaded, status '
+                            f'FROM {state} WHERE load_id = :load_id'),
+            {'load_id': load_id},
+        ).fetchone()
+
+        if row is None:
+            conn.execute(sqlalchemy.text(f'DROP TABLE IF EXISTS {staging}'))
+            conn.execute(sqlalchemy.text(f'CREATE TABLE {staging} (LIKE {target} INCLUDING DEFAULTS)'))
+            conn.execute(sqlalchemy.text(f'ALTER TABLE {staging} ALTER COLUMN {ODL_LEVERING_FREK} '
+                                         f"SET DEFAULT {sql_literal(levering, 'text')}"))
+            conn.execute(
+                sqlalchemy.text(f'INSERT INTO {state} (load_id, target_table, staging_table, '
+                                f'{ODL_LEVERING_FREK}, {ODL_FINGERPRINT}, first_recordnummer, '
+                                f'last_recordnummer) VALUES (:load_id, :target, :staging, '
+                                f':levering, :fingerprint, 0, 0)'),
+                {'load_id': load_id, 'target': table_name, 'staging': staging_name,
+                 'levering': levering, 'fingerprint': fingerprint},
+            )
+            last_recno, status, loaded = 0, 'loading', 0
+            resumed_from = None
 
-    Args:
-        suppliers (dict): dictionary of suppliers
-        supplier (str): name of the supplier to select
-        delivery (int ro str): sequence number of delivery to apply
+        else:
+            last_recno, loaded, status = row
+            resumed_from = last_recno
+            logger.info(f'Resuming load of {data_file} into {target} after recordnummer {last_recno}')
 
-    Returns:
-        dict: dictionary of supplier addjusted with correct delivery
-    """
-    flag = False
-    suppliers = config['SUPPLIERS']
-    leverancier = suppliers[supplier].copy()
-    leverancier['config'] = config
-    leverancier['supplier_id'] = supplier
-    indices = []
-    chosen = '*'
-    delivery_configs = {}
-    deliveries = []
+        # if
+    # with
 
-    # find all deliveries in the config dictionary
-    # store in delivery_configs
-    for key in leverancier.keys():
-        # delivery is identified by 'delivery' in the key
-        if 'delivery' in key:
-            indices.append(key)
+    result = {'rows': loaded, 'chunks': 0, 'resumed_from': resumed_from, 'duplicates': 0, 'status': status}
+    if status == 'done':
+        logger.info(f'{data_file} has already been loaded into {target}')
+        engine.dispose()
 
-            # format is delivery-<int> or delivery-*, identify delivery seq
-            splits = key.split('-')
+        return result
 
-            # correct delivery key has just two parts
-            if len(splits) == 2:
+    # if
 
-                # It is the second part we need; when it is a uint
-                if splits[1].isdigit():
-                    seq = int(splits[1])
-                    delivery_configs[str(splits[1])] = leverancier[key]
-                    delivery_configs[str(splits[1])]['delivery_naam'] = key
-                    delivery_configs[str(splits[1])]['delivery_keus'] = ''
+    duplicates = []
+    if attributes is not None and quality_table is not None:
+        duplicates = find_duplicate_keys(data_file, attributes, delimiter)
+        result['duplicates'] = sum([len(group['rows']) - 1 for group in duplicates])
 
-                # or just *
-                elif splits[1] == '*':
-                    delivery_configs[str(splits[1])] = leverancier[key]
-                    delivery_configs[str(splits[1])]['delivery_naam'] = key
-                    delivery_configs[str(splits[1])]['delivery_keus'] = ''
+    # if
 
-                else:
-                    logger.error(f'*** Delivery {key} is not a valid delivery')
-                    flag = True
+    with measure_stage('db_io') as stage:
+        connection = engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            for chunk in iter_csv_chunks(data_file, chunk_rows, loaded, delimiter):
+                cursor.execute('SELECT nextval(%s) FROM generate_series(1, %s) ORDER BY 1',
+                               (sequence, len(chunk)))
+                numbers = [row[0] for row in cursor.fetchall()]
+
+                buffer = io.StringIO()
+                writer = csv.writer(buffer, delimiter = delimiter)
+                for number, values in zip(numbers, chunk):
+                    writer.writerow([number] + values)
+
+                buffer.seek(0)
+                last_recno = numbers[-1]
+                loaded += len(chunk)
+
+                # the chunk and its checkpoint are committed together
+                cursor.copy_expert(f"COPY {staging} ({copy_columns}) FROM STDIN "
+                                   f"WITH (FORMAT csv, DELIMITER '{delimiter}')", buffer)
+                cursor.execute(f'UPDATE {state} SET first_recordnummer = CASE WHEN first_recordnummer = 0 '
+                               f'THEN %s ELSE first_recordnummer END, last_recordnummer = %s, '
+                               f'rows_loaded = %s, updated = now() WHERE load_id = %s',
+                               (numbers[0], last_recno, loaded, load_id))
+                connection.commit()
+                result['chunks'] += 1
+                logger.debug('%s: committed up to recordnummer %d', target, last_recno)
+
+            # for
+
+            # swap: all rows of the delivery and their findings become visible at once
+            if quality_table is not None:
+                store_duplicate_findings(cursor, f'{schema}.{quality_table}', staging, duplicates,
+                                         attributes, code_bronbestand, levering)
+                if summary_table is not None:
+                    cursor.execute(quality_summary_sql(schema, quality_table, summary_table, levering))
 
-                # if
             # if
-        # if
-    # for
 
-    # all deliveries are stored in delivery_configs
-    if len(delivery_configs) > 0:
-        # identify which delivery applies
-        delivery_index = str(delivery)
+            cursor.execute(f'INSERT INTO {target} SELECT * FROM {staging} ORDER BY {ODL_RECORDNO}')
 
-        # when deliveries are applied, there must always be a catc-all delivery
-        if '*' not in delivery_configs.keys():
-            logger.error('*** delivery-* must be specified when specifying deliveries')
-            flag = True
+            # rows inserted with explicit numbers may have passed the sequence
+            cursor.execute(f'SELECT setval(%s, greatest((SELECT max({ODL_RECORDNO}) FROM {target}), '
+                           f'(SELECT last_value FROM {sequence})))', (sequence, ))
+            cursor.execute(f"UPDATE {state} SET status = 'done', updated = now() WHERE load_id = %s",
+                           (load_id, ))
+            cursor.execute(f'DROP TABLE {staging}')
+            connection.commit()
 
-        elif delivery_index in delivery_configs.keys():
-            delivery_configs[delivery_index]['delivery_keus'] = 'x'
-            for key in delivery_configs[delivery_index]:
-                leverancier[key] = delivery_configs[delivery_index][key]
+        except Exception:
+            connection.rollback()
+            raise
 
-        elif '*' in delivery_configs.keys():
-            delivery_configs['*']['delivery_keus'] = 'x'
-            for key in delivery_configs['*']:
-                leverancier[key] = delivery_configs['*'][key]
+        finally:
+            connection.close()
 
-        # if
-    # if
+        # try..except..finally
 
-    # set default when key is lacking
+        stage['rows'] = loaded
 
-    if flag:
-        raise DiDoError('Errors in delivery specification.')
+    # with
 
-    for key in indices:
-        leverancier.pop(key)
+    engine.dispose()
+    result['rows'] = loaded
+    result['status'] = 'done'
 
-    return leverancier, delivery_configs
+    return result
 
-### get_supplier_dict ###
+### load_delivery_resumable ###
 
 
-def enhance_cargo_dict(cargo_dict: dict, cargo_name, supplier_name: str):
-    """ Returns supplier s info from supplier.
+def store_duplicate_findings(cursor,
+                             quality_table: str,
+                             staging: str,
+                             duplicates: list,
+                             attributes: list,
+                             code_bronbestand: str,
+                             levering: str,
+                            ):
+    """ Replaces the duplicate key findings of a levering in quality_table
 
-        The relevant delivery info is copied and all info about deliveries
-        is deleted.
+    The rows of the data file are mapped to their recordnummer in staging:
+    the n-th row of the file is the row with the n-th recordnummer.
 
     Args:
-        suppliers (dict): dictionary of suppliers
-        supplier (str): name of the supplier to select
-        delivery (int ro str): sequence number of delivery to apply
-
-    Returns:
-        dict: dictionary of supplier addjusted with correct delivery
+        cursor: DBAPI cursor of the transaction of the swap
+        quality_table (str): schema qualified bronbestand_datakwaliteit table
+        staging (str): schema qualified staging table with the delivery
+        duplicates (list): groups as returned by find_duplicate_keys
+        attributes (list): dicts with kolomnaam and code_attribuut
+        code_bronbestand (str): code of the bronbestand
+        levering (str): levering_rapportageperiode of the delivery
     """
-    splits = cargo_name.split('_')
-    if len(splits) == 2:
-        if splits[0] != 'delivery':
-            raise_DiDoError(f'*** Delivery should start with "delivery_", error for "{cargo_name}"')
+    cursor.execute(f'DELETE FROM {quality_table} WHERE {ODL_LEVERING_FREK} = %s '
+                   f'AND code_datakwaliteit = %s', (levering, VALUE_DUPLICATE_KEY))
+    if len(duplicates) == 0:
+        return
 
-    cargo_dict[ODL_LEVERING_FREK] = splits[1]
-    cargo_dict['supplier_id'] = supplier_name
+    row_numbers = sorted({row for group in duplicates for row in group['rows'][1:]})
+    cursor.execute(f'SELECT row_number, {ODL_RECORDNO} FROM '
+                   f'(SELECT {ODL_RECORDNO}, row_number() OVER (ORDER BY {ODL_RECORDNO}) AS row_number '
+                   f'FROM {staging}) AS numbered WHERE row_number = ANY(%s)', (row_numbers, ))
+    recordnummers = dict(cursor.fetchall())
 
-    return cargo_dict
+    findings = duplicate_findings(duplicates, attributes, code_bronbestand, levering, recordnummers)
+    columns = ', '.join(findings.columns)
+    cursor.executemany(f'INSERT INTO {quality_table} ({columns}) '
+                       f"VALUES ({', '.join(['%s'] * len(findings.columns))})",
+                       findings.values.tolist())
 
-### get_supplier_dict ###
+    logger.info(f'{len(findings)} duplicate key findings of {levering} stored in {quality_table}')
 
+    return
 
-def get_cargo(cargo_config: dict, supplier: str):
-    cargo = cargo_config['DELIVERIES'][supplier]
+### store_duplicate_findings ###
 
-    return cargo
 
-### get_cargo ###
+def split_line_ranges(data_file: str, parts: int) -> list:
+    """ Splits a data file after its header into byte ranges at line boundaries
 
+    Each range starts at the beginning of a line and ends after a newline (or
+    at the end of the file). Fields must not contain newlines, which holds
+    for the ';' separated deliveries.
 
-def get_current_delivery_seq(project_name: str, supplier: str, server_config: dict):
-    tables = get_table_names(project_name, supplier)
+    Args:
+        data_file (str): name of the data file
+        parts (int): number of ranges wanted
 
-    table_name = tables[TAG_TABLE_DELIVERY]
-    try:
-        count = st.table_size(table_name, True, server_config)
-    except:
-        raise DiDoError(f'Table {table_name} does not exist. Are you sure you used create_table with the current config.yaml file?')
-    # try..except
+    Returns:
+        list: (start, end) byte offsets, at most parts, empty ranges omitted
+    """
+    size = os.path.getsize(data_file)
+    with open(data_file, 'rb') as infile:
+        infile.readline()
+        starts = [infile.tell()]
+        step = max(1, (size - starts[0]) // max(1, parts))
+        for part in range(1, parts):
+            infile.seek(max(starts[-1], starts[0] + part * step))
+            infile.readline()
+            position = infile.tell()
+            if position >= size:
+                break
+
+            if position > starts[-1]:
+                starts.append(position)
 
-    return count
+        # for
+    # with
 
-### get_current_delivery_seq ###
+    ends = starts[1:] + [size]
 
+    return [(start, end) for start, end in zip(starts, ends) if end > start]
+
+### split_line_ranges ###
 
-def report_psql_use(table: str, servers: dict, tables_exist: bool):
-    """ Reports to a user he shoukld use psql. The correct command is displayed
+
+class FileRange:
+    """ Read-only file object limited to a byte range, as input for COPY
 
     Args:
-        table (str): name of the fiole containing the SQL instructions
-        servers (dict): dictionary of server configurations
-        tables_exist (bool): True if tablkes already exist, else False
+        filename (str): name of the file
+        start (int): first byte of the range
+        end (int): byte after the range
     """
-    host = servers['DATA_SERVER_CONFIG']['POSTGRES_HOST']
-    user = servers['DATA_SERVER_CONFIG']['POSTGRES_USER']
-    db = servers['DATA_SERVER_CONFIG']['POSTGRES_DB']
+    def __init__(self, filename: str, start: int, end: int):
+        self.file = open(filename, 'rb')
+        self.file.seek(start)
+        self.remaining = end - start
 
-    report_string = f'$ psql -h {host} -U {user} -f {table}.sql {db}'
+    ### __init__ ###
 
-    logger.info('')
-    logger.info("Don't forget to run psql to create or fill the tables")
-    logger.info("This can best be done from your work/sql directory")
-    logger.info('Suggested command:')
-    logger.info('')
-    logger.info(report_string)
+    def read(self, size: int = -1) -> bytes:
+        """ Reads at most size bytes, not beyond the end of the range """
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
 
-    if tables_exist:
-        logger.info('')
-        logger.error('*** You have been warned that the tables you want to create already exist.')
-        logger.error('*** If you really want to recreate these tables, thereby erasing current contents')
-        logger.error('*** run dido_kill_supplier.py ***')
+        data = self.file.read(size)
+        self.remaining -= len(data)
 
-    logger.info('')
+        return data
 
-    return
+    ### read ###
 
-### report_psql_use ###
+    def readline(self, size: int = -1) -> bytes:
+        """ Reads a line, not beyond the end of the range """
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
 
+        data = self.file.readline(size)
+        self.remaining -= len(data)
 
-def show_database(server_config: dict, table_name: str, pfun = logger.debug):
-    if len(table_name) > 0:
-        pfun(f'Table:    {table_name}')
-        pfun('')
+        return data
 
-    pfun(f'Host:     {server_config["POSTGRES_HOST"]}')
-    pfun(f'Database: {server_config["POSTGRES_DB"]}')
-    pfun(f'Port:     {server_config["POSTGRES_PORT"]}')
-    pfun(f'Schema:   {server_config["POSTGRES_SCHEMA"]}')
+    ### readline ###
 
-    return
+    def close(self):
+        """ Closes the file """
+        self.file.close()
 
-### show_database ###
+    ### close ###
 
+### Class: FileRange ###
 
-def delivery_exists(delivery: dict, supplier_id: str, project_name: str, server_configs: dict) -> bool:
-    """ Checks whether a delivery exists. Column 'levering_rapportageperiode is used
-        to check this.
+
+def parallel_copy_load(data_file: str,
+                       attributes: list,
+                       table_name: str,
+                       server_config: dict,
+                       workers: int = None,
+                       delimiter: str = ';',
+                      ) -> dict:
+    """ Loads a data file with concurrent COPY streams into an unlogged staging table
+
+    A single COPY stream is limited by one server core. The data file is
+    split into byte ranges at line boundaries, each range is copied by its
+    own connection into an UNLOGGED staging table with the columns of
+    attributes but without constraints. The data are then moved into
+    table_name with a single INSERT ... SELECT, which also applies the
+    constraints and defaults (like bronbestand_recordnummer) of table_name.
 
     Args:
-        delivery (dict): dictionary containing the deliverydescription.
-            Used to get the key 'levering_rapportageperiode' with thge current delivery
-        supplier_id (str): supplier name, used for table name construction
-        project_name (str): name of the project, used for table name construction
-        server_configs (dict): the existence of deliveries is chcked in the data server database
+        data_file (str): csv file with header; the header names the columns
+        attributes (list): schema rows of the table, as used by create_table
+        table_name (str): data table to load into
+        server_config (dict): database containing table_name
+        workers (int, optional): number of COPY streams. Defaults to None:
+            the number of cores, as far as the memory governor allows.
+        delimiter (str, optional): column delimiter. Defaults to ';'.
 
     Returns:
-        bool: True = delivery exists, else not
+        dict: rows (inserted into table_name), streams and seconds per stream
     """
-    # fetch a dataframe with deliveries from the data table using distinct
-    # on levering_rapportageperiode
+    from concurrent.futures import ThreadPoolExecutor
 
-    server_config = server_configs['DATA_SERVER_CONFIG']
-    table_name = get_table_name(project_name, supplier_id, TAG_TABLE_DELIVERY, 'data')
+    import sqlalchemy
+
+    schema = server_config['POSTGRES_SCHEMA']
+    target = f'{schema}.{table_name}'
+    suffix = f'_staging_{os.getpid()}'
+    staging = f'{schema}.{table_name[:MAX_IDENTIFIER_LENGTH - len(suffix)]}{suffix}'
+
+    with open(data_file, encoding = 'utf8') as infile:
+        header = infile.readline().strip()
+
+    columns = ', '.join([col.strip().strip('"') for col in header.split(delimiter)])
+    if workers is None:
+        workers = get_memory_governor().workers(os.cpu_count())
+
+    ranges = split_line_ranges(data_file, workers)
+    definitions = ',\n    '.join(column_definitions(attributes, constraints = False))
+
+    engine = get_engine(server_config)
+    with engine.begin() as conn:
+        conn.execute(sqlalchemy.text(f'DROP TABLE IF EXISTS {staging}'))
+        conn.execute(sqlalchemy.text(f'CREATE UNLOGGED TABLE {staging} (\n    {definitions}\n)'))
+
+    def copy_range(start: int, end: int) -> float:
+        """ Copies the lines between start and end into the staging table """
+        started = time.time()
+        source = FileRange(data_file, start, end)
+        connection = engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.copy_expert(f"COPY {staging} ({columns}) FROM STDIN "
+                               f"WITH (FORMAT csv, DELIMITER '{delimiter}')", source)
+            connection.commit()
+
+        finally:
+            connection.close()
+            source.close()
+
+        # try..finally
+
+        return time.time() - started
+
+    ### copy_range ###
+
+    result = {'rows': 0, 'streams': len(ranges), 'seconds': []}
     try:
-        leveringen = st.sql_select(
-            table_name = table_name,
-            columns = f'DISTINCT {ODL_LEVERING_FREK}',
-            sql_server_config = server_config,
-            verbose = False,
-        )
-    except sqlalchemy.exc.ProgrammingError:
-        logging.critical(f'*** Tables do not exist for {supplier_id}_{project_name}_...')
-        show_database(server_config, table_name, logger.info)
-        raise DiDoError('Error while fetching tables. Did you ever apply create_tables '
-                        f'for {supplier_id}_{project_name}?')
+        with measure_stage('db_io') as stage:
+            with ThreadPoolExecutor(max_workers = max(1, len(ranges))) as executor:
+                futures = [executor.submit(copy_range, start, end) for start, end in ranges]
+                result['seconds'] = [future.result() for future in futures]
 
-    # try..except
+            # the copied rows become visible in the target at once
+            with engine.begin() as conn:
+                inserted = conn.execute(
+                    sqlalchemy.text(f'INSERT INTO {target} ({columns}) SELECT {columns} FROM {staging}')
+                )
+                result['rows'] = inserted.rowcount
 
-    leveringen_lijst = leveringen[ODL_LEVERING_FREK].tolist()
-    if len(leveringen_lijst) > 0:
-        show_database(server_config, table_name, logger.debug)
-        logger.debug(f'Deliveries present in the database: {leveringen_lijst}')
+            stage['rows'] = result['rows']
 
-    # if
+        # with
 
-    current_delivery = delivery[ODL_LEVERING_FREK]
-    exists = current_delivery in leveringen_lijst
-    if exists:
-        logger.debug(f'Delivery {current_delivery} already in the database')
+    finally:
+        with engine.begin() as conn:
+            conn.execute(sqlalchemy.text(f'DROP TABLE IF EXISTS {staging}'))
 
-    return exists
+        engine.dispose()
 
-### delivery_exists ###
+    # try..finally
+
+    logger.info(f'{result["rows"]} rows loaded into {target} with {len(ranges)} COPY streams')
+
+    return result
+
+### parallel_copy_load ###
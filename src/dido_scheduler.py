@@ -0,0 +1,615 @@
+"""
+dido_scheduler.py drains the todo directories of all suppliers.
+
+Every supplier has a WORK_DIR/todo/<supplier> directory (see create_workdir in
+odl-creator.py). Delivery yaml files dropped in there are picked up, ordered by
+levering_rapportageperiode and processed by the command configured in the
+SCHEDULER section of config.yaml. After successful processing the delivery
+yaml and its data files are moved to WORK_DIR/done/<supplier>.
+
+Deliveries of one supplier are processed sequentially in order of their
+rapportageperiode, different suppliers are processed concurrently.
+"""
+
+import os
+import sys
+import time
+import shlex
+import logging
+import threading
+import subprocess
+
+from os.path import join, exists, getsize, splitext
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import dido_common as dc
+
+logger = logging.getLogger()
+
+STATS_HEADER = 'sysdatum;supplier;levering_rapportageperiode;delivery;bytes;' \
+               'wait_seconds;process_seconds;status\n'
+
+# suppliers are drained in parallel threads, all appending to one stats file
+stats_lock = threading.Lock()
+
+
+def find_deliveries(work_dir: str, supplier: str) -> list:
+    """ Finds all delivery yaml files in the todo directory of a supplier
+
+    Each delivery file is read with read_delivery_config. The
+    levering_rapportageperiode of each delivery is derived from the
+    delivery_<periode> keys of the supplier in the DELIVERIES section.
+
+    Args:
+        work_dir (str): WORK_DIR of the project
+        supplier (str): name of the supplier
+
+    Returns:
+        list: of dicts describing each delivery, sorted by rapportageperiode
+    """
+    todo_dir = join(work_dir, dc.DIR_TODO, supplier)
+    if not exists(todo_dir):
+        return []
+
+    deliveries = []
+    for filename in os.listdir(todo_dir):
+        _, ext = splitext(filename)
+        if ext.lower() not in ['.yaml', '.yml']:
+            continue
+
+        try:
+            delivery_config = dc.read_delivery_config(
+                project_path = work_dir,
+                delivery_filename = join(supplier, filename),
+                subdir = dc.DIR_TODO,
+            )
+            cargo = dc.get_cargo(delivery_config, supplier)
+
+            # collect the rapportageperiodes and data files of the delivery
+            periodes = []
+            data_files = []
+            for cargo_name in cargo:
+                cargo_dict = dc.enhance_cargo_dict(cargo[cargo_name], cargo_name, supplier)
+                periodes.append(cargo_dict[dc.ODL_LEVERING_FREK])
+
+                data_file = dc.get_par(cargo_dict, 'data_file', '')
+                if len(data_file) > 0 and exists(join(todo_dir, data_file)):
+                    data_files.append(data_file)
+
+                # if
+            # for
+
+        except Exception as e:
+            logger.error(f'*** Delivery file {filename} of {supplier} cannot be read, skipped')
+            logger.debug(e)
+
+            continue
+
+        # try..except
+
+        if len(periodes) == 0:
+            logger.warning(f'!!! Delivery file {filename} contains no deliveries for {supplier}')
+            continue
+
+        periodes.sort(key = dc.period_sort_key)
+        delivery_filename = join(todo_dir, filename)
+        size = getsize(delivery_filename)
+        for data_file in data_files:
+            size += getsize(join(todo_dir, data_file))
+
+        deliveries.append({
+            'supplier': supplier,
+            'filename': filename,
+            'data_files': data_files,
+            'periode': periodes[0],
+            'periodes': periodes,
+            'bytes': size,
+            'found': time.time(),
+        })
+
+    # for
+
+    deliveries.sort(key = lambda d: dc.period_sort_key(d['periode']))
+
+    return deliveries
+
+### find_deliveries ###
+
+
+def move_to_done(work_dir: str, delivery: dict):
+    """ Moves a delivery from todo to done
+
+    The data files are moved first, the delivery yaml last. As long as the
+    yaml file is in todo the delivery is considered not processed. Each move
+    is an os.replace, which is atomic within one file system.
+
+    Args:
+        work_dir (str): WORK_DIR of the project
+        delivery (dict): delivery as returned by find_deliveries
+    """
+    supplier = delivery['supplier']
+    todo_dir = join(work_dir, dc.DIR_TODO, supplier)
+    done_dir = join(work_dir, dc.DIR_DONE, supplier)
+    os.makedirs(done_dir, exist_ok = True)
+
+    for filename in delivery['data_files'] + [delivery['filename']]:
+        os.replace(join(todo_dir, filename), join(done_dir, filename))
+
+    return
+
+### move_to_done ###
+
+
+def get_fingerprint(delivery: dict, directory: str) -> str:
+    """ Returns the fingerprint of the data files of a delivery
+
+    The fingerprint is computed once and kept in delivery['fingerprint'].
+
+    Args:
+        delivery (dict): delivery as returned by find_deliveries
+        directory (str): directory containing the data files
+
+    Returns:
+        str: dc.delivery_fingerprint of the data files
+    """
+    if delivery.get('fingerprint') is None:
+        filenames = [join(directory, data_file) for data_file in delivery['data_files']]
+        delivery['fingerprint'] = dc.delivery_fingerprint(filenames)
+
+    return delivery['fingerprint']
+
+### get_fingerprint ###
+
+
+def find_identical(work_dir: str, delivery: dict, seen: dict, project_name: str, server_config: dict) -> str:
+    """ Checks whether the data files of a delivery have been processed before
+
+    All data files of a delivery are compared at once by their combined
+    fingerprint. Only deliveries of the same periode count, the same data
+    delivered for another periode are processed. Deliveries are first
+    compared by total size, only when an earlier delivery has that size
+    the files are hashed, once. Earlier deliveries are those in the levering
+    table (see dc.find_identical_delivery) and the ones processed in this run.
+
+    Args:
+        work_dir (str): WORK_DIR of the project
+        delivery (dict): delivery as returned by find_deliveries
+        seen (dict): total size -> list of deliveries processed in this run,
+            with their directory in 'directory'
+        project_name (str): name of the project
+        server_config (dict): database containing the levering table, None
+            to only compare with this run
+
+    Returns:
+        str: description of the identical delivery or None
+    """
+    if len(delivery['data_files']) == 0:
+        return None
+
+    todo_dir = join(work_dir, dc.DIR_TODO, delivery['supplier'])
+    size = sum([getsize(join(todo_dir, data_file)) for data_file in delivery['data_files']])
+
+    for earlier in seen.get(size, []):
+        if earlier['periode'] == delivery['periode'] and \
+           get_fingerprint(earlier, earlier['directory']) == get_fingerprint(delivery, todo_dir):
+            return f'{earlier["filename"]} (this run)'
+
+    # for
+
+    if server_config is not None:
+        try:
+            filenames = [join(todo_dir, data_file) for data_file in delivery['data_files']]
+            fingerprint = dc.find_identical_delivery(filenames, delivery['periode'], project_name,
+                                                     delivery['supplier'], server_config,
+                                                     delivery.get('fingerprint'))
+            if fingerprint is not None:
+                delivery['fingerprint'] = fingerprint
+
+                return f'delivery {delivery["periode"]}'
+
+            # if
+
+        except Exception as e:
+            logger.warning(f'!!! Fingerprints of {delivery["supplier"]} cannot be read from the database')
+            logger.debug(e)
+
+        # try..except
+    # if
+
+    return None
+
+### find_identical ###
+
+
+def process_delivery(command: str, project_dir: str, work_dir: str, delivery: dict) -> bool:
+    """ Processes one delivery by running the configured command
+
+    The placeholders {project}, {supplier}, {delivery} and {periode} in the
+    command are replaced by the project directory, the supplier, the path of
+    the delivery yaml file and its (first) levering_rapportageperiode.
+    {fingerprint} is replaced by the combined fingerprint of the data files
+    (see get_fingerprint).
+
+    Args:
+        command (str): command to process the delivery with
+        project_dir (str): project directory
+        work_dir (str): WORK_DIR of the project
+        delivery (dict): delivery as returned by find_deliveries
+
+    Returns:
+        bool: True when the command succeeded, else False
+    """
+    todo_dir = join(work_dir, dc.DIR_TODO, delivery['supplier'])
+    fingerprint = ''
+    if '{fingerprint}' in command and len(delivery['data_files']) > 0:
+        fingerprint = get_fingerprint(delivery, todo_dir)
+
+    # quote the values, paths may contain spaces
+    cmd = command.format(
+        project = shlex.quote(project_dir),
+        supplier = shlex.quote(delivery['supplier']),
+        delivery = shlex.quote(join(todo_dir, delivery['filename'])),
+        periode = shlex.quote(delivery['periode']),
+        fingerprint = shlex.quote(fingerprint),
+    )
+
+    logger.info(f'[{delivery["supplier"]}: processing {delivery["filename"]} ({delivery["periode"]})]')
+    logger.debug(cmd)
+
+    result = subprocess.run(shlex.split(cmd), capture_output = True, text = True)
+    if len(result.stdout) > 0:
+        logger.debug(result.stdout)
+
+    if result.returncode != 0:
+        logger.error(f'*** {delivery["supplier"]}: {delivery["filename"]} failed '
+                     f'with return code {result.returncode}')
+        logger.error(result.stderr)
+
+        return False
+
+    # if
+
+    return True
+
+### process_delivery ###
+
+
+def drain_supplier(command: str,
+                   project_dir: str,
+                   work_dir: str,
+                   deliveries: list,
+                   stats_name: str,
+                   skip_identical: bool = False,
+                   project_name: str = None,
+                   server_config: dict = None,
+                   snapshots: bool = False,
+                  ) -> list:
+    """ Processes all deliveries of one supplier in order of rapportageperiode
+
+    Processing stops at the first failing delivery: later periodes may not
+    be loaded before an earlier one. The failed delivery stays in todo.
+    With skip_identical and a server_config the fingerprint of each
+    processed delivery is stored in the levering table, so identical
+    deliveries are also recognized in later runs. With snapshots the report
+    period snapshots of the supplier are refreshed after each processed
+    delivery (see dc.refresh_snapshots).
+
+    Args:
+        command (str): command to process each delivery with
+        project_dir (str): project directory
+        work_dir (str): WORK_DIR of the project
+        deliveries (list): deliveries of one supplier, sorted by periode
+        stats_name (str): name of the file to append statistics to
+        skip_identical (bool, optional): deliveries with data files identical
+            to earlier ones are moved to done without processing. Defaults to False.
+        project_name (str, optional): name of the project. Defaults to None.
+        server_config (dict, optional): database with the levering table
+            to compare with. Defaults to None.
+        snapshots (bool, optional): refresh the snapshots, see
+            SNAPSHOT_PERIODS in config.yaml. Defaults to False.
+
+    Returns:
+        list: statistics of each processed delivery
+    """
+    stats = []
+    seen = {}
+    for delivery in deliveries:
+        start = time.time()
+        identical = None
+        if skip_identical:
+            identical = find_identical(work_dir, delivery, seen, project_name, server_config)
+
+        if identical is not None:
+            logger.warning(f'!!! {delivery["supplier"]}: {delivery["filename"]} is identical to '
+                           f'{identical}, skipped')
+            ok = True
+        else:
+            ok = process_delivery(command, project_dir, work_dir, delivery)
+
+            # the delivery is loaded, a failing refresh can be repeated later
+            if ok and skip_identical and server_config is not None and len(delivery['data_files']) > 0:
+                try:
+                    todo_dir = join(work_dir, dc.DIR_TODO, delivery['supplier'])
+                    dc.store_delivery_fingerprint(project_name, delivery['supplier'], delivery['periodes'],
+                                                  get_fingerprint(delivery, todo_dir), server_config)
+
+                except Exception as e:
+                    logger.warning(f'!!! {delivery["supplier"]}: fingerprint of {delivery["filename"]} not stored')
+                    logger.debug(e)
+
+                # try..except
+            # if
+
+            if ok and snapshots:
+                try:
+                    dc.refresh_snapshots(project_name, delivery['supplier'], delivery['periode'], server_config)
+
+                except Exception as e:
+                    logger.warning(f'!!! {delivery["supplier"]}: snapshots not refreshed for {delivery["periode"]}')
+                    logger.debug(e)
+
+                # try..except
+            # if
+        # if
+
+        ready = time.time()
+
+        if ok:
+            move_to_done(work_dir, delivery)
+
+            # remember the deliveries of this run, their files are in done now
+            if len(delivery['data_files']) > 0:
+                delivery['directory'] = join(work_dir, dc.DIR_DONE, delivery['supplier'])
+                size = sum([getsize(join(delivery['directory'], data_file))
+                            for data_file in delivery['data_files']])
+                seen.setdefault(size, []).append(delivery)
+
+            # if
+
+        # if
+
+        stat = {
+            'sysdatum': datetime.now().strftime(dc.DATETIME_FORMAT),
+            'supplier': delivery['supplier'],
+            'periode': delivery['periode'],
+            'delivery': delivery['filename'],
+            'bytes': delivery['bytes'],
+            'wait': start - delivery['found'],
+            'process': ready - start,
+            'status': 'failed' if not ok else 'identical' if identical is not None else 'done',
+        }
+        stats.append(stat)
+        write_stats(stats_name, stat)
+
+        if not ok:
+            logger.error(f'*** Remaining deliveries of {delivery["supplier"]} are postponed')
+            break
+
+        # if
+    # for
+
+    return stats
+
+### drain_supplier ###
+
+
+def write_stats(filename: str, stat: dict):
+    """ Appends the statistics of one delivery to the statistics file
+
+    Args:
+        filename (str): name of the statistics file
+        stat (dict): statistics of one delivery
+    """
+    with stats_lock:
+        new_file = not exists(filename)
+        with open(filename, 'a', encoding = 'utf8') as outfile:
+            if new_file:
+                outfile.write(STATS_HEADER)
+
+            outfile.write(f"{stat['sysdatum']};{stat['supplier']};{stat['periode']};"
+                          f"{stat['delivery']};{stat['bytes']};{stat['wait']:.3f};"
+                          f"{stat['process']:.3f};{stat['status']}\n")
+
+        # with
+    # with
+
+    return
+
+### write_stats ###
+
+
+def report_stats(stats: list, seconds: float):
+    """ Logs throughput and latency of a scheduler run
+
+    Args:
+        stats (list): statistics of all processed deliveries
+        seconds (float): duration of the run
+    """
+    done = [stat for stat in stats if stat['status'] == 'done']
+    failed = len([stat for stat in stats if stat['status'] == 'failed'])
+    identical = len([stat for stat in stats if stat['status'] == 'identical'])
+
+    logger.info('')
+    logger.info(f'Deliveries processed: {len(done)}, failed: {failed}, identical skipped: {identical}, '
+                f'in {seconds:.1f} seconds')
+
+    if len(done) > 0 and seconds > 0:
+        n_bytes = sum([stat['bytes'] for stat in done])
+        latencies = sorted([stat['wait'] + stat['process'] for stat in done])
+
+        logger.info(f'Throughput: {len(done) / seconds * 60:.2f} deliveries/minute, '
+                    f'{n_bytes / seconds / 1e6:.2f} MB/s')
+        logger.info(f'Latency:    mean {sum(latencies) / len(latencies):.1f} s, '
+                    f'median {latencies[len(latencies) // 2]:.1f} s, '
+                    f'max {latencies[-1]:.1f} s')
+
+    # if
+
+    return
+
+### report_stats ###
+
+
+def estimate_deliveries(config: dict, queues: dict):
+    """ Logs the estimated cost of loading the deliveries without loading them
+
+    For each data file the row count, bytes per row, error rate, load time
+    and disk growth are estimated by dc.estimate_delivery_load. The schema
+    and the current sizes of the data table and its indexes are read from
+    the data server; when they are not available the estimate is based on
+    the file alone. The deliveries of a supplier are estimated in order,
+    each on the table as the previous one leaves it.
+
+    Args:
+        config (dict): project configuration
+        queues (dict): deliveries per supplier as returned by find_deliveries
+    """
+    work_dir = config['WORK_DIR']
+    project_name = config['PROJECT_NAME']
+    server_config = config['SERVER_CONFIGS']['DATA_SERVER_CONFIG']
+    scheduler = dc.get_par(config, 'SCHEDULER', {})
+    sample_rows = int(dc.get_par(scheduler, 'sample_rows', 10000))
+    rows_per_second = float(dc.get_par(scheduler, 'rows_per_second', 50000))
+
+    governor = dc.get_memory_governor()
+    total_seconds = 0
+    total_growth = 0
+    for supplier in queues:
+        schema_table = dc.get_table_name(project_name, supplier, dc.TAG_TABLE_SCHEMA, 'description')
+        data_table = dc.get_table_name(project_name, supplier, dc.TAG_TABLE_SCHEMA, 'data')
+        try:
+            schema = dc.load_schema(schema_table, server_config).to_dict('records')
+            table_sizes = dc.get_table_sizes(data_table, server_config)
+
+        except Exception as e:
+            logger.warning(f'!!! No schema for {supplier} in the database, estimating without validation')
+            logger.debug(e)
+            schema = []
+            table_sizes = None
+
+        # try..except
+
+        for delivery in queues[supplier]:
+            for data_file in delivery['data_files']:
+                estimate = dc.estimate_delivery_load(
+                    data_file = join(work_dir, dc.DIR_TODO, supplier, data_file),
+                    schema = schema,
+                    sample_rows = sample_rows,
+                    rows_per_second = rows_per_second,
+                    table_sizes = table_sizes,
+                )
+                table_sizes = estimate['table_sizes']
+                total_seconds += estimate['load_seconds']
+                total_growth += estimate['growth_bytes']
+
+                prefix = '' if estimate['exact'] else '~'
+                logger.info(f'[{supplier}: {data_file} ({delivery["periode"]})]')
+                logger.info(f'   rows: {prefix}{estimate["rows"]}, columns: {estimate["columns"]}, '
+                            f'sampled: {estimate["sampled"]}')
+                logger.info(f'   bytes per row: {estimate["file_row_bytes"]:.0f} in file, '
+                            f'{estimate["row_bytes"]:.0f} in database')
+                logger.info(f'   invalid values: {estimate["error_rate"]:.2%}, '
+                            f'rows with errors: {estimate["error_row_rate"]:.2%} {estimate["errors"]}')
+                logger.info(f'   chunk size: {governor.chunk_rows(estimate["row_bytes"])} rows')
+                logger.info(f'   load time: {estimate["load_seconds"]:.1f} s, '
+                            f'growth: {estimate["growth_bytes"] / 1e6:.1f} MB '
+                            f'(indexes {estimate["index_growth_bytes"] / 1e6:.1f} MB), '
+                            f'table after load: {estimate["table_bytes"] / 1e6:.1f} MB')
+
+            # for
+        # for
+    # for
+
+    logger.info('')
+    logger.info(f'Estimated load time: {total_seconds:.1f} s, disk growth: {total_growth / 1e6:.1f} MB')
+
+    return
+
+### estimate_deliveries ###
+
+
+def run_scheduler(config: dict, project_dir: str, dry_run: bool = False):
+    """ Drains the todo directories of all suppliers
+
+    Args:
+        config (dict): project configuration
+        project_dir (str): project directory
+        dry_run (bool, optional): only estimate the cost of loading the
+            deliveries, nothing is processed or moved. Defaults to False.
+    """
+    work_dir = config['WORK_DIR']
+    scheduler = dc.get_par(config, 'SCHEDULER', {})
+    command = dc.get_par(scheduler, 'command', '')
+    workers = dc.get_par(scheduler, 'workers', 'auto')
+    stats_name = join(work_dir, 'logs', 'scheduler.csv')
+
+    if len(command) == 0 and not dry_run:
+        raise dc.DiDoError('No SCHEDULER: command specified in config.yaml')
+
+    # SUPPLIERS can be a list or a dictionary
+    suppliers = list(config['SUPPLIERS'])
+    queues = {}
+    for supplier in suppliers:
+        deliveries = find_deliveries(work_dir, supplier)
+        if len(deliveries) > 0:
+            queues[supplier] = deliveries
+            logger.info(f'{supplier}: {len(deliveries)} deliveries in todo')
+
+        # if
+    # for
+
+    if len(queues) == 0:
+        logger.info('Nothing to do')
+
+        return
+
+    if dry_run:
+        estimate_deliveries(config, queues)
+
+        return
+
+    # if
+
+    # never more suppliers at once than fit in memory
+    governor = dc.get_memory_governor()
+    wanted = len(queues) if workers == 'auto' else min(int(workers), len(queues))
+    workers = governor.workers(wanted)
+    governor.report()
+
+    start = time.time()
+    stats = []
+    skip_identical = dc.get_par(scheduler, 'skip_identical', True)
+    snapshots = len(dc.get_par(config, 'SNAPSHOT_PERIODS', []) or []) > 0
+    server_config = config['SERVER_CONFIGS']['DATA_SERVER_CONFIG']
+    with ThreadPoolExecutor(max_workers = workers) as executor:
+        futures = [executor.submit(drain_supplier, command, project_dir, work_dir,
+                                   queues[supplier], stats_name, skip_identical,
+                                   config['PROJECT_NAME'], server_config, snapshots)
+                   for supplier in queues]
+
+        for future in as_completed(futures):
+            stats += future.result()
+
+    # with
+
+    report_stats(stats, time.time() - start)
+
+    return
+
+### run_scheduler ###
+
+
+if __name__ == '__main__':
+    _, args = dc.read_cli()
+    cwd = os.getcwd() if args.project is None else args.project
+    config = dc.read_config(cwd)
+
+    log_file: str = join(config['WORK_DIR'], 'logs', 'dido_scheduler.log')
+    logger = dc.create_log_from_config(config, log_file, level = 'DEBUG')
+    dc.display_dido_header('Delivery scheduler')
+    dc.init_memory_governor(config)
+
+    run_scheduler(config, cwd, args.dry_run)
+
+    logger.info('[Ready]')
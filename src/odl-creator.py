@@ -1,16 +1,26 @@
+from __future__ import annotations
+
+import io
 import os
+import re
 import sys
+import html
+import json
+import time
+import hashlib
+import threading
+import subprocess
 
 from os.path import join, splitext, dirname, exists
 from datetime import datetime
-from random import randint
-import pandas as pd
+from typing import TYPE_CHECKING
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import dido_common as dc
 
-# print all columns of dataframe
-pd.set_option('display.max_columns', 1000)
-pd.set_option('display.width', 1000)
+# pandas is imported where it is used, see dido_common
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 def write_documentation(filename: str, tables: list, root_dir: str, columns_to_write: list):
@@ -54,6 +64,346 @@ def write_documentation(filename: str, tables: list, root_dir: str, columns_to_w
 ### write_documentation ###
 
 
+def doc_fingerprint(tables: dict, table_name: str, columns_to_write: list) -> str:
+    """ Returns a hash of everything the documentation of a table is made of
+
+    Timestamps that are filled in at each run (the Sysdatum meta row and
+    sysdatum columns of data) are left out, so the fingerprint only changes
+    when the inputs of the documentation change.
+
+    Args:
+        tables (dict): dictionary with all tables
+        table_name (str): table to compute the fingerprint of
+        columns_to_write (list): columns to write into the documentation
+
+    Returns:
+        str: sha256 hex digest
+    """
+    table = tables[table_name]
+    meta = table['meta'].drop(index = 'Sysdatum', errors = 'ignore')
+
+    fingerprint = hashlib.sha256()
+    fingerprint.update(table['schema'].to_csv(sep = ';').encode('utf8'))
+    fingerprint.update(meta.to_csv(sep = ';').encode('utf8'))
+    fingerprint.update(';'.join(columns_to_write).encode('utf8'))
+
+    if 'data' in table:
+        data = table['data']
+        data = data[[col for col in data.columns if col.lower() != dc.ODL_SYSDATUM]]
+        fingerprint.update(data.to_csv(sep = ';').encode('utf8'))
+
+    for tag in [dc.TAG_PREFIX, dc.TAG_SUFFIX]:
+        fingerprint.update(f'<{tag}>{table.get(tag, "")}'.encode('utf8'))
+
+    return fingerprint.hexdigest()
+
+### doc_fingerprint ###
+
+
+def write_if_changed(filename: str, content: str) -> bool:
+    """ Writes content to filename unless the file already has that content
+
+    Args:
+        filename (str): name of the file to write
+        content (str): content to write
+
+    Returns:
+        bool: True when the file was written
+    """
+    if exists(filename):
+        with open(filename, 'r') as infile:
+            if infile.read() == content:
+                return False
+
+        # with
+    # if
+
+    with open(filename, 'w') as outfile:
+        outfile.write(content)
+
+    return True
+
+### write_if_changed ###
+
+
+def write_documentation_per_table(doc_dir: str, tables: dict, columns_to_write: list):
+    """ Generates one markdown file per table and an index page
+
+    Each file starts with a fingerprint of its inputs (see doc_fingerprint).
+    A table is only documented again when its fingerprint changed, so
+    unchanged tables keep their file, including the Sysdatum, byte for byte.
+
+    Args:
+        doc_dir (str): directory to write the documentation to
+        tables (dict): dictionary with all tables
+        columns_to_write (list): columns to write into the documentation
+    """
+    os.makedirs(doc_dir, exist_ok = True)
+    written = 0
+
+    for table in tables:
+        filename = join(doc_dir, table + '.md')
+        header = f'<!-- odl-doc {doc_fingerprint(tables, table, columns_to_write)} -->\n'
+
+        # the fingerprint in the first line tells whether the inputs changed
+        if exists(filename):
+            with open(filename, 'r') as infile:
+                if infile.readline() == header:
+                    logger.debug('Documentation of %s unchanged', table)
+                    continue
+
+            # with
+        # if
+
+        logger.info(f'[Documenting {table}]')
+        outfile = io.StringIO()
+        outfile.write(header)
+        write_markup_doc(outfile, tables, table, columns_to_write)
+
+        with open(filename, 'w') as docfile:
+            docfile.write(outfile.getvalue())
+
+        written += 1
+
+    # for
+
+    # create an index page with a link to each table
+    index = '# Logisch datamodel\n\n'
+    index += '| Tabel | Beschrijving |\n'
+    index += '| ----- | ------------ |\n'
+    for table in tables:
+        description = tables[table]['meta'].loc['Bronbestand beschrijving', 'Waarde'].strip()
+        index += f'| [{table}]({table}.md) | {description} |\n'
+
+    index += '\n'
+
+    if write_if_changed(join(doc_dir, 'index.md'), index):
+        written += 1
+
+    # remove the documentation of tables that are no longer in the model
+    removed = 0
+    for filename in sorted(os.listdir(doc_dir)):
+        table, ext = splitext(filename)
+        if ext != '.md' or table == 'index' or table in tables:
+            continue
+
+        with open(join(doc_dir, filename), 'r') as infile:
+            generated = infile.readline().startswith('<!-- odl-doc ')
+
+        if generated:
+            logger.info(f'[Removing documentation of {table}]')
+            os.remove(join(doc_dir, filename))
+            removed += 1
+
+        # if
+    # for
+
+    logger.info('')
+    logger.info(f'=== Documentation written to {doc_dir}: '
+                f'{written} files written, {len(tables) + 1 - written} unchanged, {removed} removed')
+
+    return
+
+### write_documentation_per_table ###
+
+
+# columns of the schema that are indexed for searching the catalogue
+SEARCH_COLUMNS = ['kolomnaam', 'beschrijving', 'domein', 'code_attribuut_sleutel']
+
+CATALOGUE_SCRIPT = """
+const index = JSON.parse(document.getElementById('search-index').textContent);
+const tokens = Object.keys(index.t).sort();
+
+// returns all attribute ids of tokens starting with prefix (binary search)
+function lookup(prefix) {
+    let lo = 0, hi = tokens.length;
+    while (lo < hi) {
+        const mid = (lo + hi) >> 1;
+        if (tokens[mid] < prefix) lo = mid + 1; else hi = mid;
+    }
+    const ids = new Set();
+    for (let i = lo; i < tokens.length && tokens[i].startsWith(prefix); i++) {
+        for (const id of index.t[tokens[i]]) ids.add(id);
+    }
+    return ids;
+}
+
+function search(query) {
+    const terms = query.toLowerCase().match(/[\\p{L}\\p{N}]+/gu) || [];
+    let result = null;
+    for (const term of terms) {
+        const ids = lookup(term);
+        result = result === null ? ids : new Set([...result].filter(id => ids.has(id)));
+    }
+    const list = document.getElementById('results');
+    list.innerHTML = '';
+    if (result === null) return;
+    for (const id of [...result].slice(0, 100)) {
+        const [table, kolom, sleutel, beschrijving] = index.d[id];
+        const item = document.createElement('li');
+        const link = document.createElement('a');
+        link.href = '#' + table + '--' + kolom;
+        link.textContent = table + '.' + kolom + (sleutel ? ' (' + sleutel + ')' : '');
+        item.appendChild(link);
+        item.appendChild(document.createTextNode(' ' + beschrijving));
+        list.appendChild(item);
+    }
+}
+
+document.getElementById('search').addEventListener('input', e => search(e.target.value));
+"""
+
+
+def create_search_index(catalogue: dc.AttributeCatalogue) -> dict:
+    """ Creates an inverted index over the attributes of all tables
+
+    Each attribute gets the id it has in the catalogue. The index maps every
+    token in SEARCH_COLUMNS to the ids of the attributes it occurs in.
+
+    Args:
+        catalogue (dc.AttributeCatalogue): attributes of all tables
+
+    Returns:
+        dict: {'d': [[table, kolomnaam, code_attribuut_sleutel, beschrijving]],
+               't': {token: [ids]}}
+    """
+    docs = []
+    tokens = {}
+
+    for doc_id, row in enumerate(catalogue.records):
+        beschrijving = str(row.get('beschrijving', '')).strip()
+        docs.append([
+            row['table'],
+            str(row.get('kolomnaam', '')),
+            str(row.get('code_attribuut_sleutel', '')),
+            beschrijving.split('\n')[0][:120],
+        ])
+
+        words = set()
+        for col in SEARCH_COLUMNS:
+            words.update(re.findall(r'[^\W_]+', str(row.get(col, '')).lower()))
+
+        for word in words:
+            tokens.setdefault(word, []).append(doc_id)
+
+    # for
+
+    return {'d': docs, 't': tokens}
+
+### create_search_index ###
+
+
+def html_table(header: list, rows: list, row_ids: list = None) -> str:
+    """ Returns a html table, all cells are escaped
+
+    Args:
+        header (list): column headers
+        rows (list): list of rows, each a list of cells
+        row_ids (list, optional): id attribute for each row
+
+    Returns:
+        str: html table
+    """
+    lines = ['<table>', '<tr>' + ''.join([f'<th>{html.escape(str(h))}</th>' for h in header]) + '</tr>']
+    for i, row in enumerate(rows):
+        row_id = '' if row_ids is None else f' id="{html.escape(row_ids[i])}"'
+        cells = ''.join([f'<td>{html.escape(str(cell)).replace(chr(10), "<br>")}</td>' for cell in row])
+        lines.append(f'<tr{row_id}>{cells}</tr>')
+
+    lines.append('</table>')
+
+    return '\n'.join(lines) + '\n'
+
+### html_table ###
+
+
+def write_html_catalogue(filename: str,
+                         tables: dict,
+                         catalogue: dc.AttributeCatalogue,
+                         columns_to_write: list,
+                        ):
+    """ Generates a static html data catalogue with a prebuilt search index
+
+    The catalogue contains the same information as write_documentation.
+    The inverted index of create_search_index is stored as compact JSON
+    next to the html file and embedded in it, so that searching works in
+    the browser without a server.
+
+    Args:
+        filename (str): name of the html file
+        tables (dict): dictionary with all tables
+        catalogue (dc.AttributeCatalogue): attributes of all tables
+        columns_to_write (list): columns to write, empty list means all columns
+    """
+    index = create_search_index(catalogue)
+    index_json = json.dumps(index, separators = (',', ':'), ensure_ascii = False)
+
+    with open(splitext(filename)[0] + '.index.json', 'w', encoding = 'utf8') as outfile:
+        outfile.write(index_json)
+
+    body = ''
+    toc = ''
+    for table in tables:
+        schema = tables[table]['schema']
+        meta = tables[table]['meta']
+        data = tables[table]['data'] if 'data' in tables[table] else None
+        columns = schema.columns.tolist() if len(columns_to_write) == 0 else columns_to_write
+
+        toc += f'<li><a href="#{html.escape(table)}">{html.escape(table)}</a></li>\n'
+        body += f'<h2 id="{html.escape(table)}">Tabel: {html.escape(table)}</h2>\n'
+
+        if dc.TAG_PREFIX in tables[table]:
+            body += f'<pre>{html.escape(tables[table][dc.TAG_PREFIX])}</pre>\n'
+
+        body += '<h3>Meta-informatie</h3>\n'
+        body += html_table(['Meta attribuut', 'Waarde'],
+                           [[idx, meta.loc[idx, 'Waarde']] for idx in meta.index])
+
+        description = meta.loc['Bronbestand beschrijving', 'Waarde'].strip()
+        body += '<h3>Databeschrijving</h3>\n'
+        body += f'<p>{html.escape(description if len(description) > 0 else "DOKUMENTATIE ONTBREEKT!")}</p>\n'
+        body += html_table([col.replace('_', ' ').capitalize() for col in columns],
+                           schema[columns].values.tolist(),
+                           [f'{table}--{kolom}' for kolom in schema['kolomnaam']])
+
+        if data is not None:
+            body += '<h3>Data</h3>\n'
+            body += html_table(data.columns.tolist(), data.values.tolist())
+
+        if dc.TAG_SUFFIX in tables[table]:
+            body += f'<pre>{html.escape(tables[table][dc.TAG_SUFFIX])}</pre>\n'
+
+    # for
+
+    with open(filename, 'w', encoding = 'utf8') as outfile:
+        outfile.write('<!DOCTYPE html>\n<html lang="nl">\n<head>\n<meta charset="utf-8">\n')
+        outfile.write('<title>Logisch datamodel</title>\n')
+        outfile.write('<style>body{font-family:sans-serif;margin:2em}table{border-collapse:collapse;'
+                      'margin-bottom:1em}td,th{border:1px solid #ccc;padding:2px 6px;'
+                      'vertical-align:top;text-align:left}tr:target{background:#ffd}</style>\n')
+        outfile.write('</head>\n<body>\n<h1>Logisch datamodel</h1>\n')
+        outfile.write('<input id="search" type="search" size="60" placeholder="Zoek attributen">\n')
+        outfile.write('<ul id="results"></ul>\n')
+        outfile.write(f'<ul>\n{toc}</ul>\n')
+        outfile.write(body)
+
+        # '</' would end the script element prematurely
+        outfile.write('<script id="search-index" type="application/json">')
+        outfile.write(index_json.replace('</', '<\\/'))
+        outfile.write('</script>\n')
+        outfile.write(f'<script>{CATALOGUE_SCRIPT}</script>\n</body>\n</html>\n')
+
+    # with
+
+    logger.info('')
+    logger.info(f'=== Html catalogue written to {filename}: '
+                f'{len(index["d"])} attributes, {len(index["t"])} search terms')
+
+    return
+
+### write_html_catalogue ###
+
+
 def write_markup_doc(outfile: object,
                      tables: dict,
                      table_name: str,
@@ -180,8 +530,11 @@ def write_markup_doc(outfile: object,
 
 def write_sql(sql_filename: str,
               tables: dict,
-              template: pd.DataFrame,
+              catalogue: dc.AttributeCatalogue,
               postgres_schema: str,
+              server_config: dict = None,
+              bulk: bool = False,
+              version_sql: str = '',
              ) -> None:
 
     """ iterate over all elements in table and creates a data description
@@ -189,13 +542,30 @@ def write_sql(sql_filename: str,
     When a data DataFrame is passed the table itself will be created and the
     data will be stored into the table.
 
+    When server_config is passed, tables that already exist in that database
+    are migrated with ALTER TABLE statements instead of being dropped and
+    recreated (see create_table_migration). The schema of each table is
+    taken from its description table in the database; only tables that do
+    not exist are created, when the database cannot be read a DiDoError is
+    raised. Tables with reference data (a .data.csv file, e.g. the quality
+    codes) are truncated and loaded again after the migration.
+
     Args:
         sql_filename (str): Name of the file to write DDL onto
         tables (dict): dictionary with table names as key and per table name
             points to additional information
-        template (pd.DataFrame): DataFrame of bronbestand_attribuut_meta.csv
-            containing column information needed for create_table_description
+        catalogue (dc.AttributeCatalogue): attributes of all tables, including
+            the template bronbestand_attribuutmeta needed for create_table_description
         postgres_schema (str): Schema name of the table
+        server_config (dict, optional): database to migrate. Defaults to None,
+            meaning all tables are recreated.
+        bulk (bool, optional): create tables with data without constraints
+            and add them after the copy. Defaults to False.
+        version_sql (str, optional): SQL recording the new ODL version,
+            written at the end of the transaction. Defaults to ''.
+
+    Raises:
+        dc.DiDoError: when the database of server_config cannot be read
     """
 
     with open(sql_filename, 'w') as outfile:
@@ -210,11 +580,61 @@ def write_sql(sql_filename: str,
             meta = tables[table]['meta']
             data = tables[table]['data'] if 'data' in tables[table] else None
 
+            # fetch the schema currently in the database when migrating; only
+            # a table that is certainly missing is created, any other failure
+            # stops, as creating drops the existing tables
+            current = None
+            if server_config is not None:
+                try:
+                    if dc.table_exists(table + '_description', server_config):
+                        current = dc.load_schema(table + '_description', server_config)
+                        logger.info(f'=== Migrating {table} ===')
+                    else:
+                        logger.info(f'=== {table} not found in the database, will be created ===')
+
+                except Exception as e:
+                    raise dc.DiDoError(f'*** Cannot read the schema of {table} from the database, '
+                                       f'no migration generated: {e}') from e
+
+                # try..except
+            # if
+
+            if current is not None:
+                sql_code += create_description_migration(
+                    schema = schema,
+                    current = current,
+                    meta = meta,
+                    catalogue = catalogue,
+                    filename = tables[table]['schema_name'],
+                    schema_name = postgres_schema,
+                    table = table,
+                )
+
+                # the reference data are replaced, like those of the description
+                # table; truncate first so new NOT NULL columns can be added
+                if data is not None:
+                    data_table = f'{postgres_schema}.{table}_data'
+                    sql_code += f'TRUNCATE {data_table};\n\n'
+                    sql_code += create_table_migration(
+                        catalogue = catalogue,
+                        current = current,
+                        schema_name = postgres_schema,
+                        table = table,
+                    )
+                    sql_code += f"\\COPY {data_table} FROM {tables[table]['data_name']} " \
+                                f"DELIMITER ';' CSV HEADER\n\n"
+
+                # if
+
+                continue
+
+            # if
+
             # create SQL for the table description
             sql_code += create_table_description(
                 schema = schema,
                 meta = meta,
-                template = template,
+                catalogue = catalogue,
                 filename = tables[table]['schema_name'],
                 schema_name = postgres_schema,
                 table = table,
@@ -225,12 +645,13 @@ def write_sql(sql_filename: str,
             if data is not None:
                 logger.info(f'=== Creating data for {table} ===')
                 sql_code += create_table(
-                    schema = schema,
+                    catalogue = catalogue,
                     meta = meta,
                     data = data,
                     data_name = tables[table]['data_name'],
                     schema_name = postgres_schema,
                     table = table,
+                    bulk = bulk,
                 )
 
             # if
@@ -238,6 +659,7 @@ def write_sql(sql_filename: str,
         # for
 
         outfile.write(sql_code)
+        outfile.write(version_sql)
         outfile.write('\nCOMMIT;\n')
 
     # with
@@ -250,9 +672,119 @@ def write_sql(sql_filename: str,
 ### write_sql ###
 
 
+def apply_sql(sql_filename: str, name: str, server_config: dict, stop: threading.Event) -> dict:
+    """ Applies an SQL file to one server with psql
+
+    The SQL written by write_sql is one transaction, so when psql is
+    terminated because stop is set, nothing is changed on the server.
+
+    Args:
+        sql_filename (str): SQL file to apply
+        name (str): name of the server, used in the report
+        server_config (dict): server to apply the SQL to
+        stop (threading.Event): when set, psql is terminated
+
+    Returns:
+        dict: server, host, status (ok, failed, stopped), seconds and message
+    """
+    env = os.environ.copy()
+    env['PGPASSWORD'] = str(server_config['POSTGRES_PW'])
+    cmd = ['psql', '-X', '-q', '-v', 'ON_ERROR_STOP=1',
+           '-h', str(server_config['POSTGRES_HOST']),
+           '-p', str(server_config['POSTGRES_PORT']),
+           '-U', str(server_config['POSTGRES_USER']),
+           '-d', str(server_config['POSTGRES_DB']),
+           '-f', sql_filename]
+
+    result = {'server': name, 'host': f"{server_config['POSTGRES_HOST']}:{server_config['POSTGRES_PORT']}",
+              'status': 'stopped', 'seconds': 0.0, 'message': ''}
+    if stop.is_set():
+        return result
+
+    logger.info(f'[{name}: applying {sql_filename}]')
+    start = time.time()
+    try:
+        process = subprocess.Popen(cmd, env = env, stdout = subprocess.PIPE,
+                                   stderr = subprocess.PIPE, text = True)
+    except OSError as e:
+        result['status'] = 'failed'
+        result['message'] = str(e)
+
+        return result
+
+    # try..except
+
+    while True:
+        try:
+            _, stderr = process.communicate(timeout = 0.5)
+            break
+
+        except subprocess.TimeoutExpired:
+            if stop.is_set():
+                process.terminate()
+                process.communicate()
+                result['seconds'] = time.time() - start
+
+                return result
+
+            # if
+        # try..except
+    # while
+
+    result['seconds'] = time.time() - start
+    result['status'] = 'ok' if process.returncode == 0 else 'failed'
+    result['message'] = stderr.strip()
+
+    return result
+
+### apply_sql ###
+
+
+def fan_out_sql(sql_filename: str, server_configs: dict, stop_on_failure: bool) -> list:
+    """ Applies an SQL file to several servers concurrently
+
+    Args:
+        sql_filename (str): SQL file written by write_sql
+        server_configs (dict): server name -> server config, see dc.get_fanout_configs
+        stop_on_failure (bool): terminate the other servers when one fails
+
+    Returns:
+        list: result of each server as returned by apply_sql
+    """
+    stop = threading.Event()
+    results = []
+    with ThreadPoolExecutor(max_workers = len(server_configs)) as executor:
+        futures = [executor.submit(apply_sql, sql_filename, name, server_configs[name], stop)
+                   for name in server_configs]
+
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if result['status'] == 'failed':
+                logger.error(f'*** {result["server"]} failed: {result["message"]}')
+                if stop_on_failure:
+                    stop.set()
+
+            # if
+        # for
+    # with
+
+    logger.info('')
+    logger.info(f'{"Server":24s} {"Host":24s} {"Status":8s} {"Seconds":>8s}')
+    for result in sorted(results, key = lambda r: r['server']):
+        logger.info(f'{result["server"]:24s} {result["host"]:24s} {result["status"]:8s} '
+                    f'{result["seconds"]:8.1f}')
+
+    logger.info('')
+
+    return results
+
+### fan_out_sql ###
+
+
 def create_table_description(schema: pd.DataFrame,
                              meta: pd.DataFrame,
-                             template: pd.DataFrame,
+                             catalogue: dc.AttributeCatalogue,
                              filename: str,
                              schema_name: str,
                              table: str,
@@ -263,10 +795,15 @@ def create_table_description(schema: pd.DataFrame,
     Args:
         schema (pd.DataFrame): DataFrame to create description from
         meta (pd.DataFrame): meta data of the schema
+        catalogue (dc.AttributeCatalogue): catalogue containing the template,
+            whose attributes describe the columns of schema
         filename (str): filename to read the data from
         schema_name (str): postgres schema name
         table_(str): Postgres table name
 
+    Raises:
+        dc.DiDoError: when a column of schema is not in the template
+
     Returns:
         str: SQL string with DDL
     """
@@ -283,22 +820,24 @@ def create_table_description(schema: pd.DataFrame,
         desc = meta.loc['Bronbestand beschrijving', 'Waarde']
     table_comment = f"COMMENT ON TABLE {schema_name}.{table_name} IS $${desc}$$;\n\n"
 
-    template = template.set_index('kolomnaam')
-
     # create columns
     for col in schema.columns:
         line = f'   {col} text'
 
         data_types += line + ',\n'
 
-        beschrijving: str = template.loc[col, 'beschrijving']
+        template = catalogue.get(catalogue.template_table, col)
+        if template is None:
+            raise dc.DiDoError(f'*** Column {col} of {table} is not described in '
+                               f'{catalogue.template_table}')
+
+        beschrijving: str = template.get('beschrijving', '')
         comment: str = f"COMMENT ON COLUMN {schema_name}.{table_name}.{col} " \
                        f"IS $${beschrijving}$$;\n"
 
         comments += comment
 
     # for
-    template = template.reset_index()
 
     # remove last comma and newline
     data_types = data_types[:-2]
@@ -310,37 +849,70 @@ def create_table_description(schema: pd.DataFrame,
     tbd += table_comment + comments + '\n\n'
     tbd += f"\\COPY {schema_name}.{table_name} FROM {filename} DELIMITER ';' CSV HEADER\n\n"
 
-    logger.debug(tbd)
+    logger.debug('%s', tbd)
 
     return tbd
 
 ### create_table_description ###
 
 
-def create_table(schema: pd.DataFrame,
+def create_table(catalogue: dc.AttributeCatalogue,
                  meta: pd.DataFrame,
                  data: pd.DataFrame,
                  data_name: str,
                  schema_name: str,
                  table: str,
+                 bulk: bool = False,
                 ) -> str:
+    """ Creates a data table with the attributes of table as columns
 
+    The primary key and indexes follow from keytype, see key_columns. With
+    bulk the table is created with defaults only and the constraints, keys
+    and indexes are added after the data are copied, see
+    create_bulk_constraints. Both give the same table.
+
+    Args:
+        catalogue (dc.AttributeCatalogue): catalogue containing the attributes of table
+        meta (pd.DataFrame): meta data of the schema
+        data (pd.DataFrame): data to load into the table, None = no data
+        data_name (str): name of the csv file containing the data
+        schema_name (str): postgres schema name
+        table (str): Postgres table name
+        bulk (bool, optional): defer constraints until after the data are
+            copied. Defaults to False.
+
+    Returns:
+        str: SQL string with DDL
+    """
     # create data type for each column
     data_types: str = ''
-    line: str = ''
     table_comment: str = ''
     comments: str = ''
     table_name = table + '_data'
 
-    for idx, row in schema.iterrows():
-        line = f'   {row["kolomnaam"]} {row["datatype"]}'
-        if len(row['constraints']) > 0:
-            line += ' ' + row['constraints']
+    attributes = catalogue.table_attributes(table)
+    bulk = bulk and data is not None
+    if bulk:
+        # a bare table still fills its defaults and serials during the copy
+        for row in attributes:
+            line = f'   {row["kolomnaam"]} {row["datatype"]}'
+            default = dc.parse_constraints(row['constraints'])['default']
+            if default is not None:
+                line += f' DEFAULT {default}'
 
-        data_types += line + ',\n'
+            data_types += line + ',\n'
+
+        # for
 
+    else:
+        for definition in dc.column_definitions(attributes):
+            data_types += f'   {definition},\n'
+
+    # if
+
+    for row in attributes:
         comment: str = f"COMMENT ON COLUMN {schema_name}.{table_name}.{row['kolomnaam']} IS "
-        description: str = schema.loc[idx, 'beschrijving'].strip()
+        description: str = row['beschrijving'].strip()
 
         if len(description) == 0:
             description = '*** NO DOCUMENTATION PROVIDED ***'
@@ -359,16 +931,386 @@ def create_table(schema: pd.DataFrame,
     tbd += data_types + '\n);\n\n'
     tbd += table_comment + comments + '\n\n'
 
+    # keys are built after the copy in bulk mode
+    if not bulk:
+        tbd += create_keys(attributes, schema_name, table_name)
+
     if data is not None:
         tbd += f"\\COPY {schema_name}.{table_name} FROM {data_name} DELIMITER ';' CSV HEADER\n\n"
 
-    logger.debug(tbd)
+    if bulk:
+        tbd += create_bulk_constraints(attributes, schema_name, table_name)
+
+    logger.debug('%s', tbd)
 
     return tbd
 
 ### create_table ###
 
 
+def column_constraints_to_table(col: str, other: str) -> list:
+    """ Converts column constraints like UNIQUE or CHECK to table constraints
+
+    Args:
+        col (str): column the constraints belong to
+        other (str): the 'other' part of dc.parse_constraints
+
+    Returns:
+        list: table constraints for ALTER TABLE ... ADD
+    """
+    parts = re.split(r'\s+(?=(?:UNIQUE|CHECK|PRIMARY\s+KEY|REFERENCES)\b)', other.strip(), flags = re.IGNORECASE)
+    table_constraints = []
+    for part in parts:
+        keyword = part.split()[0].upper() if len(part) > 0 else ''
+        if keyword == 'UNIQUE':
+            table_constraints.append(f'UNIQUE ({col})')
+        elif keyword == 'PRIMARY':
+            table_constraints.append(f'PRIMARY KEY ({col})')
+        elif keyword == 'REFERENCES':
+            table_constraints.append(f'FOREIGN KEY ({col}) {part}')
+        elif keyword == 'CHECK':
+            table_constraints.append(part)
+        elif len(part) > 0:
+            logger.warning(f'!!! Constraint "{part}" of {col} cannot be deferred, ignored')
+
+    # for
+
+    return table_constraints
+
+### column_constraints_to_table ###
+
+
+def key_columns(attributes: list) -> tuple:
+    """ Returns the primary key and the indexes that follow from keytype
+
+    The keytype PK columns become the primary key when all of them are
+    NOT NULL or serial and no column has a PRIMARY KEY constraint of its
+    own, otherwise they are indexed. keytype FK columns are indexed.
+
+    Args:
+        attributes (list): schema rows of the table
+
+    Returns:
+        tuple: (primary key columns, list of column lists to index)
+    """
+    pk_columns = []
+    fk_columns = []
+    pk_not_null = True
+    own_pk = False
+
+    for row in attributes:
+        constraints = dc.parse_constraints(row.get('constraints', ''))
+        serial = row['datatype'].strip().lower() in dc.SERIAL_TYPES
+        keytype = str(row.get('keytype', '')).strip().upper()
+
+        if re.search(r'PRIMARY\s+KEY', constraints['other'], flags = re.IGNORECASE):
+            own_pk = True
+
+        if keytype == 'PK':
+            pk_columns.append(row['kolomnaam'])
+            pk_not_null = pk_not_null and (constraints['not_null'] or serial)
+
+        elif keytype == 'FK':
+            fk_columns.append(row['kolomnaam'])
+
+    # for
+
+    indexes = [[col] for col in fk_columns]
+    if len(pk_columns) > 0 and pk_not_null and not own_pk:
+        return pk_columns, indexes
+
+    return [], ([pk_columns] if len(pk_columns) > 0 else []) + indexes
+
+### key_columns ###
+
+
+def key_index_name(table_name: str, columns: list) -> str:
+    """ Returns the name of the index on columns of table_name (including _data) """
+    return f'{table_name}_{"_".join(columns)}_idx'[-dc.MAX_IDENTIFIER_LENGTH:]
+
+### key_index_name ###
+
+
+def create_keys(attributes: list, schema_name: str, table_name: str) -> str:
+    """ Adds the primary key and indexes of key_columns to a new table
+
+    Args:
+        attributes (list): schema rows of the table
+        schema_name (str): postgres schema name
+        table_name (str): Postgres table name, including _data
+
+    Returns:
+        str: SQL string with DDL
+    """
+    full_name = f'{schema_name}.{table_name}'
+    pk_columns, indexes = key_columns(attributes)
+
+    tbd: str = ''
+    if len(pk_columns) > 0:
+        tbd += f'ALTER TABLE {full_name} ADD PRIMARY KEY ({", ".join(pk_columns)});\n\n'
+
+    for columns in indexes:
+        tbd += f'CREATE INDEX {key_index_name(table_name, columns)} ON {full_name} ({", ".join(columns)});\n\n'
+
+    return tbd
+
+### create_keys ###
+
+
+def create_bulk_constraints(attributes: list, schema_name: str, table_name: str) -> str:
+    """ Adds the constraints, keys and indexes to a bulk loaded table
+
+    Building them once after the copy is much faster than maintaining them
+    row by row. All constraints are added with a single ALTER TABLE, so the
+    table is scanned once. Keys and indexes are those of key_columns, as
+    in create mode. Finally the table is analyzed.
+
+    Args:
+        attributes (list): schema rows of the table
+        schema_name (str): postgres schema name
+        table_name (str): Postgres table name, including _data
+
+    Returns:
+        str: SQL string with DDL
+    """
+    full_name = f'{schema_name}.{table_name}'
+    actions = []
+
+    for row in attributes:
+        col = row['kolomnaam']
+        constraints = dc.parse_constraints(row['constraints'])
+
+        if constraints['not_null']:
+            actions.append(f'ALTER COLUMN {col} SET NOT NULL')
+
+        for constraint in column_constraints_to_table(col, constraints['other']):
+            actions.append(f'ADD {constraint}')
+
+    # for
+
+    pk_columns, indexes = key_columns(attributes)
+    if len(pk_columns) > 0:
+        actions.append(f'ADD PRIMARY KEY ({", ".join(pk_columns)})')
+
+    tbd: str = ''
+    if len(actions) > 0:
+        tbd += f'ALTER TABLE {full_name}\n   ' + ',\n   '.join(actions) + ';\n\n'
+
+    for columns in indexes:
+        tbd += f'CREATE INDEX {key_index_name(table_name, columns)} ON {full_name} ({", ".join(columns)});\n\n'
+
+    tbd += f'ANALYZE {full_name};\n\n'
+
+    return tbd
+
+### create_bulk_constraints ###
+
+
+def create_description_migration(schema: pd.DataFrame,
+                                 current: pd.DataFrame,
+                                 meta: pd.DataFrame,
+                                 catalogue: dc.AttributeCatalogue,
+                                 filename: str,
+                                 schema_name: str,
+                                 table: str,
+                                ) -> str:
+    """ Migrates a description table instead of recreating it
+
+    Columns of schema that are not in the current description table are
+    added, columns that disappeared are dropped. The content of a
+    description table is small and is replaced as a whole.
+
+    Args:
+        schema (pd.DataFrame): new schema
+        current (pd.DataFrame): description table as stored in the database
+        meta (pd.DataFrame): meta data of the schema
+        catalogue (dc.AttributeCatalogue): catalogue containing the template
+        filename (str): filename to read the description from
+        schema_name (str): postgres schema name
+        table (str): Postgres table name
+
+    Returns:
+        str: SQL string with DDL
+    """
+    table_name = f'{schema_name}.{table}_description'
+    tbd: str = ''
+
+    for col in schema.columns:
+        if col not in current.columns:
+            beschrijving: str = catalogue.value(catalogue.template_table, col, 'beschrijving')
+            tbd += f'ALTER TABLE {table_name} ADD COLUMN {col} text;\n'
+            tbd += f'COMMENT ON COLUMN {table_name}.{col} IS $${beschrijving}$$;\n'
+
+        # if
+    # for
+
+    for col in current.columns:
+        if col not in schema.columns:
+            tbd += f'ALTER TABLE {table_name} DROP COLUMN {col};\n'
+
+    desc: str = '*** NO DOCUMENTATION PROVIDED ***'
+    if len(meta.loc['Bronbestand beschrijving', 'Waarde'].strip()) > 0:
+        desc = meta.loc['Bronbestand beschrijving', 'Waarde']
+
+    tbd += f'COMMENT ON TABLE {table_name} IS $${desc}$$;\n\n'
+    tbd += f'TRUNCATE {table_name};\n\n'
+    tbd += f"\\COPY {table_name} FROM {filename} DELIMITER ';' CSV HEADER\n\n"
+
+    logger.debug('%s', tbd)
+
+    return tbd
+
+### create_description_migration ###
+
+
+def create_table_migration(catalogue: dc.AttributeCatalogue,
+                           current: pd.DataFrame,
+                           schema_name: str,
+                           table: str,
+                          ) -> str:
+    """ Migrates a data table to a new schema with ALTER TABLE statements
+
+    The new schema is compared with the schema stored in the description
+    table in the database (current). Only the differences are emitted:
+    added and dropped columns, changed data types, NOT NULL and DEFAULT
+    constraints and comments. The keys and indexes of keytype are
+    reconciled by migrate_keys. The data in the table are kept.
+
+    Args:
+        catalogue (dc.AttributeCatalogue): catalogue containing the attributes of table
+        current (pd.DataFrame): description table as stored in the database
+        schema_name (str): postgres schema name
+        table (str): Postgres table name
+
+    Returns:
+        str: SQL string with DDL, empty when nothing changed and the table
+            has no keys
+    """
+    table_name = f'{schema_name}.{table}_data'
+    old_rows = {row['kolomnaam']: row for row in current.to_dict('records')}
+    new_names = []
+    tbd: str = ''
+
+    for row in catalogue.table_attributes(table):
+        col = row['kolomnaam']
+        new_names.append(col)
+        description: str = row['beschrijving'].strip()
+        if len(description) == 0:
+            description = '*** NO DOCUMENTATION PROVIDED ***'
+
+        # new column
+        if col not in old_rows:
+            line = f'ALTER TABLE {table_name} ADD COLUMN {col} {row["datatype"]}'
+            if len(row['constraints']) > 0:
+                line += ' ' + row['constraints']
+
+            tbd += line + ';\n'
+            tbd += f'COMMENT ON COLUMN {table_name}.{col} IS $${description}$$;\n'
+
+            if dc.parse_constraints(row['constraints'])['not_null']:
+                logger.warning(f'!!! {table_name}.{col} is added as NOT NULL, '
+                               'this fails when the table contains rows without a DEFAULT')
+
+            continue
+
+        # if
+
+        old = old_rows[col]
+        old_type = old.get('datatype', '').strip().lower()
+        new_type = row['datatype'].strip().lower()
+        if old_type != new_type:
+            new_type = dc.SERIAL_TYPES.get(new_type, new_type)
+            tbd += f'ALTER TABLE {table_name} ALTER COLUMN {col} TYPE {new_type} USING {col}::{new_type};\n'
+
+        old_constraints = dc.parse_constraints(old.get('constraints', ''))
+        new_constraints = dc.parse_constraints(row['constraints'])
+        if old_constraints['not_null'] != new_constraints['not_null']:
+            action = 'SET' if new_constraints['not_null'] else 'DROP'
+            tbd += f'ALTER TABLE {table_name} ALTER COLUMN {col} {action} NOT NULL;\n'
+
+        if old_constraints['default'] != new_constraints['default']:
+            if new_constraints['default'] is None:
+                tbd += f'ALTER TABLE {table_name} ALTER COLUMN {col} DROP DEFAULT;\n'
+            else:
+                tbd += f'ALTER TABLE {table_name} ALTER COLUMN {col} SET DEFAULT {new_constraints["default"]};\n'
+
+        # if
+
+        if old_constraints['other'] != new_constraints['other']:
+            logger.warning(f'!!! Constraints of {table_name}.{col} changed from '
+                           f'"{old_constraints["other"]}" to "{new_constraints["other"]}", '
+                           'these are not migrated')
+
+        if old.get('beschrijving', '').strip() != row['beschrijving'].strip():
+            tbd += f'COMMENT ON COLUMN {table_name}.{col} IS $${description}$$;\n'
+
+    # for
+
+    for col in old_rows:
+        if col not in new_names:
+            tbd += f'ALTER TABLE {table_name} DROP COLUMN {col};\n'
+
+    tbd += migrate_keys(catalogue.table_attributes(table), list(old_rows.values()), schema_name, table)
+
+    if len(tbd) > 0:
+        tbd += '\n'
+
+    logger.debug('%s', tbd)
+
+    return tbd
+
+### create_table_migration ###
+
+
+def migrate_keys(attributes: list, current: list, schema_name: str, table: str) -> str:
+    """ Reconciles the primary key and indexes of a table with key_columns
+
+    Keys that were derived from the keytype of the current schema and no
+    longer are, are dropped. The keys of the new schema are created when
+    missing, so tables created before create mode honoured keytype get the
+    same keys as a newly created table.
+
+    Args:
+        attributes (list): schema rows of the new schema
+        current (list): schema rows as stored in the description table
+        schema_name (str): postgres schema name
+        table (str): Postgres table name
+
+    Returns:
+        str: SQL string with DDL
+    """
+    table_name = f'{table}_data'
+    full_name = f'{schema_name}.{table_name}'
+    old_pk, old_indexes = key_columns(current)
+    new_pk, new_indexes = key_columns(attributes)
+    tbd: str = ''
+
+    if len(old_pk) > 0 and old_pk != new_pk:
+        tbd += f'ALTER TABLE {full_name} DROP CONSTRAINT IF EXISTS {table_name}_pkey;\n'
+
+    for columns in old_indexes:
+        if columns not in new_indexes:
+            tbd += f'DROP INDEX IF EXISTS {schema_name}.{key_index_name(table_name, columns)};\n'
+
+    # for
+
+    if len(new_pk) > 0:
+        tbd += (f"DO $$ BEGIN\n"
+                f"    IF NOT EXISTS (SELECT 1 FROM pg_constraint\n"
+                f"                   WHERE conrelid = '{full_name}'::regclass AND contype = 'p') THEN\n"
+                f"        ALTER TABLE {full_name} ADD PRIMARY KEY ({', '.join(new_pk)});\n"
+                f"    END IF;\n"
+                f"END $$;\n")
+
+    for columns in new_indexes:
+        tbd += (f'CREATE INDEX IF NOT EXISTS {key_index_name(table_name, columns)} '
+                f'ON {full_name} ({", ".join(columns)});\n')
+
+    return tbd
+
+### migrate_keys ###
+
+
 def apply_data_odl(template: pd.DataFrame, data: pd.DataFrame, meta: pd.DataFrame, table: str):
     """ Uses data and meta to fill in the ODL template
 
@@ -380,6 +1322,8 @@ def apply_data_odl(template: pd.DataFrame, data: pd.DataFrame, meta: pd.DataFram
     Returns:
         pd.DataFrame: the filled out template
     """
+    import pandas as pd
+
     if 'kolomnaam' not in data.columns:
         raise ValueError(f'* Data "{table}" *moet* "kolomnaam" bevatten. ODL generatie kan daar niet zonder')
 
@@ -414,18 +1358,14 @@ def apply_data_odl(template: pd.DataFrame, data: pd.DataFrame, meta: pd.DataFram
     # namen die worden voorgedefinieerd en niet worden overgekopieerd
     names_to_skip = ['kolomnaam', 'code_attribuut', 'code_attribuut_sleutel', 'code_bronbestand']
 
+    # ensure that kolomnaam are unique postgres accepted column names
+    new_names = dc.normalize_column_names(data['kolomnaam'])
+
     i = 0
     # generate codes and keys
     for row, _ in new_df.iterrows():
-        # ensure that kolomnaam is a postgres accepted column name
-        new_name = dc.change_column_name(data.loc[row, 'kolomnaam'])
-
-        # when no name could be created, create a random one
-        if len(new_name) == 0:
-            new_name = 'kolom_' + str(randint(1000, 9998))
-
         # assign newly created column name to kolomnaam
-        new_df.loc[row, 'kolomnaam'] = new_name
+        new_df.loc[row, 'kolomnaam'] = new_names[row]
 
         # create code attribuut
         code_atr: str = ''
@@ -557,6 +1497,8 @@ def preprocess_schemas(tables, server: dict):
 
 
 def load_schemas(tables: dict, root: str, work: str, supplier: str) -> dict:
+    import pandas as pd
+
     for table in tables:
         logger.info(f'=== {table} ===')
         schema_root = join(root, 'schemas', supplier)
@@ -570,6 +1512,39 @@ def load_schemas(tables: dict, root: str, work: str, supplier: str) -> dict:
         meta_name = join(schema_root, fn + '.meta' + ext)
         data_name = join(schema_root, fn + '.data' + ext)
 
+        # Excel sheets are streamed into csv files in the work directory,
+        # either from one workbook with the sheets named in 'sheets' or
+        # from the first sheet of the schema, meta and data workbooks
+        sheets = tables[table].get('sheets')
+        if ext.lower() in dc.XLSX_EXTENSIONS and sheets is not None:
+            logger.info(f'[Converting sheets of {base} to csv]')
+            os.makedirs(schema_work, exist_ok = True)
+            workbook = filename
+            filename = join(schema_work, fn + '.csv')
+            meta_name = join(schema_work, fn + '.meta.csv')
+            data_name = join(schema_work, fn + '.data.csv')
+            dc.xlsx_to_csv(workbook, filename, sheets['schema'])
+            dc.xlsx_to_csv(workbook, meta_name, sheets['meta'])
+            if 'data' in sheets:
+                dc.xlsx_to_csv(workbook, data_name, sheets['data'])
+            elif exists(data_name):
+                os.remove(data_name) # left by a previous run
+
+            ext = '.csv'
+            base = fn + ext
+
+        elif ext.lower() in dc.XLSX_EXTENSIONS:
+            logger.info(f'[Converting {base} to csv]')
+            filename = dc.as_csv_file(filename, schema_work)
+            meta_name = dc.as_csv_file(meta_name, schema_work)
+            if exists(data_name):
+                data_name = dc.as_csv_file(data_name, schema_work)
+
+            ext = '.csv'
+            base = fn + ext
+
+        # if
+
         if fn == 'bronbestand_attribuutmeta':
             tables[table]['template'] = True
         else:
@@ -641,16 +1616,27 @@ def load_schemas(tables: dict, root: str, work: str, supplier: str) -> dict:
 ### load_schemas ###
 
 
-def update_odl_version(config: dict, filename: str):
-    """ Update the patch of ODL version
+def update_odl_version(config: dict, filename: str) -> tuple:
+    """ Update the ODL version
+
+    The current version is read from the database by dc.current_odl_version
+    and incremented. The new version is written to the meta data file that
+    is loaded by the generated SQL. It is recorded in odl_version_history
+    by the generated SQL (see dc.odl_version_sql), so only when that SQL
+    is applied.
 
     Args:
         config (dict): ODL configuration dictionary
         filename (str): Meta data file name
 
     Raises:
-        dc.DiDoError: _description_
+        dc.DiDoError: when both major and minor version updates are requested
+
+    Returns:
+        tuple: (previous version, new version, update type); previous is
+            None when the database could not be reached
     """
+    import pandas as pd
 
     logger.info('')
 
@@ -669,62 +1655,38 @@ def update_odl_version(config: dict, filename: str):
 
     # get the odl server config from config
     server_config = config['SERVER_CONFIGS']['ODL_SERVER_CONFIG']
-    meta_table = None
-
-    # fetch the table from the database
-    try:
-        meta_table = dc.load_odl_table(table_name, server_config)
-        version = meta_table.loc[0, dc.ODL_VERSION]
-
-    # Some error occured, information could not be fetch from the database
-    # No updates of the version will take place as this depends on the
-    # versions stored in the database.
-    except Exception as e:
-        version = dc.get_par(config, 'INITIAL_VERSION')
-        logger.warning('!!! Current version could not be fetched from the database.')
-        logger.warning(f'!!! Initial version from config provided: {version}')
-        logger.debug(e)
-
-    # try..except
 
-    major, minor, patch = version.split('.')
-    major = int(major)
-    minor = int(minor)
-    patch = int(patch)
-
-    # Update versioning
     major_update = dc.get_par(config, 'UPDATE_MAJOR_VERSION')
     minor_update = dc.get_par(config, 'UPDATE_MINOR_VERSION')
+    initial_version = dc.get_par(config, 'INITIAL_VERSION')
     nu = datetime.now()
 
     if major_update and minor_update:
         raise dc.DiDoError('Config: Major and Minor version update are set. Only one (or neither) may be set.')
 
-    # if major update, incr major version and set rest to zero
-    if major_update:
-        major += 1
-        minor = 0
-        patch = 0
-
-        logger.info(f'[Major ODL version will be updated to {major}]')
-
-    # if minor update, incr major version and set patch to zero
-    elif minor_update:
-        minor += 1
-        patch = 0
-
-        logger.info(f'[Minor ODL version will be updated to {minor}]')
+    # fetch the version from the database
+    try:
+        previous = dc.current_odl_version(server_config, table_name)
+        if previous is None:
+            previous = initial_version
+            logger.warning(f'!!! No ODL version found in the database, starting from {previous}')
 
-    # each run is a patch update
-    else:
-        patch += 1
+        new_version, _, _, _, update_type = dc.next_version(previous, major_update, minor_update)
 
-        logger.info(f'[Patch ODL version updated to {patch}]')
+    # Some error occured, information could not be fetch from the database
+    # No updates of the version will take place as this depends on the
+    # versions stored in the database.
+    except Exception as e:
+        previous = None
+        new_version = initial_version
+        update_type = 'initial'
+        logger.warning('!!! Current version could not be fetched from the database.')
+        logger.warning(f'!!! Initial version from config provided: {initial_version}')
+        logger.debug(e)
 
-    # if
+    # try..except
 
     # set new values
-    new_version = f'{major}.{minor}.{patch}'
     meta_data.loc[0, dc.ODL_VERSION] = new_version
     meta_data.loc[0, dc.ODL_VERSION_DATE] = nu.strftime(dc.DATETIME_FORMAT)
 
@@ -733,7 +1695,7 @@ def update_odl_version(config: dict, filename: str):
     logger.info(f'[ODL version will be set to {new_version}]')
     logger.info('')
 
-    return
+    return previous, new_version, update_type
 
 ### update_odl_version ###
 
@@ -793,9 +1755,16 @@ if __name__ == '__main__':
     # with open("config/config.yaml", "r") as infile:
     #     env = yaml.safe_load(infile)
 
+    import pandas as pd
+
+    # print all columns of dataframe
+    pd.set_option('display.max_columns', 1000)
+    pd.set_option('display.width', 1000)
+
     # read the configuration file
     cwd = os.getcwd()
-    config = dc.read_config(cwd)
+    with dc.measure_stage('config'):
+        config = dc.read_config(cwd)
 
     # get all configuration
     root_dir: str = config['ROOT_DIR']
@@ -815,20 +1784,42 @@ if __name__ == '__main__':
 
     # ceate logger
     log_file: str = join(work_dir, 'logs', 'odl-creator.log')
-    logger = dc.create_log(log_file, level = 'DEBUG')
+    logger = dc.create_log_from_config(config, log_file, level = 'DEBUG')
     logger.info(f'log_file is {log_file}')
 
+    # per stage metrics are written as JSON lines next to the log file
+    dc.init_metrics(join(work_dir, 'logs', 'odl-creator.metrics.jsonl'))
+
     # create the documentation and sql filename
     schema_root: str = join(root_dir, 'schemas', data_model)
     schema_work: str = join(work_dir, 'schemas', data_model)
     doc_name: str = join(work_dir, 'docs', doc)
     sql_name: str = join(work_dir, 'sql', sql)
 
-    schemas = load_schemas(table_dict, root_dir, work_dir, data_model)
+    with dc.measure_stage('load') as stage:
+        schemas = load_schemas(table_dict, root_dir, work_dir, data_model)
+        stage['rows'] = sum([len(schemas[table]['schema']) for table in schemas])
 
-    schemas, template, meta_data_filename = preprocess_schemas(schemas, server)
+    with dc.measure_stage('preprocess') as stage:
+        schemas, template, meta_data_filename = preprocess_schemas(schemas, server)
+        stage['rows'] = sum([len(schemas[table]['schema']) for table in schemas])
+
+    # index all attributes once for the documentation and sql generators
+    catalogue = dc.AttributeCatalogue(schemas)
+
+    # the new version is recorded by the generated SQL
+    version_sql = ''
     if len(meta_data_filename) > 0:
-        update_odl_version(config, meta_data_filename)
+        with dc.measure_stage('version'):
+            previous, new_version, update_type = update_odl_version(config, meta_data_filename)
+
+        history = catalogue.table_attributes(dc.ODL_VERSION_HISTORY)
+        if len(history) > 0:
+            version_sql = dc.odl_version_sql(schema_name, history, previous, new_version, update_type)
+        else:
+            logger.warning(f'!!! {dc.ODL_VERSION_HISTORY} not in TABLES, the version is not recorded')
+
+    # if
 
     # give feedback on the filenames
     logger.info('')
@@ -839,9 +1830,49 @@ if __name__ == '__main__':
     logger.info('')
 
     # write documentation files
-    write_documentation(doc_name, schemas, root_dir, columns_to_write)
+    with dc.measure_stage('docs') as stage:
+        if dc.get_par(config, 'DOC_MODE', 'single') == 'per_table':
+            write_documentation_per_table(join(work_dir, 'docs', data_model), schemas, columns_to_write)
+        else:
+            write_documentation(doc_name, schemas, root_dir, columns_to_write)
+
+        # optionally write a searchable html catalogue as well
+        html_doc = dc.get_par(config, 'DOC_HTML', '')
+        if html_doc is not None and len(html_doc) > 0:
+            write_html_catalogue(join(work_dir, 'docs', html_doc), schemas, catalogue, columns_to_write)
+        stage['rows'] = len(schemas)
+
+    # a migration is derived from the tables of ODL_SERVER_CONFIG and is only
+    # valid for that server, it cannot be applied to other servers
+    sql_mode = dc.get_par(config, 'SQL_MODE', 'create')
+    fanout_configs = dc.get_fanout_configs(config, cwd)
+    if sql_mode == 'migrate' and len(fanout_configs) > 0:
+        raise dc.DiDoError('*** SQL_MODE migrate cannot be combined with FANOUT servers: '
+                           'the migration is generated from the tables of ODL_SERVER_CONFIG only')
 
     # write sql file
-    write_sql(sql_name, schemas, template, schema_name)
+    with dc.measure_stage('sql') as stage:
+        # migrate existing tables instead of recreating them
+        migrate_from = server if sql_mode == 'migrate' else None
+        write_sql(sql_name, schemas, catalogue, schema_name, migrate_from,
+                  bulk = sql_mode == 'bulk', version_sql = version_sql)
+        stage['rows'] = len(schemas)
+
+    # apply the sql file to all FANOUT servers at once
+    if len(fanout_configs) > 0:
+        with dc.measure_stage('fanout') as stage:
+            stop_on_failure = dc.get_par(dc.get_par(config, 'FANOUT', {}), 'stop_on_failure', True)
+            results = fan_out_sql(sql_name, fanout_configs, stop_on_failure)
+            stage['rows'] = len(results)
+
+        if any([result['status'] != 'ok' for result in results]):
+            logger.error('*** SQL not applied to all FANOUT servers')
+            dc.report_metrics()
+            sys.exit(1)
+
+        # if
+    # if
+
+    dc.report_metrics()
 
     logger.info('[Ready]')
\ No newline at end of file
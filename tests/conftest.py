@@ -0,0 +1,27 @@
+""" Makes the modules in src importable for the tests
+"""
+import sys
+import importlib.util
+
+from os.path import join, dirname, abspath
+
+SRC_DIR = join(dirname(dirname(abspath(__file__))), 'src')
+sys.path.insert(0, SRC_DIR)
+
+
+def load_odl_creator():
+    """ Imports src/odl-creator.py, whose name is not a valid module name
+
+    The logger of odl-creator is only set when it runs as a script, so the
+    one of dido_common is used.
+    """
+    import dido_common as dc
+
+    spec = importlib.util.spec_from_file_location('odl_creator', join(SRC_DIR, 'odl-creator.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.logger = dc.logger
+
+    return module
+
+### load_odl_creator ###
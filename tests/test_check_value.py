@@ -0,0 +1,46 @@
+import dido_common as dc
+
+
+def check(value: str, datatype: str, not_null: bool = False, domain: str = '') -> int:
+    return dc.check_value(value, datatype, not_null, dc.parse_domain(domain))
+
+
+def test_split_datatype():
+    assert dc.split_datatype('numeric(10, 2)') == ('numeric', [10, 2])
+    assert dc.split_datatype('VARCHAR (20)') == ('varchar', [20])
+    assert dc.split_datatype('character  varying(5)') == ('character varying', [5])
+    assert dc.split_datatype('double precision') == ('double precision', [])
+
+
+def test_check_value_mandatory():
+    assert check('', 'text', not_null = True) == dc.VALUE_MANDATORY_NOT_SPECIFIED
+    assert check('', 'text') == dc.VALUE_OK
+
+
+def test_check_value_integers():
+    assert check('12', 'integer') == dc.VALUE_OK
+    assert check('1.5', 'integer') == dc.VALUE_WRONG_DATATYPE
+    assert check('40000', 'smallint') == dc.VALUE_WRONG_DATATYPE
+
+
+def test_check_value_varchar_and_char():
+    assert check('abcde', 'varchar(5)') == dc.VALUE_OK
+    assert check('abcdef', 'varchar(5)') == dc.VALUE_WRONG_DATATYPE
+    assert check('ab', 'char') == dc.VALUE_WRONG_DATATYPE
+    assert check('ab', 'character(2)') == dc.VALUE_OK
+    assert check('x' * 1000, 'varchar') == dc.VALUE_OK
+
+
+def test_check_value_numeric_precision():
+    assert check('999.99', 'numeric(5,2)') == dc.VALUE_OK
+    assert check('-999.994', 'numeric(5, 2)') == dc.VALUE_OK
+    assert check('999.995', 'numeric(5,2)') == dc.VALUE_WRONG_DATATYPE
+    assert check('1000', 'numeric(5,2)') == dc.VALUE_WRONG_DATATYPE
+    assert check('abc', 'numeric(5,2)') == dc.VALUE_WRONG_DATATYPE
+    assert check('NaN', 'numeric(5,2)') == dc.VALUE_WRONG_DATATYPE
+
+
+def test_check_value_domains():
+    assert check('b', 'text', domain = "['a', 'b']") == dc.VALUE_OK
+    assert check('c', 'text', domain = "['a', 'b']") == dc.VALUE_NOT_IN_LIST
+    assert check('11', 'varchar(3)', domain = '1:10') == dc.VALUE_NOT_BETWEEN_MINMAX
@@ -0,0 +1,37 @@
+import dido_common as dc
+
+
+def test_change_column_name():
+    assert dc.change_column_name(' Bedrag (EUR) ') == 'bedrag_eur'
+    assert dc.change_column_name('2e Straat-naam') == 'e_straat_naam'
+    assert dc.change_column_name('123') == dc.change_column_name('123')
+    assert dc.change_column_name('123').startswith('kolom_')
+
+
+def test_normalize_column_names_rules():
+    names = dc.normalize_column_names([' Bedrag (EUR) ', '__Huis nr.__', '2e', 'x' * 100])
+
+    assert names.tolist() == ['bedrag_eur', 'huis_nr', 'e', 'x' * dc.MAX_IDENTIFIER_LENGTH]
+
+
+def test_normalize_column_names_without_letters():
+    names = dc.normalize_column_names(['a', '123', '', '%'])
+
+    assert names.tolist() == ['a', 'kolom_002', 'kolom_003', 'kolom_004']
+
+
+def test_normalize_column_names_duplicates():
+    names = dc.normalize_column_names(['a', 'A', 'a_2', 'a ', 'a_3'])
+
+    # a suffix that is taken by an existing name is increased
+    assert names.tolist() == ['a', 'a_4', 'a_2', 'a_5', 'a_3']
+    assert not names.duplicated().any()
+
+
+def test_normalize_column_names_keeps_index():
+    import pandas as pd
+
+    names = dc.normalize_column_names(pd.Series(['X', 'Y'], index = [5, 7]))
+
+    assert names.index.tolist() == [5, 7]
+    assert names.tolist() == ['x', 'y']
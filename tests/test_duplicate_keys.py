@@ -0,0 +1,55 @@
+import dido_common as dc
+
+SCHEMA = [
+    {'kolomnaam': 'id', 'keytype': 'PK', 'code_attribuut': '001'},
+    {'kolomnaam': 'jaar', 'keytype': 'PK', 'code_attribuut': '002'},
+    {'kolomnaam': 'naam', 'keytype': '', 'code_attribuut': '003'},
+]
+
+
+def write_data(tmp_path, rows: list) -> str:
+    filename = tmp_path / 'data.csv'
+    filename.write_text('ID;Jaar;Naam\n' + ''.join([';'.join(row) + '\n' for row in rows]), encoding = 'utf8')
+
+    return str(filename)
+
+
+def test_find_duplicate_keys_in_memory(tmp_path):
+    data_file = write_data(tmp_path, [['1', '2020', 'a'], ['2', '2020', 'b'], ['1', '2020', 'c'],
+                                      ['1', '2021', 'd'], ['2', '2020', 'e'], ['1', '2020', 'f']])
+    groups = dc.find_duplicate_keys(data_file, SCHEMA, memory_budget = 10 ** 6)
+
+    assert groups == [
+        {'columns': ['id', 'jaar'], 'values': ['1', '2020'], 'rows': [1, 3, 6]},
+        {'columns': ['id', 'jaar'], 'values': ['2', '2020'], 'rows': [2, 5]},
+    ]
+
+
+def test_find_duplicate_keys_spills_on_rows(tmp_path):
+    # one key repeated: the budget counts rows, not distinct keys
+    rows = [['7', '2020', str(i)] for i in range(50)] + [['8', '2020', 'x']]
+    data_file = write_data(tmp_path, rows)
+    spilled = dc.find_duplicate_keys(data_file, SCHEMA, memory_budget = 4 * dc.DUPLICATE_ENTRY_BYTES,
+                                     tmp_dir = str(tmp_path))
+    in_memory = dc.find_duplicate_keys(data_file, SCHEMA, memory_budget = 10 ** 6)
+
+    assert spilled == in_memory
+    assert spilled[0]['rows'] == list(range(1, 51))
+
+
+def test_find_duplicate_keys_without_key(tmp_path):
+    data_file = write_data(tmp_path, [['1', '2020', 'a'], ['1', '2020', 'a']])
+    schema = [dict(row, keytype = '') for row in SCHEMA]
+
+    assert dc.find_duplicate_keys(data_file, schema) == []
+
+
+def test_duplicate_findings_use_recordnummers():
+    groups = [{'columns': ['id'], 'values': ['1'], 'rows': [1, 3]}]
+    findings = dc.duplicate_findings(groups, SCHEMA, 'BRON', '2024-01', {3: 103})
+
+    assert len(findings) == 1
+    assert findings.loc[0, dc.ODL_RECORDNO] == 103
+    assert findings.loc[0, 'row_number'] == 3
+    assert findings.loc[0, 'code_attribuut'] == '001'
+    assert findings.loc[0, 'code_datakwaliteit'] == dc.VALUE_DUPLICATE_KEY
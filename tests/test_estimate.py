@@ -0,0 +1,43 @@
+import pytest
+
+import dido_common as dc
+
+SCHEMA = [
+    {'kolomnaam': 'id', 'datatype': 'integer', 'constraints': 'NOT NULL', 'keytype': 'PK'},
+    {'kolomnaam': 'code', 'datatype': 'text', 'constraints': '', 'keytype': 'FK'},
+    {'kolomnaam': 'bedrag', 'datatype': 'bigint', 'constraints': '', 'keytype': ''},
+]
+
+
+def write_data(tmp_path, n_rows: int) -> str:
+    filename = tmp_path / 'data.csv'
+    filename.write_text('ID;Code;Bedrag\n' + ''.join([f'{i};abc;{i * 10}\n' for i in range(n_rows)]),
+                        encoding = 'utf8')
+
+    return str(filename)
+
+
+def test_estimate_new_table_indexes_keys(tmp_path):
+    estimate = dc.estimate_delivery_load(write_data(tmp_path, 100), SCHEMA, rows_per_second = 100)
+
+    assert estimate['exact'] and estimate['rows'] == 100
+    assert estimate['row_bytes'] == dc.TUPLE_OVERHEAD + 4 + 4 + 8
+    # an index on id (4 bytes) and one on code (4 bytes)
+    assert estimate['index_row_bytes'] == 2 * dc.INDEX_TUPLE_OVERHEAD + 4 + 4
+    assert estimate['growth_bytes'] == 100 * (estimate['row_bytes'] + estimate['index_row_bytes'])
+    assert estimate['table_bytes'] == estimate['growth_bytes']
+    assert estimate['load_seconds'] == pytest.approx(1 + estimate['index_row_bytes'] / estimate['row_bytes'])
+
+
+def test_estimate_uses_existing_table_sizes(tmp_path):
+    sizes = {'heap_bytes': 100000, 'index_bytes': 50000, 'rows': 1000}
+    estimate = dc.estimate_delivery_load(write_data(tmp_path, 10), SCHEMA, rows_per_second = 10,
+                                         table_sizes = sizes)
+
+    assert estimate['table_row_bytes'] == 100
+    assert estimate['index_row_bytes'] == 50
+    assert estimate['index_growth_bytes'] == 500
+    assert estimate['growth_bytes'] == 1500
+    assert estimate['table_sizes'] == {'heap_bytes': 101000, 'index_bytes': 50500, 'rows': 1010}
+    assert estimate['table_bytes'] == 151500
+    assert estimate['load_seconds'] == pytest.approx(1.5)
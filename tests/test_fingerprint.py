@@ -0,0 +1,33 @@
+import dido_common as dc
+
+
+def write(tmp_path, name: str, content: bytes) -> str:
+    filename = tmp_path / name
+    filename.write_bytes(content)
+
+    return str(filename)
+
+
+def test_file_fingerprint(tmp_path):
+    a = write(tmp_path, 'a.csv', b'x;y\n1;2\n')
+    b = write(tmp_path, 'b.csv', b'x;y\n1;2\n')
+    c = write(tmp_path, 'c.csv', b'x;y\n1;3\n')
+
+    assert dc.file_fingerprint(a) == dc.file_fingerprint(b)
+    assert dc.file_fingerprint(a) != dc.file_fingerprint(c)
+    assert dc.file_fingerprint(a).startswith('8:')
+    assert dc.file_fingerprint(a, block_size = 3) == dc.file_fingerprint(a)
+
+
+def test_delivery_fingerprint(tmp_path):
+    a = write(tmp_path, 'a.csv', b'x;y\n1;2\n')
+    c = write(tmp_path, 'c.csv', b'x;y\n1;3\n')
+    d = write(tmp_path, 'd.csv', b'x;y\n1;3\n')
+
+    # a single file keeps its own fingerprint
+    assert dc.delivery_fingerprint([a]) == dc.file_fingerprint(a)
+
+    # all files count, each one once
+    assert dc.delivery_fingerprint([a, c]).startswith('16:')
+    assert dc.delivery_fingerprint([a, c]) == dc.delivery_fingerprint([a, d])
+    assert dc.delivery_fingerprint([a, c]) != dc.delivery_fingerprint([a, a])
@@ -0,0 +1,61 @@
+import dido_common as dc
+
+ATTRIBUTES = [
+    {'kolomnaam': 'volgnummer', 'datatype': 'bigserial', 'constraints': 'PRIMARY KEY'},
+    {'kolomnaam': 'naam', 'datatype': 'text', 'constraints': 'NOT NULL'},
+    {'kolomnaam': 'bedrag', 'datatype': 'numeric(10, 2)', 'constraints': ''},
+]
+
+
+def test_column_definitions():
+    assert dc.column_definitions(ATTRIBUTES) == [
+        'volgnummer bigserial PRIMARY KEY',
+        'naam text NOT NULL',
+        'bedrag numeric(10, 2)',
+    ]
+
+
+def test_column_definitions_without_constraints():
+    # no serials either, the staging table must not create sequences
+    assert dc.column_definitions(ATTRIBUTES, constraints = False) == [
+        'volgnummer bigint',
+        'naam text',
+        'bedrag numeric(10, 2)',
+    ]
+
+
+def test_split_line_ranges(tmp_path):
+    data_file = tmp_path / 'data.csv'
+    lines = [f'{i};waarde {i}\n' for i in range(1000)]
+    data_file.write_text('nummer;waarde\n' + ''.join(lines), encoding = 'utf8')
+
+    ranges = dc.split_line_ranges(str(data_file), 4)
+    content = data_file.read_bytes()
+
+    assert len(ranges) == 4
+    assert ranges[0][0] == len('nummer;waarde\n')
+    assert ranges[-1][1] == len(content)
+
+    # adjacent, every range ends at a newline and together they hold all lines
+    parts = []
+    for (start, end), (next_start, _) in zip(ranges, ranges[1:] + [(len(content), None)]):
+        assert end == next_start
+        assert content[end - 1:end] == b'\n'
+        reader = dc.FileRange(str(data_file), start, end)
+        parts.append(reader.read())
+        reader.close()
+
+    # for
+
+    assert b''.join(parts).decode('utf8') == ''.join(lines)
+
+
+def test_split_line_ranges_small_file(tmp_path):
+    data_file = tmp_path / 'data.csv'
+    data_file.write_text('nummer\n1\n', encoding = 'utf8')
+
+    assert dc.split_line_ranges(str(data_file), 8) == [(7, 9)]
+
+    data_file.write_text('nummer\n', encoding = 'utf8')
+
+    assert dc.split_line_ranges(str(data_file), 8) == []
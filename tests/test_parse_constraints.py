@@ -0,0 +1,19 @@
+import dido_common as dc
+
+
+def test_parse_constraints_default_and_not_null():
+    result = dc.parse_constraints('DEFAULT CURRENT_TIMESTAMP(0) NOT NULL')
+
+    assert result == {'not_null': True, 'default': 'CURRENT_TIMESTAMP(0)', 'other': ''}
+
+
+def test_parse_constraints_other():
+    result = dc.parse_constraints("not null DEFAULT '9999-12-31' UNIQUE CHECK (x > 0)")
+
+    assert result['not_null']
+    assert result['default'] == "'9999-12-31'"
+    assert result['other'] == 'UNIQUE CHECK (x > 0)'
+
+
+def test_parse_constraints_empty():
+    assert dc.parse_constraints('') == {'not_null': False, 'default': None, 'other': ''}
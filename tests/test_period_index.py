@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+import dido_common as dc
+
+
+def test_codes_per_period_type():
+    dates = ['2025-01-01', '2025-07-15 12:00:00', '2025-12-31 23:59:59']
+
+    assert dc.PeriodIndex('J', 2024, 2025).codes(dates).tolist() == ['2025-J'] * 3
+    assert dc.PeriodIndex('H', 2024, 2025).codes(dates).tolist() == ['2025-H1', '2025-H2', '2025-H2']
+    assert dc.PeriodIndex('Q', 2024, 2025).codes(dates).tolist() == ['2025-Q1', '2025-Q3', '2025-Q4']
+    assert dc.PeriodIndex('M', 2024, 2025).codes(dates).tolist() == ['2025-M1', '2025-M7', '2025-M12']
+    assert dc.PeriodIndex('D', 2024, 2025).codes(dates).tolist() == ['2025-D1', '2025-D196', '2025-D365']
+
+
+def test_iso_weeks():
+    index = dc.PeriodIndex('W', 2019, 2021)
+
+    # monday 2019-12-30 starts ISO week 1 of 2020, 2021-01-03 still is week 53
+    assert index.codes(['2019-12-29', '2019-12-30', '2021-01-03']).tolist() == \
+        ['2019-W52', '2020-W1', '2020-W53']
+
+
+def test_outside_and_missing_dates():
+    index = dc.PeriodIndex('M', 2024, 2025)
+
+    assert index.codes(['2023-12-31', '2026-01-01', None, 'geen datum']).tolist() == ['', '', '', '']
+    assert len(index) == 24
+
+
+def test_bounds_and_contains():
+    index = dc.PeriodIndex('Q', 2025, 2025)
+    start, end = index.bounds('2025-Q3')
+
+    assert start == np.datetime64('2025-07-01')
+    assert end == np.datetime64('2025-10-01')
+    assert index.contains(['2025-09-30', '2025-10-01'], '2025-Q3').tolist() == [True, False]
+
+    with pytest.raises(dc.DiDoError):
+        index.bounds('2024-Q3')
+
+
+def test_unknown_period_type():
+    with pytest.raises(dc.DiDoError):
+        dc.PeriodIndex('X', 2025, 2025)
@@ -0,0 +1,23 @@
+import pytest
+
+import dido_common as dc
+
+
+def test_snapshot_table_is_recreated_on_schema_change():
+    sql = dc.create_snapshot_functions('odl', 'sup', 'sup_data', ['M'])
+
+    assert sql.index('DROP TABLE odl.sup_data_snapshot;') < sql.index('CREATE TABLE IF NOT EXISTS odl.sup_data_snapshot')
+
+
+def test_snapshot_refresh_is_limited_to_touched_periods():
+    sql = dc.create_snapshot_functions('odl', 'sup', 'sup_data', ['D'])
+
+    # the full series is only generated when the period type has no snapshots
+    assert "v_full := NOT EXISTS (SELECT 1 FROM odl.sup_data_snapshot WHERE snapshot_periode LIKE '%-D%');" in sql
+    assert 'WHERE v_full\n' in sql
+    assert 'WHERE NOT v_full AND d.levering_rapportageperiode = p_levering' in sql
+
+
+def test_snapshot_unknown_period():
+    with pytest.raises(dc.DiDoError):
+        dc.create_snapshot_functions('odl', 'sup', 'sup_data', ['X'])
@@ -0,0 +1,49 @@
+from conftest import load_odl_creator
+
+odl = load_odl_creator()
+
+ATTRIBUTES = [
+    {'kolomnaam': 'id', 'datatype': 'integer', 'constraints': 'NOT NULL', 'keytype': 'PK'},
+    {'kolomnaam': 'jaar', 'datatype': 'integer', 'constraints': 'NOT NULL CHECK (jaar > 1900)', 'keytype': 'PK'},
+    {'kolomnaam': 'code', 'datatype': 'text', 'constraints': 'UNIQUE', 'keytype': 'FK'},
+]
+
+
+def test_column_constraints_to_table():
+    constraints = odl.column_constraints_to_table('code', "UNIQUE CHECK (code <> '') REFERENCES x.codes(code)")
+
+    assert constraints == ['UNIQUE (code)', "CHECK (code <> '')", 'FOREIGN KEY (code) REFERENCES x.codes(code)']
+    assert odl.column_constraints_to_table('id', 'PRIMARY KEY') == ['PRIMARY KEY (id)']
+    assert odl.column_constraints_to_table('id', '') == []
+
+
+def test_key_columns():
+    assert odl.key_columns(ATTRIBUTES) == (['id', 'jaar'], [['code']])
+
+    # a nullable key column or an own PRIMARY KEY makes the key an index
+    nullable = [dict(ATTRIBUTES[0], constraints = '')] + ATTRIBUTES[1:]
+    assert odl.key_columns(nullable) == ([], [['id', 'jaar'], ['code']])
+
+    own_pk = ATTRIBUTES[:2] + [dict(ATTRIBUTES[2], constraints = 'PRIMARY KEY', keytype = '')]
+    assert odl.key_columns(own_pk) == ([], [['id', 'jaar']])
+
+
+def test_create_and_bulk_keys_agree():
+    create = odl.create_keys(ATTRIBUTES, 'x', 't_data')
+    bulk = odl.create_bulk_constraints(ATTRIBUTES, 'x', 't_data')
+
+    assert 'ALTER TABLE x.t_data ADD PRIMARY KEY (id, jaar);' in create
+    assert 'ADD PRIMARY KEY (id, jaar)' in bulk
+    index = 'CREATE INDEX t_data_code_idx ON x.t_data (code);'
+    assert index in create and index in bulk
+
+
+def test_migrate_keys():
+    old = [dict(row, keytype = '') for row in ATTRIBUTES[:2]] + [ATTRIBUTES[2]]
+    old[0]['keytype'] = 'PK'
+    sql = odl.migrate_keys(ATTRIBUTES, old, 'x', 't')
+
+    assert 'DROP CONSTRAINT IF EXISTS t_data_pkey' in sql
+    assert 'ADD PRIMARY KEY (id, jaar)' in sql
+    assert 'CREATE INDEX IF NOT EXISTS t_data_code_idx ON x.t_data (code);' in sql
+    assert 'DROP INDEX' not in sql
@@ -0,0 +1,25 @@
+import dido_common as dc
+
+SCHEMA = [{'kolomnaam': 'naam', 'code_attribuut': "N'01", 'datatype': 'text',
+           'constraints': 'NOT NULL', 'domein': "['a', 'b']"}]
+
+
+def test_validation_keeps_other_findings():
+    sql = dc.create_validation_function('odl', 'sup', 'sup_data', 'sup_dq', SCHEMA)
+
+    assert 'code_datakwaliteit IN (1, 2, 3, 8);' in sql
+    assert "'N''01'" in sql
+
+
+def test_validation_refreshes_summary():
+    sql = dc.create_validation_function('odl', 'sup', 'sup_data', 'sup_dq', SCHEMA, 'sup_dqs')
+
+    assert 'DELETE FROM odl.sup_dqs WHERE levering_rapportageperiode = p_levering;' in sql
+    assert sql.index('INSERT INTO odl.sup_dqs') < sql.index('RETURN v_findings')
+
+
+def test_validation_row_number_is_file_row():
+    sql = dc.create_validation_function('odl', 'sup', 'sup_data', 'sup_dq', SCHEMA)
+
+    assert 'SELECT bronbestand_recordnummer, code_bronbestand, v_row_number,' in sql
+    assert 'row_number() OVER (ORDER BY bronbestand_recordnummer) AS v_row_number' in sql
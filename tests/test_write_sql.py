@@ -0,0 +1,20 @@
+import pytest
+
+import dido_common as dc
+from conftest import load_odl_creator
+
+odl = load_odl_creator()
+
+
+def test_migrate_stops_when_database_cannot_be_read(tmp_path, monkeypatch):
+    def unreachable(table_name, server_config):
+        raise ConnectionError('server unreachable')
+
+    monkeypatch.setattr(dc, 'table_exists', unreachable)
+    sql_name = tmp_path / 'model.sql'
+    tables = {'tabel': {'schema': None, 'meta': None}}
+
+    with pytest.raises(dc.DiDoError):
+        odl.write_sql(str(sql_name), tables, None, 'x', server_config = {'POSTGRES_SCHEMA': 'x'})
+
+    assert 'DROP TABLE' not in sql_name.read_text()
@@ -0,0 +1,62 @@
+from datetime import date, datetime
+
+import openpyxl
+import pytest
+
+import dido_common as dc
+from conftest import load_odl_creator
+
+
+def write_workbook(filename, sheets: dict):
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for name, rows in sheets.items():
+        worksheet = workbook.create_sheet(name)
+        for row in rows:
+            worksheet.append(row)
+
+    workbook.save(filename)
+
+
+def test_iter_xlsx_rows_formats_values(tmp_path):
+    filename = str(tmp_path / 'x.xlsx')
+    write_workbook(filename, {'first': [['a', 'b', 'c', None],
+                                        [1.0, 2.5, date(2024, 1, 31), 'extra'],
+                                        [None, None, None],
+                                        [None, 'x', datetime(2024, 1, 31, 12, 30, 0)]],
+                              'second': [['z'], ['1']]})
+
+    rows = list(dc.iter_xlsx_rows(filename))
+
+    assert rows[0] == ['a', 'b', 'c']
+    assert rows[1] == ['1', '2.5', date(2024, 1, 31).strftime(dc.DATE_FORMAT)]
+    assert rows[2] == ['', 'x', datetime(2024, 1, 31, 12, 30).strftime(dc.DATETIME_FORMAT)]
+    assert len(rows) == 3
+    assert list(dc.iter_xlsx_rows(filename, 'second')) == [['z'], ['1']]
+
+
+def test_iter_xlsx_rows_missing_sheet(tmp_path):
+    filename = str(tmp_path / 'x.xlsx')
+    write_workbook(filename, {'schema': [['a']]})
+
+    with pytest.raises(dc.DiDoError):
+        list(dc.iter_xlsx_rows(filename, 'meta'))
+
+
+def test_load_schemas_from_sheets(tmp_path):
+    odl = load_odl_creator()
+    schema_dir = tmp_path / 'root' / 'schemas' / 'odl'
+    schema_dir.mkdir(parents = True)
+    write_workbook(str(schema_dir / 'tabel.xlsx'), {
+        'schema': [['kolomnaam', 'datatype'], ['code', 'text']],
+        'meta': [['attribuut', 'waarde'], ['bronbestand_beschrijving', 'test']],
+        'data': [['code'], ['A'], ['B']],
+    })
+    tables = {'tabel': {'from': 'tabel.xlsx', 'sheets': {'schema': 'schema', 'meta': 'meta', 'data': 'data'}}}
+
+    tables = odl.load_schemas(tables, str(tmp_path / 'root'), str(tmp_path / 'work'), 'odl')
+
+    assert list(tables['tabel']['schema']['kolomnaam']) == ['code']
+    assert tables['tabel']['meta'].loc['bronbestand_beschrijving', 'waarde'] == 'test'
+    assert list(tables['tabel']['data']['code']) == ['A', 'B']
+    assert tables['tabel']['data_name'].endswith('tabel.data.csv')